@@ -1,7 +1,7 @@
 import asyncio
 import json
 import os
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 from bson import ObjectId
 from datetime import datetime
 
@@ -11,16 +11,16 @@ from agents.pre_router_agent import PreRouterAgent
 from core.base_database import BaseDatabase
 from core.logger import Logger
 from core.registry import ServiceRegistry
-from llm.agent import Agent
+from llm.agent import Agent, prompt_cache_stats
 from llm.message import LLMMessage, LLMMessageRole
-from llm.providers.openai.openai_provider import OpenAIProvider
+from llm.providers.openai.async_openai_provider import AsyncOpenAIProvider
 from llm.tool import ToolSetRegistry
 
 logger = Logger(__name__)
 
 
 class AgentRouter(Agent):
-    def __init__(self, provider=OpenAIProvider):
+    def __init__(self, provider=AsyncOpenAIProvider):
         super().__init__(
             name="AgentRouter",
             provider=provider(),
@@ -114,7 +114,20 @@ class AgentRouter(Agent):
         conversation_id=None,
         messages=[],
         prompt_id=None,
+        on_event: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
     ):
+        """
+        Answer a query with the project's agents.
+
+        on_event, when given, receives progress events while the request runs:
+        {"event": "progress", "stage": "pre_router" | "tool" | "finaliser", ...}
+        and the final answer as it is generated: {"event": "delta", "agent", "delta"}.
+        """
+
+        async def emit(event: Dict[str, Any]):
+            if on_event is not None:
+                await on_event(event)
+
         agent_responses = {}
         available_agents = await self.get_available_agents_by_project_scope(project_id)
         if agent_scope:
@@ -159,11 +172,16 @@ class AgentRouter(Agent):
             name="PreRouterAgent",
             provider=self.provider,
         )
-        pre_router_response = pre_router_agent.handle_request(query, previous_messages, available_agents, agent_scope)
+        pre_router_response = await pre_router_agent.handle_request(query, previous_messages, available_agents, agent_scope)
         logger.info(f"[{project_id}] Pre-router response: {pre_router_response}")
-        if pre_router_response and pre_router_response.get("needs_escalation", False) in [False, "false"]:
+        needs_escalation = not (
+            pre_router_response and pre_router_response.get("needs_escalation", False) in [False, "false"]
+        )
+        await emit({"event": "progress", "stage": "pre_router", "needs_escalation": needs_escalation})
+        if not needs_escalation:
             # if no escalation needed, return the direct answer
             final_answer = pre_router_response.get("final_answer", "I'm sorry, I cannot assist with that request.")
+            await emit({"event": "delta", "agent": pre_router_agent.name, "delta": final_answer})
             return {
                 "response_text": final_answer,
                 "token_usage": pre_router_agent.total_token_usage,
@@ -196,6 +214,12 @@ class AgentRouter(Agent):
                     if agent_name in loaded_services and agent_name in loaded_tools:
                         tool_cls = ServiceRegistry._toolsets[agent_name]
                     toolset_registry.load(tool_cls, namespace=agent_name)
+                    service = ServiceRegistry._services.get(agent_name)
+                    if service is not None:
+                        try:
+                            await service.prepare(project_id)
+                        except Exception as e:
+                            logger.error(f"[{project_id}] Could not prepare service {agent_name}: {e}")
 
                     # Create PlannerAgent
                     planner_agent = PlannerAgent(
@@ -203,30 +227,45 @@ class AgentRouter(Agent):
                         toolsets=[toolset_registry.get_toolset(agent_name)],
                         tool_cls=tool_cls,
                         provider=self.provider,
+                        service_name=agent["service_name"],
+                        on_event=on_event,
                     )
 
                     # Create a copy of previous_messages for this agent to avoid race conditions
                     agent_messages = previous_messages.copy()
                     agent_messages.append(LLMMessage(LLMMessageRole.USER, content=query))
 
-                    # Run blocking call in thread pool to avoid blocking event loop
-                    planner_response = await asyncio.to_thread(planner_agent.handle_request, project_id, query, agent_messages)
+                    planner_response = await planner_agent.handle_request(project_id, query, agent_messages)
                     
                     print(f"[{project_id}] Agent {agent_name} response: {json.dumps(planner_response)}")
                     
                     # Finalise response using FinaliserAgent
+                    await emit({"event": "progress", "stage": "finaliser", "agent": agent_name})
                     finaliser = FinaliserAgent(name=agent_name, provider=self.provider)
-                    finaliser_response = await asyncio.to_thread(finaliser.finalise_response, query, {
+
+                    async def on_delta(text: str):
+                        await emit({"event": "delta", "agent": agent_name, "delta": text})
+
+                    finaliser_response = await finaliser.finalise_response(query, {
                         "agent_name": agent_name,
                         "response": planner_response
-                    })
+                    }, on_delta=on_delta if on_event is not None else None)
                     
+                    # provider prompt cache hits per agent, before the usages are merged
+                    prompt_cache = {
+                        "pre_router": pre_router_agent.prompt_cache_stats(),
+                        "planner": planner_agent.prompt_cache_stats(),
+                        "query_agent": prompt_cache_stats(planner_agent.query_token_usage),
+                        "finaliser": finaliser.prompt_cache_stats(),
+                    }
                     # add finaliser token usage to planner agent token usage
                     planner_agent.add_token_usage(finaliser.total_token_usage)
                     # store raw and final responses
                     agent_responses[agent_name] = {}
                     agent_responses[agent_name]["planner_response"] = planner_response
                     agent_responses[agent_name]["token_usage"] = planner_agent.total_token_usage
+                    agent_responses[agent_name]["result_cache"] = planner_agent.cache_stats
+                    agent_responses[agent_name]["prompt_cache"] = prompt_cache
                     agent_responses[agent_name]["finaliser_response"] = self.extract_json(finaliser_response)
                     agent_responses[agent_name]["token_usage"] = planner_agent.total_token_usage
                 except Exception as e:
@@ -250,6 +289,8 @@ class AgentRouter(Agent):
             planner_response = agent_resp.get("planner_response", {})
             finaliser_response = agent_resp.get("finaliser_response", {})
             token_usage = agent_resp.get("token_usage", {})
+            result_cache = agent_resp.get("result_cache", {})
+            prompt_cache = agent_resp.get("prompt_cache", {})
             pipeline = await execution_pipelines_collection.insert_one(
                 {
                     "project_id": project_id,
@@ -259,6 +300,8 @@ class AgentRouter(Agent):
                     "planner_response": planner_response,
                     "finaliser_response": finaliser_response,
                     "token_usage": token_usage,
+                    "result_cache": result_cache,
+                    "prompt_cache": prompt_cache,
                     "created_at": datetime.utcnow(),
                 }
             )
@@ -0,0 +1,170 @@
+"""
+Pushes the leading summariser step down into Elasticsearch aggregations.
+
+A pipeline that starts with a grouped metric (e.g. sum of amount_paid by currency)
+only needs one number per group, so instead of paging every matching document to
+the summariser it is answered by a terms + metric aggregation. The result has the
+same shape as the local operation; the remaining steps run locally on it.
+
+A step is only pushed down when ES computes the same thing the summariser would:
+- the metric field is mapped as an exact numeric type (float fields keep float32
+  doc values, so they are left to the summariser),
+- the group_by field is a top-level aggregatable field (a dotted path can reach
+  into arrays of objects, which group_docs groups as one tuple key while terms
+  buckets each value),
+- every group fits in one terms response.
+Anything else returns None and the caller falls back to scanning. unique_count and
+percentile map to the cardinality and percentiles sketches, which are exact for
+small groups and approximate (well under 1%) for large ones.
+"""
+import os
+from typing import Any, Dict, Optional, Tuple
+from core.schema_catalog import IndexSchema
+
+PUSHDOWN_ENABLED = os.getenv("QUERY_PUSHDOWN_ENABLED", "true").lower() == "true"
+PUSHDOWN_MAX_GROUPS = int(os.getenv("QUERY_PUSHDOWN_MAX_GROUPS", "10000"))
+CARDINALITY_PRECISION_THRESHOLD = 40000  # ES maximum; counts below it are near-exact
+
+INTEGER_TYPES = {"long", "integer", "short", "byte", "unsigned_long"}
+EXACT_NUMERIC_TYPES = INTEGER_TYPES | {"double"}
+GROUPABLE_TYPES = EXACT_NUMERIC_TYPES | {"keyword", "boolean"}
+
+# summariser operation -> (ES metric aggregation, response key)
+METRIC_AGGREGATIONS = {
+    "sum": ("sum", "value"),
+    "avg": ("avg", "value"),
+    "min": ("min", "value"),
+    "max": ("max", "value"),
+    "stddev": ("extended_stats", "std_deviation"),
+    "variance": ("extended_stats", "variance"),
+    "unique_count": ("cardinality", "value"),
+    "percentile": ("percentiles", "values"),
+}
+
+# operations whose local result omits groups without values
+_OMIT_EMPTY = {"avg", "min", "stddev", "variance"}
+
+MISSING_GROUP = "UNKNOWN"
+
+
+def _aggregatable(schema: IndexSchema, field: str, types: set) -> Tuple[Optional[str], Optional[str]]:
+    """(ES field to aggregate on, its type), using the .keyword subfield of text fields."""
+    info = schema.field(field)
+    if info is None:
+        return None, None
+    if info.type in types:
+        return field, info.type
+    if info.type == "text" and "keyword" in types and info.keyword:
+        return info.keyword, "keyword"
+    return None, None
+
+
+def plan_pushdown(step: Dict[str, Any], schema: IndexSchema) -> Optional[Dict[str, Any]]:
+    """
+    ES aggregations equivalent to one summariser step, or None if it must run locally.
+    """
+    if not PUSHDOWN_ENABLED or not isinstance(step, dict):
+        return None
+    op = step.get("operation")
+    if op != "count" and op not in METRIC_AGGREGATIONS:
+        return None
+
+    metric: Dict[str, Any] = {}
+    field_type = None
+    if op != "count":
+        field = step.get("field")
+        if not isinstance(field, str) or not field:
+            return None
+        types = GROUPABLE_TYPES if op == "unique_count" else EXACT_NUMERIC_TYPES
+        es_field, field_type = _aggregatable(schema, field, types)
+        if es_field is None:
+            return None
+        agg_type, _ = METRIC_AGGREGATIONS[op]
+        params: Dict[str, Any] = {"field": es_field}
+        if op == "percentile":
+            percentile = step.get("percentile")
+            if not isinstance(percentile, (int, float)) or not (0 <= percentile <= 100):
+                return None  # let the summariser raise its usual error
+            params["percents"] = [percentile]
+        elif op == "unique_count":
+            params["precision_threshold"] = CARDINALITY_PRECISION_THRESHOLD
+        metric = {"metric": {agg_type: params}}
+
+    group_by = step.get("group_by")
+    if not group_by:
+        return {"operation": op, "field_type": field_type, "group_by": None, "aggs": metric}
+    if not isinstance(group_by, str) or "." in group_by:
+        return None
+    group_field, group_type = _aggregatable(schema, group_by, GROUPABLE_TYPES)
+    if group_field is None:
+        return None
+
+    aggs: Dict[str, Any] = {
+        "groups": {"terms": {"field": group_field, "size": PUSHDOWN_MAX_GROUPS}},
+        "missing_group": {"missing": {"field": group_field}},
+    }
+    if metric:
+        aggs["groups"]["aggs"] = metric
+        aggs["missing_group"]["aggs"] = metric
+    return {"operation": op, "field_type": field_type, "group_by": group_type, "aggs": aggs}
+
+
+def _metric_value(plan: Dict[str, Any], bucket: Dict[str, Any]) -> Any:
+    op = plan["operation"]
+    if op == "count":
+        return bucket.get("doc_count", 0)
+    _, key = METRIC_AGGREGATIONS[op]
+    value = bucket.get("metric", {}).get(key)
+    if op == "percentile":
+        return next(iter(value.values()), None) if isinstance(value, dict) else None
+    if op == "unique_count":
+        return int(value or 0)
+    if op == "sum":
+        return float(value or 0.0)
+    if op in ("min", "max") and plan["field_type"] in INTEGER_TYPES and value is not None:
+        return int(value)  # ES reports doubles; the summariser keeps ints
+    return value
+
+
+def read_pushdown(plan: Dict[str, Any], response: Dict[str, Any]) -> Optional[Dict[Any, Any]]:
+    """
+    Convert an aggregation response into the dict the local operation returns,
+    or None if the buckets do not cover every group.
+    """
+    op = plan["operation"]
+    aggs = response.get("aggregations", {})
+
+    if plan["group_by"] is None:
+        if op == "count":
+            total = response.get("hits", {}).get("total", {})
+            value = total.get("value", 0) if isinstance(total, dict) else total
+        else:
+            value = _metric_value(plan, aggs)
+        if value is None and op in _OMIT_EMPTY:
+            return {}
+        return {"all": value}
+
+    groups = aggs.get("groups", {})
+    if groups.get("sum_other_doc_count", 0) > 0:
+        return None
+
+    out: Dict[Any, Any] = {}
+    for bucket in groups.get("buckets", []):
+        key = bucket.get("key")
+        if plan["group_by"] == "boolean":
+            key = bucket.get("key_as_string") == "true"
+        out[key] = _metric_value(plan, bucket)
+
+    missing = aggs.get("missing_group", {})
+    if missing.get("doc_count", 0) > 0:
+        value = _metric_value(plan, missing)
+        if MISSING_GROUP in out:
+            # a literal "UNKNOWN" value shares the group of documents without one
+            if op not in ("sum", "count"):
+                return None
+            value += out[MISSING_GROUP]
+        out[MISSING_GROUP] = value
+
+    if op in _OMIT_EMPTY:
+        out = {k: v for k, v in out.items() if v is not None}
+    return out
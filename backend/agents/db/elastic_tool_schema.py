@@ -41,6 +41,9 @@ Rules:
 - The final output must not be a huge list of documents:
     * Prefer aggregations, counts, averages, sums, or filters.
     * If you extract documents, limit to at most 10.
+- Data from a second index (e.g. revenue by customer country): query the first index and
+  add a `join` step (index, field, on, fields, as) before the steps that use the joined
+  fields; reach them by dotted path, e.g. "customer.address.country".
 """.strip()
 
 
@@ -122,7 +125,37 @@ def build_elastic_tool_schema(
                                         "type": "array",
                                         "items": {"type": "string"},
                                         "description": (
-                                            "List of fields to project (only for 'project')."
+                                            "List of fields to project (for 'project'), "
+                                            "or to read from the joined index (for 'join')."
+                                        ),
+                                    },
+                                    "index": {
+                                        "type": "string",
+                                        "enum": list(index_metadata.keys()),
+                                        "description": (
+                                            "Index to join with (only for 'join')."
+                                        ),
+                                    },
+                                    "on": {
+                                        "type": "string",
+                                        "description": (
+                                            "Key field in the joined index that `field` "
+                                            "matches (only for 'join', default 'id')."
+                                        ),
+                                    },
+                                    "as": {
+                                        "type": "string",
+                                        "description": (
+                                            "Name the matched document is attached under "
+                                            "(only for 'join')."
+                                        ),
+                                    },
+                                    "how": {
+                                        "type": "string",
+                                        "enum": ["left", "inner"],
+                                        "description": (
+                                            "Keep ('left') or drop ('inner') documents "
+                                            "without a match (only for 'join')."
                                         ),
                                     },
                                     "percentile": {
@@ -0,0 +1,316 @@
+"""
+Cache of QueryAgent plans ({index, body, pipeline}) for recurring questions.
+
+Plans are keyed by the normalized request text and the services the prompt was
+scoped to, so the same question asked in different projects shares one entry.
+Before a plan is stored it is parameterized:
+- the project_id becomes a slot, filled with the asking project on a hit,
+- absolute dates in range filters and pipeline filter conditions that the
+  question names (the date itself, its month or its year appears in the request
+  text) are kept as they are,
+- the others become slots relative to the time the plan was made, but only when
+  the question names no date at all ("last month", "this year"). Dates on a
+  calendar boundary keep their alignment ("start of last month" stays the start
+  of last month), anything else keeps its offset from now. A plan with a date
+  that cannot be parameterized is not cached.
+
+Verification policy: a plan is only served once PLAN_CACHE_MIN_CONFIRMATIONS
+independent model plans for the question agreed on it. It is dropped when the
+mapping of its index changed (schema fingerprint) or when executing it fails, in
+which case the caller plans with the model again.
+"""
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from core.logger import Logger
+from core.schema_catalog import SchemaCatalog
+
+logger = Logger(__name__)
+
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", str(24 * 3600)))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "2000"))
+PLAN_CACHE_MIN_CONFIRMATIONS = int(os.getenv("PLAN_CACHE_MIN_CONFIRMATIONS", "2"))
+
+_RANGE_KEYS = ("gte", "gt", "lte", "lt")
+# epoch values are only read as dates inside this window around now
+_EPOCH_WINDOW = timedelta(days=366 * 20)
+
+_MONTHS = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+# "may" is also a verb, so it only names a month next to a number
+_MONTH_PATTERNS = [
+    r"\bmay \d{1,4}\b|\b\d{1,2}(?:st|nd|rd|th)? may\b"
+    if name == "may" else rf"\b(?:{name}|{name[:3]})\b"
+    for name in _MONTHS
+]
+_NAMED_DATE = re.compile(r"\b(?:19|20)\d{2}\b|" + "|".join(_MONTH_PATTERNS))
+
+
+class _Unslottable(Exception):
+    """The plan holds a value that cannot be made relative to now."""
+
+
+def normalize_request(text: str) -> str:
+    text = text.lower().replace("’", "'").strip()
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?.!")
+
+
+# --- date slots ---
+
+def _shift_months(day: date, months: int) -> date:
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def _slot_datetime(value: datetime, now: datetime) -> Dict[str, Any]:
+    """Express value relative to now, keeping calendar alignment."""
+    for adjust in (timedelta(0), timedelta(seconds=1), timedelta(milliseconds=1)):
+        v = value + adjust
+        if v.time() != datetime.min.time():
+            continue
+        if v.month == 1 and v.day == 1:
+            unit, offset = "year", v.year - now.year
+        elif v.day == 1:
+            unit, offset = "month", (v.year - now.year) * 12 + v.month - now.month
+        else:
+            unit, offset = "day", (v.date() - now.date()).days
+        return {"unit": unit, "offset": offset, "adjust_ms": -int(adjust.total_seconds() * 1000)}
+    return {"unit": "second", "offset": (value - now).total_seconds(), "adjust_ms": 0}
+
+
+def _render_datetime(slot: Dict[str, Any], now: datetime) -> datetime:
+    unit, offset = slot["unit"], slot["offset"]
+    if unit == "second":
+        return now + timedelta(seconds=offset)
+    if unit == "year":
+        start = datetime(now.year + offset, 1, 1)
+    elif unit == "month":
+        start = datetime.combine(_shift_months(now.date(), offset), datetime.min.time())
+    else:
+        start = datetime.combine(now.date() + timedelta(days=offset), datetime.min.time())
+    return start + timedelta(milliseconds=slot["adjust_ms"])
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _named_in(moment: datetime, request: str) -> bool:
+    """Whether the request names the date, its month or its year."""
+    # an exclusive upper bound (lt 2024-07-01) belongs to the day before it
+    for day in (moment.date(), (moment - timedelta(milliseconds=1)).date()):
+        month = _MONTH_PATTERNS[day.month - 1]
+        if (
+            day.isoformat() in request
+            or day.isoformat()[:7] in request
+            or re.search(rf"\b{day.year}\b", request)
+            or re.search(month, request)
+        ):
+            return True
+    return False
+
+
+def _slot_moment(value: Any, moment: datetime, now: datetime, request: str, fmt: str) -> Any:
+    if _named_in(moment, request):
+        return value  # taken from the question, it means the same date on every hit
+    if _NAMED_DATE.search(request):
+        raise _Unslottable(value)  # the question names other dates, so it is not relative
+    return {"$date": _slot_datetime(moment, now), "format": fmt}
+
+
+def _slot_date_value(value: Any, now: datetime, request: str) -> Any:
+    """A date slot for an absolute date / epoch, the value itself if it is not a date."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        utc_now = _utcnow()
+        for fmt, scale in (("epoch_s", 1), ("epoch_ms", 1000)):
+            try:
+                moment = datetime(1970, 1, 1) + timedelta(seconds=value / scale)
+            except OverflowError:
+                continue
+            if abs(moment - utc_now) < _EPOCH_WINDOW:
+                return _slot_moment(value, moment, utc_now, request, fmt)
+        return value
+    if isinstance(value, str) and re.match(r"^\d{4}-\d{2}-\d{2}", value):
+        try:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise _Unslottable(value)
+        if moment.tzinfo is not None:
+            raise _Unslottable(value)  # the model only sees a naive local now
+        fmt = "date" if len(value) == 10 else "datetime"
+        return _slot_moment(value, moment, now, request, fmt)
+    return value
+
+
+def _render_date_value(slot: Dict[str, Any], now: datetime) -> Any:
+    if slot["format"] in ("epoch_s", "epoch_ms"):
+        moment = _render_datetime(slot["$date"], _utcnow())
+        seconds = (moment - datetime(1970, 1, 1)).total_seconds()
+        return int(seconds) if slot["format"] == "epoch_s" else int(seconds * 1000)
+    moment = _render_datetime(slot["$date"], now)
+    if slot["format"] == "date":
+        return moment.date().isoformat()
+    return moment.isoformat(timespec="milliseconds" if moment.microsecond else "seconds")
+
+
+def parameterize(plan: Any, project_id: str, now: datetime, request: str) -> Any:
+    """
+    Replace the project id and the absolute dates the normalized request does not
+    name with slots.
+    """
+
+    def walk(node: Any, in_range: bool = False) -> Any:
+        if isinstance(node, dict):
+            out = {}
+            for key, value in node.items():
+                if in_range and key in _RANGE_KEYS:
+                    out[key] = _slot_date_value(value, now, request)
+                elif key == "range" and isinstance(value, dict):
+                    out[key] = {field: walk(bounds, in_range=True) for field, bounds in value.items()}
+                elif key == "conditions":  # summariser filter step
+                    out[key] = walk(value, in_range=True)
+                else:
+                    out[key] = walk(value)
+            return out
+        if isinstance(node, list):
+            return [walk(v) for v in node]
+        if node == project_id:
+            return {"$slot": "project_id"}
+        return node
+
+    return walk(plan)
+
+
+def render(plan: Any, project_id: str, now: datetime) -> Any:
+    """Fill the slots of a parameterized plan."""
+    if isinstance(plan, dict):
+        if plan.get("$slot") == "project_id":
+            return project_id
+        if "$date" in plan:
+            return _render_date_value(plan, now)
+        return {k: render(v, project_id, now) for k, v in plan.items()}
+    if isinstance(plan, list):
+        return [render(v, project_id, now) for v in plan]
+    return plan
+
+
+class _Entry:
+    def __init__(self, plan: Dict[str, Any], signature: str, index: str, fingerprint: str):
+        self.plan = plan
+        self.signature = signature
+        self.index = index
+        self.fingerprint = fingerprint
+        self.confirmations = 1
+        self.hits = 0
+        self.expires_at = time.monotonic() + PLAN_CACHE_TTL_SECONDS
+
+
+class PlanCache:
+    """Process-wide plan cache; see the module docstring for the policy."""
+
+    _entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+    _stats = {"hits": 0, "misses": 0, "stores": 0, "confirmations": 0, "rejections": 0, "unslottable": 0}
+    _lock = threading.Lock()
+
+    @classmethod
+    def key(cls, user_request: str, services: Optional[List[str]]) -> Optional[tuple]:
+        if not PLAN_CACHE_ENABLED or not user_request:
+            return None
+        return (normalize_request(user_request), tuple(sorted(services or [])))
+
+    @classmethod
+    def lookup(cls, key: Optional[tuple], project_id: str) -> Optional[Dict[str, Any]]:
+        """A rendered plan for the request, or None when the model has to plan it."""
+        if key is None:
+            return None
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None or entry.confirmations < PLAN_CACHE_MIN_CONFIRMATIONS:
+                cls._stats["misses"] += 1
+                return None
+            if time.monotonic() >= entry.expires_at:
+                del cls._entries[key]
+                cls._stats["misses"] += 1
+                return None
+        schema = SchemaCatalog.get(entry.index)
+        if schema is None or schema.fingerprint != entry.fingerprint:
+            cls.reject(key, "index mapping changed")
+            with cls._lock:
+                cls._stats["misses"] += 1
+            return None
+        with cls._lock:
+            entry.hits += 1
+            cls._stats["hits"] += 1
+            cls._entries.move_to_end(key)
+        return render(entry.plan, project_id, datetime.now())
+
+    @classmethod
+    def store(cls, key: Optional[tuple], plan: Dict[str, Any], project_id: str, now: datetime):
+        """Record a model plan that executed successfully."""
+        if key is None:
+            return
+        action = plan.get("action") or {}
+        index = (action.get("input") or {}).get("index")
+        schema = SchemaCatalog.get(index) if index else None
+        if schema is None:
+            return
+        try:
+            parameterized = parameterize(plan, project_id, now, key[0])
+        except _Unslottable as e:
+            with cls._lock:
+                cls._stats["unslottable"] += 1
+            logger.debug(f"Plan not cached, absolute value {e} cannot be parameterized")
+            return
+        # the model's own words may differ between runs; the query must not
+        signature = json.dumps(
+            (parameterized.get("action") or {}).get("input"), sort_keys=True, default=str
+        )
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and entry.signature == signature and entry.fingerprint == schema.fingerprint:
+                entry.confirmations += 1
+                entry.expires_at = time.monotonic() + PLAN_CACHE_TTL_SECONDS
+                cls._stats["confirmations"] += 1
+            else:
+                cls._entries[key] = _Entry(parameterized, signature, index, schema.fingerprint)
+                cls._stats["stores"] += 1
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > PLAN_CACHE_MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def reject(cls, key: Optional[tuple], reason: str):
+        """Drop a cached plan that no longer verifies."""
+        with cls._lock:
+            if key is not None and cls._entries.pop(key, None) is not None:
+                cls._stats["rejections"] += 1
+                logger.info(f"Plan cache entry for '{key[0]}' dropped: {reason}")
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            stats = dict(cls._stats)
+            entries = len(cls._entries)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "entries": entries,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
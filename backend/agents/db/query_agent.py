@@ -1,29 +1,42 @@
 # db_agent/db_query_agent.py
 
+import asyncio
 import inspect
 import json
+import os
 import re
 import sys
+import threading
+import time
 import traceback
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 from agents.prompts.query_agent import (
     CONSTRAINTS_PROMPT,
+    INDICES_PROMPT,
     JSON_OUTPUT_PROMPT,
     OPS_SCHEMA_PROMPT,
     QUESTION_PROMPT,
     SYSTEM_PROMPT,
     TOOLS_PROMPT,
 )
-from core.db.elastic import ElasticClient
+from core.base_database import BaseDatabase
+from core.db import msearch
+from core.result_cache import ResultCache
+from core.db.elastic import ES_MAX_SCAN_SLICES, QueryBudgetExceeded
+from core.schema_catalog import IndexSchema, SchemaCatalog
 from elasticsearch import exceptions
-from llm.agent import Agent
+from llm.agent import AsyncAgent
 from llm.message import JSONLLMResponse, LLMMessage, LLMMessageRole, LLMRequest
 from llm.prompt_template import PromptTemplate
 from llm.tool import Tool
 
+from .aggregation_pushdown import plan_pushdown, read_pushdown
 from .elastic_tool_schema import build_elastic_tool_schema
+from .plan_cache import PlanCache
+from .query_cost import APPROXIMATIONS, QueryCostExceeded, bounded_pages, preflight
+from .schema_retriever import SchemaRetriever
 from .summariser_tools import SummariserTools
 
 # Optional: use static schema if available
@@ -32,76 +45,95 @@ try:
 except Exception:
     ES_SCHEMA = None
 
-_es_client = ElasticClient()
-es = _es_client.client  # raw Elasticsearch client
-
-
-def get_mapping(index: str):
-    try:
-        resp = es.indices.get_mapping(index=index)
-        return resp.get(index, {}).get("mappings", {})
-    except Exception:
-        return {}
+# operations that end the pipeline: their per-group values are the answer
+TERMINAL_OPERATIONS = {
+    "sum",
+    "avg",
+    "min",
+    "max",
+    "median",
+    "mode",
+    "stddev",
+    "variance",
+    "unique_count",
+    "percentile",
+}
+
+# per-document steps that can run on each page as it arrives
+PAGE_OPERATIONS = {"filter", "project"}
+
+# errors from reading the scan, which must reach perform_query_and_summarise
+_SCAN_ERRORS = (exceptions.ApiError, exceptions.TransportError, QueryBudgetExceeded)
+
+# index -> number of primary shards, read once per process
+_shard_counts: Dict[str, int] = {}
+
+# join lookups: keys per terms filter, and documents one lookup may return
+JOIN_KEYS_PER_LOOKUP = 1000
+JOIN_MAX_MATCHES = 10000  # index.max_result_window
+
+# unrounded `now` date math is rounded down to this unit (s, m, h or d), so the
+# same question asked within one window sends the same query; empty disables it
+QUERY_NOW_ROUNDING = os.getenv("QUERY_NOW_ROUNDING", "m")
+_ROUNDING_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+if QUERY_NOW_ROUNDING and QUERY_NOW_ROUNDING not in _ROUNDING_SECONDS:
+    raise ValueError(f"QUERY_NOW_ROUNDING must be one of {sorted(_ROUNDING_SECONDS)}")
 
 
 MODEL = "gpt-5.1"
 REASONING_EFFORT = "low"
 
 
-def build_system_prompt(
-    index_metadata: Dict[str, Any], tools: List[Dict[str, Any]]
-) -> str:
-    index_metadata_json = json.dumps(index_metadata, indent=2)
-    tools_json = json.dumps(tools, indent=2)
-    return (
-        PromptTemplate(SYSTEM_PROMPT)
-        .concat(PromptTemplate(TOOLS_PROMPT))
-        .render(
-            index_metadata_json=index_metadata_json,
-            tools_json=tools_json,
-        )
-    )
+def build_system_prompt(tools_section: str, ops_schema_section: str) -> str:
+    """
+    The system message: only sections that are the same for every request, so it
+    is a byte-identical prefix the provider can serve from its prompt cache.
+    """
+    return "\n".join([SYSTEM_PROMPT, tools_section, ops_schema_section, JSON_OUTPUT_PROMPT])
 
 
 def build_user_prompt(
-    db_tools_schema: List[Dict[str, Any]],
+    index_digest: str,
     project_id: str,
     user_request: str,
     now: datetime,
 ) -> str:
-    db_tools_schema_json = json.dumps(db_tools_schema, indent=2)
+    """
+    The user message: the per-call sections (schema digest, project, time, question).
+    """
     now_str = now.strftime("%Y-%m-%d %H:%M:%S")
-
-    pt = PromptTemplate(OPS_SCHEMA_PROMPT).concat(
-        PromptTemplate(CONSTRAINTS_PROMPT),
-        PromptTemplate(JSON_OUTPUT_PROMPT),
-        PromptTemplate(QUESTION_PROMPT),
-    )
-    return pt.render(
-        db_tools_schema_json=db_tools_schema_json,
+    return _DYNAMIC_USER_PROMPT.render(
+        index_digest=index_digest,
         project_id=project_id,
         user_request=user_request,
         now_str=now_str,
     )
 
 
+_DYNAMIC_USER_PROMPT = PromptTemplate(INDICES_PROMPT).concat(
+    PromptTemplate(CONSTRAINTS_PROMPT),
+    PromptTemplate(QUESTION_PROMPT),
+)
+
+
 def build_db_agent_request(
-    index_metadata: Dict[str, Any],
-    tools: List[Dict[str, Any]],
-    db_tools_schema: List[Dict[str, Any]],
+    artifacts: "QueryAgentArtifacts",
     project_id: str,
     user_request: str,
     model: str = "gpt-5",
+    services: Optional[List[str]] = None,
+    now: Optional[datetime] = None,
 ) -> LLMRequest:
     """
     Build an LLMRequest for the DB agent, ready to be passed to a provider.
     """
-    now = datetime.now()
-    system_prompt = build_system_prompt(index_metadata, tools)
-    user_prompt = build_user_prompt(db_tools_schema, project_id, user_request, now)
+    now = now or datetime.now()
+    user_prompt = build_user_prompt(
+        artifacts.retriever.digest(user_request, services), project_id, user_request, now
+    )
 
     messages = [
-        LLMMessage(LLMMessageRole.SYSTEM, system_prompt),
+        LLMMessage(LLMMessageRole.SYSTEM, artifacts.system_prompt),
         LLMMessage(LLMMessageRole.USER, user_prompt),
     ]
 
@@ -157,19 +189,28 @@ def _build_db_tools_schema() -> List[Dict[str, Any]]:
     return specs
 
 
-class QueryAgent(Agent):
+def _plan_error(response: Dict[str, Any]) -> Optional[str]:
+    """The error of an executed plan (tool or summariser pipeline), if any."""
+    result = response.get("result")
+    if "error" in response:
+        return response["error"]
+    if isinstance(result, dict) and "error" in result:
+        return result["error"]
+    return None
+
+
+class QueryAgentArtifacts:
     """
-    Concrete Agent that:
-    - Asks the LLM to design one call to `perform_elasticsearch_query`
-      (index + ES body + summarisation pipeline).
-    - Validates and executes that ES query safely.
-    - Runs the local SummariserTools pipeline on the ES results.
+    Everything a QueryAgent needs that does not depend on the request: index
+    metadata and its schema retriever, the summariser and its operation schemas,
+    the tool schema and the rendered static prompt sections. Built once per process (warmed at startup)
+    and shared by every QueryAgent.
     """
 
-    def __init__(self, name, provider):
-        super().__init__(name=name, provider=provider)
+    _instance: Optional["QueryAgentArtifacts"] = None
+    _lock = threading.Lock()
 
-        self.es = es
+    def __init__(self):
         self.index_metadata = _build_index_metadata()
         self.summarizer = SummariserTools()
 
@@ -183,6 +224,44 @@ class QueryAgent(Agent):
         # Optional: doc schema for summariser operations
         self.db_tools_schema = _build_db_tools_schema()
 
+        self.retriever = SchemaRetriever(ES_SCHEMA)
+        self.tools_section = PromptTemplate(TOOLS_PROMPT).render(
+            tools_json=json.dumps(self.tools, indent=2)
+        )
+        self.ops_schema_section = PromptTemplate(OPS_SCHEMA_PROMPT).render(
+            db_tools_schema_json=json.dumps(self.db_tools_schema, indent=2)
+        )
+        self.system_prompt = build_system_prompt(self.tools_section, self.ops_schema_section)
+
+    @classmethod
+    def get(cls) -> "QueryAgentArtifacts":
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+
+class QueryAgent(AsyncAgent):
+    """
+    Concrete Agent that:
+    - Asks the LLM to design one call to `perform_elasticsearch_query`
+      (index + ES body + summarisation pipeline).
+    - Validates and executes that ES query safely.
+    - Runs the local SummariserTools pipeline on the ES results.
+    """
+
+    def __init__(self, name, provider, services: Optional[List[str]] = None):
+        super().__init__(name=name, provider=provider)
+        self.services = services  # connected services whose indices the prompt covers
+
+        self.es = BaseDatabase.shared_elastic().client  # raw Elasticsearch client
+        self.artifacts = QueryAgentArtifacts.get()
+        self.index_metadata = self.artifacts.index_metadata
+        self.summarizer = self.artifacts.summarizer
+        self.tools = self.artifacts.tools
+        self.db_tools_schema = self.artifacts.db_tools_schema
+
     # ---------- ES helpers ----------
 
     def is_valid_index(self, index: str) -> bool:
@@ -192,6 +271,15 @@ class QueryAgent(Agent):
             return False
         return bool(re.match(r"^[a-zA-Z0-9-_]+$", index))
 
+    def scan_slices(self, index: str) -> int:
+        """Number of parallel slices for a full scan of the index: its shard count, capped."""
+        if index not in _shard_counts:
+            try:
+                _shard_counts[index] = BaseDatabase.shared_elastic().shard_count(index)
+            except Exception:
+                return 1
+        return max(1, min(_shard_counts[index], ES_MAX_SCAN_SLICES))
+
     def sanitize_date_math(self, query: Any) -> Any:
         """
         Recursively sanitize date math strings in an Elasticsearch query.
@@ -229,7 +317,71 @@ class QueryAgent(Agent):
             return [self.sanitize_date_math(item) for item in query]
         return query
 
-    def validate_query(self, body: Dict[str, Any]) -> None:
+    def round_date_math(self, query: Any) -> Any:
+        """
+        Round `now` expressions in range bounds that carry no rounding of their own
+        (e.g. "now-7d" -> "now-7d/m") to QUERY_NOW_ROUNDING, so repeated queries are
+        identical within a window instead of differing every millisecond.
+        """
+        if not QUERY_NOW_ROUNDING:
+            return query
+
+        def round_bound(value: Any) -> Any:
+            if isinstance(value, str) and value.startswith("now") and "/" not in value:
+                return f"{value}/{QUERY_NOW_ROUNDING}"
+            return value
+
+        if isinstance(query, dict):
+            new_query: Dict[str, Any] = {}
+            for k, v in query.items():
+                if k == "range" and isinstance(v, dict):
+                    new_query[k] = {
+                        field: {
+                            key: round_bound(val) if key in ("gte", "lte", "gt", "lt") else val
+                            for key, val in range_dict.items()
+                        }
+                        if isinstance(range_dict, dict)
+                        else range_dict
+                        for field, range_dict in v.items()
+                    }
+                else:
+                    new_query[k] = self.round_date_math(v)
+            return new_query
+        if isinstance(query, list):
+            return [self.round_date_math(item) for item in query]
+        return query
+
+    def cached_search(
+        self, index: str, body: Dict[str, Any], project_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        One search request, answered from ResultCache when the same project ran the
+        same canonical body since its last sync.
+
+        Keys are sorted so equal bodies serialize (and hit the shard request cache)
+        identically; aggregation-only bodies ask ES for the request cache explicitly.
+        Bodies using `now` are also keyed by the current rounding window.
+        """
+        body = json.loads(json.dumps(body, sort_keys=True, default=str))
+        params: Dict[str, Any] = {"body": body}
+        if QUERY_NOW_ROUNDING and '"now' in json.dumps(body):
+            params["window"] = int(time.time() // _ROUNDING_SECONDS[QUERY_NOW_ROUNDING])
+        cache_key = ResultCache.key(project_id, f"es_search:{index}", params)
+        hit, response = ResultCache.get(cache_key)
+        if hit:
+            return response
+
+        if body.get("size") == 0:
+            response = msearch.search(self.es, index, body, request_cache=True)
+        else:
+            response = msearch.search(self.es, index, body)
+        response = getattr(response, "body", response)  # ObjectApiResponse -> dict
+        ResultCache.put(cache_key, response)
+        return response
+
+    def validate_query(
+        self, body: Dict[str, Any], schema: Optional[IndexSchema] = None
+    ) -> None:
         if not isinstance(body, dict):
             raise ValueError("Query body must be a dictionary.")
 
@@ -257,8 +409,38 @@ class QueryAgent(Agent):
         if "aggs" in body and not isinstance(body["aggs"], dict):
             raise ValueError("'aggs' must be an object if present.")
 
+        if schema is not None:
+            for field in self._aggregated_fields(body):
+                info = schema.field(field)
+                if info is not None and not info.aggregatable:
+                    raise ValueError(
+                        f"Field '{field}' ({info.type}) cannot be used in aggs or sort."
+                    )
+
+    def _aggregated_fields(self, body: Any) -> List[str]:
+        """Fields the body aggregates or sorts on."""
+        fields: List[str] = []
+        if isinstance(body, dict):
+            for key, value in body.items():
+                if key == "sort":
+                    for s in value if isinstance(value, list) else [value]:
+                        if isinstance(s, dict):
+                            fields.extend(s)
+                        elif isinstance(s, str):
+                            fields.append(s)
+                elif key in ("aggs", "aggregations") and isinstance(value, dict):
+                    for agg in value.values():
+                        if not isinstance(agg, dict):
+                            continue
+                        for agg_type, params in agg.items():
+                            if agg_type in ("aggs", "aggregations"):
+                                fields.extend(self._aggregated_fields({agg_type: params}))
+                            elif isinstance(params, dict) and isinstance(params.get("field"), str):
+                                fields.append(params["field"])
+        return [f for f in fields if not f.startswith("_")]
+
     def rewrite_text_to_keyword(
-        self, body: Dict[str, Any], mapping: Dict[str, Any]
+        self, body: Dict[str, Any], schema: IndexSchema
     ) -> Dict[str, Any]:
         """
         Convert text fields in aggs/sort to their `.keyword` subfield when a keyword multi-field exists.
@@ -267,44 +449,22 @@ class QueryAgent(Agent):
         if not isinstance(body, dict):
             return body
 
-        def get_field_type(field_path: str, mapping_dict: Dict[str, Any]):
-            parts = field_path.split(".")
-            cur = mapping_dict.get("properties", mapping_dict)
-            for p in parts:
-                if (
-                    isinstance(cur, dict)
-                    and "properties" in cur
-                    and p in cur["properties"]
-                ):
-                    cur = cur["properties"][p]
-                elif isinstance(cur, dict) and p in cur:
-                    cur = cur[p]
-                else:
-                    return None, {}
-            if not isinstance(cur, dict):
-                return None, {}
-            return cur.get("type"), cur.get("fields", {})
+        def keyword_of(field: str) -> str:
+            info = schema.field(field)
+            if info is not None and info.type == "text" and info.keyword:
+                return info.keyword
+            return field
 
         def rewrite_dict(d: Dict[str, Any]) -> Dict[str, Any]:
             for key, value in list(d.items()):
                 if key in ("aggs", "aggregations") and isinstance(value, dict):
                     d[key] = rewrite_dict(value)
                 elif key == "terms" and isinstance(value, dict) and "field" in value:
-                    field = value["field"]
-                    field_type, subfields = get_field_type(field, mapping)
-                    if field_type == "text" and "keyword" in subfields:
-                        value["field"] = field + ".keyword"
+                    value["field"] = keyword_of(value["field"])
                 elif key == "sort" and isinstance(value, list):
                     for i, s in enumerate(value):
                         if isinstance(s, dict):
-                            new_s: Dict[str, Any] = {}
-                            for f, opts in s.items():
-                                field_type, subfields = get_field_type(f, mapping)
-                                if field_type == "text" and "keyword" in subfields:
-                                    new_s[f + ".keyword"] = opts
-                                else:
-                                    new_s[f] = opts
-                            value[i] = new_s
+                            value[i] = {keyword_of(f): opts for f, opts in s.items()}
                 elif isinstance(value, dict):
                     d[key] = rewrite_dict(value)
                 elif isinstance(value, list):
@@ -359,107 +519,311 @@ class QueryAgent(Agent):
         return results
 
     def run_pipeline(
-        self, pipeline: List[Dict[str, Any]], documents: List[Dict[str, Any]]
+        self,
+        pipeline: List[Dict[str, Any]],
+        documents: List[Dict[str, Any]],
+        project_id: Optional[str] = None,
     ) -> Any:
         results: Any = documents
         try:
             for step in pipeline:
+                if step.get("operation") == "join":
+                    step = self.lookup_join(step, results, project_id)
                 results = self.summarizer._execute_plan(step, results)
 
-                if step.get("operation") in [
-                    "sum",
-                    "avg",
-                    "min",
-                    "max",
-                    "median",
-                    "mode",
-                    "stddev",
-                    "variance",
-                    "unique_count",
-                    "percentile",
-                ]:
+                if step.get("operation") in TERMINAL_OPERATIONS:
                     return results
 
                 if isinstance(results, Dict):
                     results = [{"group": k, "docs": v} for k, v in results.items()]
 
             return results
+        except _SCAN_ERRORS:
+            raise  # e.g. a join over JOIN_MAX_MATCHES, whose cost feedback the planner needs
         except Exception as e:
-            _, _, exc_tb = sys.exc_info()
-            tb_list = traceback.extract_tb(exc_tb)
-            last_call = tb_list[-1] if tb_list else None
-            fn_name = last_call.name if last_call else "unknown"
-            return {"error": f"Summariser pipeline error [{fn_name}]: {str(e)}"}
+            return self._pipeline_error(e)
+
+    def stream_pipeline(
+        self,
+        pipeline: List[Dict[str, Any]],
+        pages: Iterator[List[Dict[str, Any]]],
+        project_id: Optional[str] = None,
+    ) -> Any:
+        """
+        Run a pipeline over pages of hits as they arrive, without keeping the hits.
+
+        Leading filter / project / skip / join steps are applied page by page. An aggregate
+        step then folds each page into its running state (SummariserTools._reducer),
+        and first_n / limit stop reading once they have enough documents; the steps
+        after them run on that small result through run_pipeline. Any other step
+        (e.g. sort) needs every document, so the remaining pages are read first.
+        """
+        try:
+            for position, step in enumerate(pipeline):
+                op = step.get("operation")
+                if op in PAGE_OPERATIONS:
+                    pages = self._map_pages(step, pages)
+                    continue
+                if op == "join":
+                    pages = self._join_pages(step, pages, project_id)
+                    continue
+                n = step.get("n")
+                if op == "skip" and isinstance(n, int) and n >= 0:
+                    pages = self._skip_pages(n, pages)
+                    continue
+
+                rest = pipeline[position + 1:]
+                reducer = self.summarizer._reducer(step)
+                if reducer is not None:
+                    state = reducer.init()
+                    for page in pages:
+                        state = reducer.update(state, page)
+                    results = reducer.finalize(state)
+                    if op in TERMINAL_OPERATIONS:
+                        return results
+                    return self.run_pipeline(
+                        rest, [{"group": k, "docs": v} for k, v in results.items()], project_id
+                    )
+
+                if op in ("first_n", "limit") and isinstance(n, int) and n >= 0:
+                    documents: List[Dict[str, Any]] = []
+                    if n > 0:
+                        for page in pages:
+                            documents.extend(page)
+                            if len(documents) >= n:
+                                break
+                    return self.run_pipeline(rest, documents[:n], project_id)
+
+                return self.run_pipeline(
+                    pipeline[position:], [doc for page in pages for doc in page], project_id
+                )
+
+            return [doc for page in pages for doc in page]
+        except _SCAN_ERRORS:
+            raise
+        except Exception as e:
+            return self._pipeline_error(e)
+
+    def _map_pages(self, step: Dict[str, Any], pages: Iterator[List[Dict[str, Any]]]):
+        for page in pages:
+            yield self.summarizer._execute_plan(step, page)
+
+    def _join_pages(
+        self,
+        step: Dict[str, Any],
+        pages: Iterator[List[Dict[str, Any]]],
+        project_id: Optional[str],
+    ):
+        for page in pages:
+            yield self.summarizer._execute_plan(self.lookup_join(step, page, project_id), page)
+
+    def lookup_join(
+        self,
+        step: Dict[str, Any],
+        documents: List[Dict[str, Any]],
+        project_id: Optional[str],
+    ) -> Dict[str, Any]:
+        """
+        The join step with `right` set to the documents of `index` whose `on` field
+        matches a `field` value of the documents.
+
+        Keys are looked up with batched terms filters, always scoped to the project.
+        """
+        index = step.get("index")
+        if not index or not step.get("field"):
+            raise ValueError("join steps need an `index` and the `field` holding the keys to join on")
+        if not self.is_valid_index(index):
+            raise ValueError(f"Invalid or restricted join index: {index}")
+        if not project_id:
+            raise ValueError("join lookups need a project_id")
+        schema = SchemaCatalog.get(index)
+        if schema is None:
+            raise ValueError(f"Could not retrieve mapping for index: {index}")
+
+        on = step.get("on") or "id"
+        info = schema.field(on)
+        on_field = info.keyword if info is not None and info.type == "text" and info.keyword else on
+
+        keys = set()
+        for doc in documents:
+            value = self.summarizer._extract_field(doc, step["field"])
+            for key in value if isinstance(value, list) else [value]:
+                if isinstance(key, (str, int, float, bool)):
+                    keys.add(key)
+
+        source = list(step.get("fields") or [])
+        if source and on not in source:
+            source.append(on)
+        right: List[Dict[str, Any]] = []
+        ordered = sorted(keys, key=str)
+        for start in range(0, len(ordered), JOIN_KEYS_PER_LOOKUP):
+            body: Dict[str, Any] = {
+                "query": {
+                    "bool": {
+                        "filter": [
+                            {"terms": {on_field: ordered[start:start + JOIN_KEYS_PER_LOOKUP]}},
+                            {"term": {"project_id": project_id}},
+                        ]
+                    }
+                },
+                "size": JOIN_MAX_MATCHES,
+                "track_total_hits": True,
+            }
+            if source:
+                body["_source"] = source
+            response = msearch.search(self.es, index, body)
+            hits = response["hits"]["hits"]
+            total = response["hits"]["total"]["value"]
+            if total > len(hits):
+                raise QueryCostExceeded("hits", total, JOIN_MAX_MATCHES)
+            right.extend(hits)
+        return {**step, "right": right}
+
+    def _skip_pages(self, n: int, pages: Iterator[List[Dict[str, Any]]]):
+        for page in pages:
+            if n >= len(page):
+                n -= len(page)
+                continue
+            yield page[n:]
+            n = 0
+
+    def _pipeline_error(self, e: Exception) -> Dict[str, str]:
+        tb_list = traceback.extract_tb(e.__traceback__)
+        last_call = tb_list[-1] if tb_list else None
+        fn_name = last_call.name if last_call else "unknown"
+        return {"error": f"Summariser pipeline error [{fn_name}]: {str(e)}"}
+
+    def push_down(
+        self,
+        index: str,
+        body: Dict[str, Any],
+        pipeline: List[Dict[str, Any]],
+        schema: IndexSchema,
+        project_id: Optional[str] = None,
+    ) -> Any:
+        """
+        Answer the first pipeline step with an ES aggregation and run the rest locally.
+
+        Returns None when the step cannot be pushed down (see aggregation_pushdown),
+        in which case the caller scans the matching documents instead.
+        """
+        if not pipeline or "aggs" in body or "aggregations" in body:
+            return None
+        step = pipeline[0]
+        plan = plan_pushdown(step, schema)
+        if plan is None:
+            return None
+
+        agg_body: Dict[str, Any] = {"query": body["query"], "size": 0}
+        if plan["aggs"]:
+            agg_body["aggs"] = plan["aggs"]
+        if plan["operation"] == "count" and plan["group_by"] is None:
+            agg_body["track_total_hits"] = True
+        try:
+            response = self.cached_search(index, agg_body, project_id)
+        except exceptions.RequestError:
+            return None
+        results = read_pushdown(plan, response)
+        if results is None:
+            return None
+
+        if step.get("operation") in TERMINAL_OPERATIONS:
+            return results
+        return self.run_pipeline(
+            pipeline[1:], [{"group": k, "docs": v} for k, v in results.items()], project_id
+        )
+
+    def approximate(
+        self,
+        index: str,
+        body: Dict[str, Any],
+        pipeline: List[Dict[str, Any]],
+        schema: IndexSchema,
+        project_id: Optional[str] = None,
+    ) -> Any:
+        """
+        Push down an ES approximation of the first step (query_cost.APPROXIMATIONS,
+        e.g. median as the 50th percentile), or None if there is none.
+        """
+        step = pipeline[0] if pipeline else None
+        rewrite = APPROXIMATIONS.get(step.get("operation")) if isinstance(step, dict) else None
+        if rewrite is None:
+            return None
+        return self.push_down(index, body, [rewrite(step)] + pipeline[1:], schema, project_id)
 
     def perform_query_and_summarise(
         self,
         index: str,
         body: Dict[str, Any],
         pipeline: List[Dict[str, Any]],
-        scroll_size: int = 1000,
-        scroll_timeout: str = "2m",
+        page_size: int = 1000,
+        keep_alive: str = "2m",
+        project_id: Optional[str] = None,
     ) -> Any:
         """
         Execute ES query safely and run summariser pipeline.
+
+        project_id scopes cached search responses to the project's DataVersion.
         """
         try:
             if not self.is_valid_index(index):
                 raise ValueError(f"Invalid or restricted index: {index}")
 
-            mapping = get_mapping(index)
-            if not mapping:
+            schema = SchemaCatalog.get(index)
+            if schema is None:
                 raise ValueError(f"Could not retrieve mapping for index: {index}")
 
-            body = self.rewrite_text_to_keyword(body, mapping)
-            self.validate_query(body)
-            body = self.sanitize_date_math(body)
+            body = self.rewrite_text_to_keyword(body, schema)
+            self.validate_query(body, schema)
+            body = self.round_date_math(self.sanitize_date_math(body))
 
             # Respect explicit size
             body = dict(body)
             requested_size = body.pop("size", None)
 
-            # If size = 0, we only care about aggregations; no scroll needed.
+            # If size = 0, we only care about aggregations; no paging needed.
             if requested_size == 0:
-                result = self.es.search(index=index, body=body)
+                if "aggs" in body or "aggregations" in body:
+                    body["size"] = 0
+                preflight(self.es, index, body, scan=False, page_size=0)
+                result = self.cached_search(index, body, project_id)
                 if "aggregations" in result:
                     aggs = self._flatten_aggregations(result["aggregations"])
-                    return self.run_pipeline(pipeline, aggs)
+                    return self.run_pipeline(pipeline, aggs, project_id)
                 docs = result.get("hits", {}).get("hits", [])
-                return self.run_pipeline(pipeline, docs)
+                return self.run_pipeline(pipeline, docs, project_id)
 
             if requested_size is not None:
-                scroll_size = requested_size
+                page_size = requested_size
 
             body.pop("track_total_hits", None)
 
-            result = self.es.search(
-                index=index,
-                body=body,
-                scroll=scroll_timeout,
-                size=scroll_size,
-            )
-            scroll_id = result.get("_scroll_id")
-            documents: List[Dict[str, Any]] = result.get("hits", {}).get("hits", [])
-
-            hard_scroll_limit = 10000
-            iterations = 0
-
-            while True:
-                iterations += 1
-                if iterations > hard_scroll_limit:
-                    break
-                if not scroll_id:
-                    break
+            # A leading grouped metric is answered by ES buckets, not documents
+            summary = self.push_down(index, body, pipeline, schema, project_id)
+            if summary is not None:
+                return summary
 
-                next_scroll = self.es.scroll(scroll_id=scroll_id, scroll=scroll_timeout)
-                hits = next_scroll.get("hits", {}).get("hits", [])
-                if not hits:
-                    break
-                documents.extend(hits)
-                scroll_id = next_scroll.get("_scroll_id")
-
-            summary = self.run_pipeline(pipeline, documents)
-            return summary
+            # Estimate the scan before reading it; one over the cost limits is only
+            # answered if an aggregation can approximate its first step
+            try:
+                estimate = preflight(self.es, index, body, True, page_size, pipeline)
+            except QueryCostExceeded:
+                summary = self.approximate(index, body, pipeline, schema, project_id)
+                if summary is None:
+                    raise
+                return summary
+            if estimate is not None:
+                page_size = estimate.page_size
+
+            # Unsorted scans are read as parallel PIT slices, one per shard
+            slices = 1 if body.get("sort") else self.scan_slices(index)
+            pages = BaseDatabase.shared_elastic().scan_pages(
+                index, body, page_size=page_size, keep_alive=keep_alive, slices=slices
+            )
+            try:
+                return self.stream_pipeline(pipeline, bounded_pages(pages), project_id)
+            finally:
+                pages.close()  # releases the PIT when first_n / limit stopped early
 
         except exceptions.AuthenticationException:
             raise PermissionError("Authentication failed for Elasticsearch")
@@ -467,6 +831,8 @@ class QueryAgent(Agent):
             raise PermissionError("Not authorized to query this index")
         except exceptions.RequestError as e:
             raise ValueError(f"Bad ES query request: {e.info}")
+        except QueryCostExceeded:
+            raise
         except Exception as e:
             _, _, exc_tb = sys.exc_info()
             tb_list = traceback.extract_tb(exc_tb)
@@ -476,7 +842,7 @@ class QueryAgent(Agent):
 
     # ---------- Agent API ----------
 
-    def handle_request(
+    async def handle_request(
         self,
         user_request: str,
         project_id: str,
@@ -484,25 +850,51 @@ class QueryAgent(Agent):
         """
         Main entrypoint.
 
-        1. Ask the LLM (via provider) for a JSON plan:
+        1. Reuse a cached plan for a recurring question, or ask the LLM
+           (via provider) for a JSON plan:
            - tool: "perform_elasticsearch_query"
            - input: { index, body, pipeline }
         2. Execute the ES query + pipeline locally.
         3. Return result + explanation + token usage.
+
+        The LLM call is awaited; mapping reads, searches and the pipeline are
+        blocking and run in worker threads.
         """
-        llm_req = build_db_agent_request(
-            index_metadata=self.index_metadata,
-            tools=self.tools,
-            db_tools_schema=self.db_tools_schema,
+        cache_key = PlanCache.key(user_request, self.services)
+        cached = await asyncio.to_thread(PlanCache.lookup, cache_key, project_id)
+        if cached is not None:
+            try:
+                response = await asyncio.to_thread(self.execute_plan, cached, project_id)
+                error = _plan_error(response)
+            except Exception as e:
+                error = str(e)
+            if error is None:
+                return {**response, "plan_cache": "hit"}
+            # the plan no longer verifies; plan the question again
+            PlanCache.reject(cache_key, error)
+
+        now = datetime.now()
+        llm_req = await asyncio.to_thread(
+            build_db_agent_request,
+            artifacts=self.artifacts,
             project_id=project_id,
             user_request=user_request,
             model=MODEL,
+            services=self.services,
+            now=now,
         )
 
         # Use provider to get JSON response
-        resp: JSONLLMResponse = self.generate_structured_response(llm_req)
+        resp: JSONLLMResponse = await self.generate_structured_response(llm_req)
         data = resp.json_data
 
+        response = await asyncio.to_thread(self.execute_plan, data, project_id)
+        if _plan_error(response) is None:
+            await asyncio.to_thread(PlanCache.store, cache_key, response["plan"], project_id, now)
+        return {**response, "plan_cache": "miss"}
+
+    def execute_plan(self, data: Dict[str, Any], project_id: str) -> Dict[str, Any]:
+        """Run a plan ({action: {tool, input}, explanation}) for a project."""
         # Extract tool call
         action = data.get("action", {}) or {}
         tool_name = action.get("tool")
@@ -526,13 +918,25 @@ class QueryAgent(Agent):
                     "raw_plan": data,
                     "token_usage": self.total_token_usage,
                 }
+            data = {**data, "action": {**action, "input": tool_input}}
 
         index = tool_input.get("index")
         body = tool_input.get("body", {}) or {}
         pipeline = tool_input.get("pipeline", []) or []
 
         body = self.add_project_id_filter(body, project_id)
-        result = self.perform_query_and_summarise(index, body, pipeline)
+        try:
+            result = self.perform_query_and_summarise(
+                index, body, pipeline, project_id=project_id
+            )
+        except QueryCostExceeded as e:
+            # structured, so the planner can narrow or aggregate its question
+            return {
+                "error": str(e),
+                "cost": e.feedback,
+                "raw_plan": data,
+                "token_usage": self.total_token_usage,
+            }
 
         # If result is a big list, clip to 10 for safety
         if isinstance(result, list) and len(result) > 10:
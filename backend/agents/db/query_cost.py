@@ -0,0 +1,252 @@
+"""
+Pre-flight cost guard for QueryAgent searches.
+
+Before a planned body runs, one cheap size-0 search estimates what it would cost:
+the hit count for document scans, plus cardinality aggregations for bodies with
+terms aggregations. The estimate is checked against per-query
+limits on hits, pages, bytes and buckets, and scans are also stopped at run time
+once they pass the hit, byte or wall-time limit. The byte estimate comes from the
+index's store size, which covers whole documents, so it is only made for bodies
+without a _source projection; projected scans are held to the limit by the size
+of the pages they actually read.
+
+A query over a limit raises QueryCostExceeded, whose `feedback` tells the planner
+which limit was hit and how to narrow the question. Before that, the QueryAgent
+tries to answer it as an aggregation (aggregation_pushdown, or an approximation
+from APPROXIMATIONS), and a scan that only needs more round trips than
+QUERY_MAX_PAGES reads larger pages instead.
+"""
+import json
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set
+
+from core.db import msearch
+from core.db.elastic import QueryBudgetExceeded
+from core.logger import Logger
+
+logger = Logger(__name__)
+
+COST_GUARD_ENABLED = os.getenv("QUERY_COST_GUARD_ENABLED", "true").lower() == "true"
+QUERY_MAX_HITS = int(os.getenv("QUERY_MAX_HITS", "200000"))
+QUERY_MAX_PAGES = int(os.getenv("QUERY_MAX_PAGES", "200"))
+QUERY_MAX_BYTES = int(os.getenv("QUERY_MAX_BYTES", str(256 * 1024 * 1024)))
+QUERY_MAX_SECONDS = float(os.getenv("QUERY_MAX_SECONDS", "60"))
+QUERY_MAX_BUCKETS = int(os.getenv("QUERY_MAX_BUCKETS", "10000"))
+MAX_PAGE_SIZE = 10000  # index.max_result_window
+
+# aggregations producing one bucket per term; the default size of ES is 10
+_TERMS_AGGREGATIONS = ("terms", "significant_terms", "rare_terms")
+_MULTI_BUCKET_AGGREGATIONS = ("multi_terms", "composite")
+_SINGLE_BUCKET_AGGREGATIONS = ("filter", "missing", "global", "nested", "reverse_nested", "sampler")
+
+_HINTS = {
+    "hits": "Narrow the question with a date range or filters, or ask for totals / counts "
+            "per group so it is answered by an aggregation instead of reading every document.",
+    "bytes": "Narrow the question with a date range or filters, or ask for fewer fields or "
+             "an aggregated answer.",
+    "buckets": "Group by a field with fewer distinct values, ask for the top N groups only, "
+               "or narrow the date range.",
+    "seconds": "Narrow the question with a date range or filters, or ask for an aggregated answer.",
+}
+
+# summariser steps an ES aggregation can approximate when a scan is too expensive
+APPROXIMATIONS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "median": lambda step: {**step, "operation": "percentile", "percentile": 50},
+}
+
+# index -> average stored bytes per document, read once per process
+_doc_sizes: Dict[str, float] = {}
+
+
+class QueryCostExceeded(QueryBudgetExceeded):
+    """A query estimated (or observed) to exceed one of the per-query limits."""
+
+    def __init__(self, limit: str, estimated: Any, maximum: Any):
+        super().__init__(f"Query exceeds the {limit} limit ({estimated} > {maximum})")
+        self.feedback = {
+            "limit": limit,
+            "estimated": estimated,
+            "max": maximum,
+            "hint": _HINTS.get(limit, _HINTS["hits"]),
+        }
+
+
+class CostEstimate(NamedTuple):
+    hits: int
+    pages: int
+    bytes: int
+    buckets: int
+    page_size: int  # page size to scan with, raised to stay within QUERY_MAX_PAGES
+
+
+# --- aggregations ---
+
+def _sub_aggs(spec: Dict[str, Any]) -> Dict[str, Any]:
+    sub = spec.get("aggs") or spec.get("aggregations") or {}
+    return sub if isinstance(sub, dict) else {}
+
+
+def _terms_fields(aggs: Dict[str, Any]) -> Set[str]:
+    fields: Set[str] = set()
+    for spec in aggs.values():
+        if not isinstance(spec, dict):
+            continue
+        for kind in _TERMS_AGGREGATIONS:
+            field = (spec.get(kind) or {}).get("field")
+            if isinstance(field, str):
+                fields.add(field)
+        fields |= _terms_fields(_sub_aggs(spec))
+    return fields
+
+
+def estimate_buckets(aggs: Dict[str, Any], cardinalities: Dict[str, int]) -> int:
+    """Buckets ES would build for an aggs tree (what search.max_buckets counts)."""
+    total = 0
+    for spec in aggs.values():
+        if not isinstance(spec, dict):
+            continue
+        count = 0
+        for kind in _TERMS_AGGREGATIONS + _MULTI_BUCKET_AGGREGATIONS:
+            if isinstance(spec.get(kind), dict):
+                size = spec[kind].get("size", 10)
+                size = size if isinstance(size, int) else 10
+                cardinality = cardinalities.get(spec[kind].get("field"))
+                count = min(size, cardinality) if cardinality is not None else size
+        if any(kind in spec for kind in _SINGLE_BUCKET_AGGREGATIONS):
+            count = 1
+        # histograms depend on the data range and are left to search.max_buckets
+        total += count + max(count, 1) * estimate_buckets(_sub_aggs(spec), cardinalities)
+    return total
+
+
+# --- estimation ---
+
+def scan_cap(pipeline: List[Dict[str, Any]]) -> Optional[int]:
+    """Documents a scan can stop after: leading skip / project steps and a first_n / limit."""
+    skipped = 0
+    for step in pipeline or []:
+        op = step.get("operation") if isinstance(step, dict) else None
+        n = step.get("n") if isinstance(step, dict) else None
+        if op == "project":
+            continue
+        if op == "skip" and isinstance(n, int) and n >= 0:
+            skipped += n
+            continue
+        if op in ("first_n", "limit") and isinstance(n, int) and n >= 0:
+            return skipped + n
+        return None
+    return None
+
+
+def _doc_size(es, index: str) -> float:
+    if index not in _doc_sizes:
+        try:
+            stats = es.indices.stats(index=index, metric="store,docs")
+            primaries = stats["_all"]["primaries"]
+            docs = primaries["docs"]["count"]
+            _doc_sizes[index] = primaries["store"]["size_in_bytes"] / docs if docs else 0.0
+        except Exception as e:
+            logger.debug(f"No store stats for {index}: {e}")
+            return 0.0
+    return _doc_sizes[index]
+
+
+def preflight(
+    es,
+    index: str,
+    body: Dict[str, Any],
+    scan: bool,
+    page_size: int,
+    pipeline: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[CostEstimate]:
+    """
+    Estimate the cost of a body and raise QueryCostExceeded if it is over a limit.
+
+    scan is True when every matching document would be paged to the summariser,
+    False for aggregation-only (size 0) bodies. Returns None when there is nothing
+    to estimate.
+    """
+    if not COST_GUARD_ENABLED:
+        return None
+    aggs = body.get("aggs") or body.get("aggregations") or {}
+    fields = sorted(_terms_fields(aggs)) if isinstance(aggs, dict) else []
+    if not scan and not fields:
+        return None
+
+    query = body.get("query", {"match_all": {}})
+    cardinalities: Dict[str, int] = {}
+    if fields:
+        probe = {
+            "query": query,
+            "size": 0,
+            "track_total_hits": True,
+            "aggs": {f"c{i}": {"cardinality": {"field": f}} for i, f in enumerate(fields)},
+        }
+        response = msearch.search(es, index, probe)
+        for i, field in enumerate(fields):
+            cardinalities[field] = int(response["aggregations"][f"c{i}"]["value"] or 0)
+    else:
+        # a size-0 search counts like _count and can share an _msearch
+        probe = {"query": query, "size": 0, "track_total_hits": True}
+        response = msearch.search(es, index, probe)
+    hits = response["hits"]["total"]["value"]
+
+    buckets = estimate_buckets(aggs, cardinalities) if isinstance(aggs, dict) else 0
+    if buckets > QUERY_MAX_BUCKETS:
+        raise QueryCostExceeded("buckets", buckets, QUERY_MAX_BUCKETS)
+    if not scan:
+        return CostEstimate(hits, 0, 0, buckets, page_size)
+
+    cap = scan_cap(pipeline or [])
+    if cap is not None:
+        hits = min(hits, cap)
+    if hits > QUERY_MAX_HITS:
+        raise QueryCostExceeded("hits", hits, QUERY_MAX_HITS)
+    size = 0
+    if not _projected(body):
+        size = int(hits * _doc_size(es, index))
+        if size > QUERY_MAX_BYTES:
+            raise QueryCostExceeded("bytes", size, QUERY_MAX_BYTES)
+
+    pages = math.ceil(hits / page_size) if page_size > 0 else 0
+    if pages > QUERY_MAX_PAGES:
+        # fewer, larger round trips for the same documents
+        page_size = min(MAX_PAGE_SIZE, math.ceil(hits / QUERY_MAX_PAGES))
+        pages = math.ceil(hits / page_size)
+        if pages > QUERY_MAX_PAGES:
+            raise QueryCostExceeded("hits", hits, QUERY_MAX_PAGES * MAX_PAGE_SIZE)
+    return CostEstimate(hits, pages, size, buckets, page_size)
+
+
+def _projected(body: Dict[str, Any]) -> bool:
+    """Whether the body restricts _source, so whole stored documents are not read."""
+    source = body.get("_source", True)
+    if isinstance(source, dict):
+        return bool(source.get("includes") or source.get("excludes"))
+    return source is not True
+
+
+def bounded_pages(
+    pages: Iterator[List[Dict[str, Any]]],
+    max_hits: int = QUERY_MAX_HITS,
+    max_seconds: float = QUERY_MAX_SECONDS,
+    max_bytes: int = QUERY_MAX_BYTES,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Stop a scan that passes the hit, byte or wall-time limit while it runs."""
+    started = time.monotonic()
+    rows = 0
+    size = 0
+    for page in pages:
+        rows += len(page)
+        if COST_GUARD_ENABLED:
+            size += len(json.dumps([hit.get("_source") for hit in page], default=str))
+        elapsed = time.monotonic() - started
+        if COST_GUARD_ENABLED and rows > max_hits:
+            raise QueryCostExceeded("hits", rows, max_hits)
+        if COST_GUARD_ENABLED and size > max_bytes:
+            raise QueryCostExceeded("bytes", size, max_bytes)
+        if COST_GUARD_ENABLED and elapsed > max_seconds:
+            raise QueryCostExceeded("seconds", round(elapsed, 1), max_seconds)
+        yield page
@@ -0,0 +1,232 @@
+"""
+Selects the indices and fields a QueryAgent prompt needs.
+
+The full ES_SCHEMA (every Stripe, PayPal, Xero and bank-statement index, with
+analysis settings) used to be serialized into every QueryAgent call. The retriever
+keeps only the indices of the services the planner runs for, ranks them against the
+question by keyword overlap with index names, descriptions and field names
+(plus an optional local embedding model), and renders a compact digest:
+one line per index and `field:type` pairs instead of raw mapping JSON.
+"""
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core.logger import Logger
+from core.schema_catalog import IndexSchema, SchemaCatalog
+
+logger = Logger(__name__)
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+QUERY_SCHEMA_MAX_INDICES = int(os.getenv("QUERY_SCHEMA_MAX_INDICES", "6"))
+QUERY_SCHEMA_MAX_FIELDS = int(os.getenv("QUERY_SCHEMA_MAX_FIELDS", "40"))
+# e.g. "all-MiniLM-L6-v2"; empty disables the embedding score
+QUERY_SCHEMA_EMBEDDING_MODEL = os.getenv("QUERY_SCHEMA_EMBEDDING_MODEL", "")
+EMBEDDING_WEIGHT = 4.0
+
+# question words -> words that appear in index and field names
+_SYNONYMS = {
+    "revenue": {"amount", "paid", "total", "invoice", "charge", "revenue"},
+    "income": {"amount", "paid", "total", "invoice", "charge"},
+    "sale": {"amount", "paid", "invoice", "charge"},
+    "mrr": {"subscription", "mrr", "plan", "price", "interval", "amount"},
+    "arr": {"subscription", "mrr", "plan", "price", "interval", "amount"},
+    "churn": {"subscription", "timeline", "canceled", "cancel", "status", "ended"},
+    "cancellation": {"subscription", "canceled", "cancel", "ended"},
+    "upgrade": {"subscription", "timeline", "change"},
+    "downgrade": {"subscription", "timeline", "change", "downgrade"},
+    "client": {"customer", "contact"},
+    "user": {"customer", "email", "name"},
+    "spend": {"amount", "debit", "category"},
+    "expense": {"amount", "debit", "category"},
+    "fee": {"fee", "balance", "transaction"},
+    "month": {"created", "date", "period"},
+    "year": {"created", "date", "period"},
+    "week": {"created", "date", "period"},
+    "day": {"created", "date"},
+    "recent": {"created", "date"},
+}
+
+_STOP_WORDS = {
+    "the", "a", "an", "of", "in", "on", "for", "to", "and", "or", "by", "with", "what",
+    "how", "many", "much", "is", "are", "was", "were", "my", "our", "me", "show", "give",
+    "list", "last", "this", "per", "from", "all", "each", "which", "who", "did", "do",
+    "does", "have", "has", "top", "total",
+}
+
+
+def _tokens(text: str) -> Set[str]:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words} - _STOP_WORDS
+
+
+def _query_tokens(question: str) -> Set[str]:
+    tokens = _tokens(question)
+    for token in list(tokens):
+        tokens |= _SYNONYMS.get(token, set())
+    return tokens
+
+
+def _field_descriptions(properties: Dict[str, Any], prefix: str = "") -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for name, spec in properties.items():
+        if not isinstance(spec, dict):
+            continue
+        if spec.get("description"):
+            out[prefix + name] = spec["description"]
+        if "properties" in spec:
+            out.update(_field_descriptions(spec["properties"], f"{prefix}{name}."))
+    return out
+
+
+class _IndexEntry:
+    def __init__(self, index: str, description: str, mapping: Dict[str, Any]):
+        self.index = index
+        self.description = description
+        self.static_schema = IndexSchema(index, mapping)
+        self.field_descriptions = _field_descriptions(mapping.get("properties", {}))
+        self.name_tokens = _tokens(index.split("_", 1)[-1])
+        self.description_tokens = _tokens(description)
+
+
+class SchemaRetriever:
+    """Built once per process from ES_SCHEMA; select() and digest() run per call."""
+
+    def __init__(
+        self,
+        es_schema: Iterable[Dict[str, Any]],
+        schema_source: Callable[[str], Optional[IndexSchema]] = SchemaCatalog.get,
+    ):
+        self.schema_source = schema_source
+        self.entries: Dict[str, _IndexEntry] = {}
+        for item in es_schema or []:
+            index = item.get("index")
+            if not index:
+                continue
+            mapping = (item.get("index_body") or {}).get("mappings", {})
+            self.entries[index] = _IndexEntry(index, item.get("description") or "", mapping)
+
+        # index -> (schema the tokens were computed from, tokens per field, all of them)
+        self._field_tokens: Dict[str, Tuple[IndexSchema, Dict[str, Set[str]], Set[str]]] = {}
+
+        self.model = None
+        self.embeddings: Optional[np.ndarray] = None
+        if QUERY_SCHEMA_EMBEDDING_MODEL and SentenceTransformer is not None:
+            try:
+                self.model = SentenceTransformer(QUERY_SCHEMA_EMBEDDING_MODEL)
+                texts = [
+                    f"{e.index.replace('_', ' ')}. {e.description} "
+                    + " ".join(p.replace("_", " ") for p in e.static_schema.fields)
+                    for e in self.entries.values()
+                ]
+                self.embeddings = self.model.encode(texts, normalize_embeddings=True)
+            except Exception as e:
+                logger.error(f"Schema embedding index disabled: {e}")
+                self.model = None
+
+    # --- selection ---
+
+    def scope(self, services: Optional[List[str]]) -> List[str]:
+        """Indices of the given services (by name prefix), or all if none match."""
+        if services:
+            prefixes = tuple(f"{s.lower()}_" for s in services if s)
+            scoped = [i for i in self.entries if i.startswith(prefixes)]
+            if scoped:
+                return scoped
+        return list(self.entries)
+
+    def select(self, question: str, services: Optional[List[str]] = None) -> List[str]:
+        """The most relevant indices for a question, in ES_SCHEMA order."""
+        candidates = self.scope(services)
+        if len(candidates) <= QUERY_SCHEMA_MAX_INDICES:
+            return candidates
+
+        tokens = _query_tokens(question)
+        scores = {index: self._keyword_score(index, tokens) for index in candidates}
+        if self.model is not None:
+            query = self.model.encode([question], normalize_embeddings=True)[0]
+            positions = {index: i for i, index in enumerate(self.entries)}
+            for index in candidates:
+                scores[index] += EMBEDDING_WEIGHT * float(self.embeddings[positions[index]] @ query)
+
+        ranked = sorted(candidates, key=lambda i: -scores[i])
+        chosen = [i for i in ranked if scores[i] > 0][:QUERY_SCHEMA_MAX_INDICES]
+        if not chosen:
+            chosen = ranked[:QUERY_SCHEMA_MAX_INDICES]
+        return [i for i in candidates if i in chosen]
+
+    def _keyword_score(self, index: str, tokens: Set[str]) -> float:
+        entry = self.entries[index]
+        field_tokens = self._field_token_index(index)[2]
+        return (
+            3.0 * len(tokens & entry.name_tokens)
+            + 1.0 * len(tokens & entry.description_tokens)
+            + 0.5 * len(tokens & field_tokens)
+        )
+
+    def _field_token_index(self, index: str) -> Tuple[IndexSchema, Dict[str, Set[str]], Set[str]]:
+        schema = self._schema(index)
+        cached = self._field_tokens.get(index)
+        if cached is None or cached[0] is not schema:
+            by_field = {path: _tokens(path) for path in schema.fields}
+            cached = (schema, by_field, set().union(*by_field.values()))
+            self._field_tokens[index] = cached
+        return cached
+
+    def _schema(self, index: str) -> IndexSchema:
+        """The live mapping when available (it has dynamic fields), else ES_SCHEMA's."""
+        live = self.schema_source(index) if self.schema_source else None
+        return live or self.entries[index].static_schema
+
+    # --- rendering ---
+
+    def digest(self, question: str, services: Optional[List[str]] = None) -> str:
+        """Compact description of the selected indices and their most relevant fields."""
+        tokens = _query_tokens(question)
+        return "\n\n".join(
+            self.index_digest(index, tokens) for index in self.select(question, services)
+        )
+
+    def index_digest(self, index: str, tokens: Set[str]) -> str:
+        entry = self.entries[index]
+        schema, field_tokens, _ = self._field_token_index(index)
+        parents = {path.rpartition(".")[0] for path in schema.fields}
+        # leaf fields, plus objects whose fields are dynamic and not mapped yet;
+        # .keyword subfields are folded into their text field as "+kw"
+        fields = [
+            (path, info) for path, info in schema.fields.items()
+            if info.type is not None
+            and not (info.type in ("object", "nested") and path in parents)
+            and not self._is_keyword_subfield(schema, path)
+        ]
+        order = {path: n for n, (path, _) in enumerate(fields)}
+        if len(fields) > QUERY_SCHEMA_MAX_FIELDS:
+            fields = sorted(
+                fields,
+                key=lambda f: (-len(tokens & field_tokens[f[0]]), f[0].count("."), order[f[0]]),
+            )[:QUERY_SCHEMA_MAX_FIELDS]
+            fields.sort(key=lambda f: order[f[0]])
+
+        parts = []
+        for path, info in fields:
+            part = f"{path}:{info.type}"
+            if info.type == "text" and info.keyword:
+                part += "+kw"
+            description = entry.field_descriptions.get(path)
+            if description:
+                part += f" ({description})"
+            parts.append(part)
+        header = f"{index}" + (f" - {entry.description}" if entry.description else "")
+        return header + "\n  " + ", ".join(parts)
+
+    @staticmethod
+    def _is_keyword_subfield(schema: IndexSchema, path: str) -> bool:
+        parent, _, name = path.rpartition(".")
+        info = schema.field(parent) if name == "keyword" else None
+        return info is not None and info.type == "text"
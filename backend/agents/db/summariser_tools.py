@@ -3,7 +3,283 @@
 import statistics
 from collections import defaultdict
 from datetime import datetime
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Largest integer magnitude float64 represents exactly
+_EXACT_FLOAT_INT = 2**53
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=1024)
+def _compile_path(field: str) -> Callable[[Any], Any]:
+    """Accessor for a dotted field path, split once and reused for every document."""
+    keys = tuple(field.split("."))
+
+    def get(doc: Any):
+        # Fast path: plain dicts all the way down
+        value = doc
+        if type(value) is dict:
+            if "_source" in value:
+                value = value["_source"]
+            for key in keys:
+                if type(value) is not dict:
+                    break
+                value = value.get(key, _MISSING)
+                if value is _MISSING:
+                    return None
+            else:
+                return value
+        return walk(doc)
+
+    def walk(doc: Any):
+        if isinstance(doc, list):
+            return [get(d) for d in doc]
+
+        if isinstance(doc, dict) and "_source" in doc:
+            doc = doc["_source"]
+
+        if not isinstance(doc, dict):
+            return None
+
+        value: Any = doc
+        for key in keys:
+            if isinstance(value, dict) and key in value:
+                value = value[key]
+            elif isinstance(value, list):
+                value = [v.get(key) for v in value if isinstance(v, dict) and key in v]
+            else:
+                return None
+        return value
+
+    return get
+
+
+@lru_cache(maxsize=1024)
+def _group_key(group_by: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Group of a document source: its group_by key, or for a dotted path that is not
+    a key itself, the nested value (e.g. fields attached by a join).
+    """
+    if "." not in group_by:
+        return lambda base: base.get(group_by, "UNKNOWN")
+    path = _compile_path(group_by)
+
+    def key(base: Dict[str, Any]):
+        if group_by in base:
+            return base[group_by]
+        value = path(base)
+        if value is None:
+            return "UNKNOWN"
+        return tuple(value) if isinstance(value, list) else value
+
+    return key
+
+
+class _Column:
+    """
+    One field extracted once from every document, with the documents' group codes.
+
+    When every present value is an int or every one is a float (no NaN), `array`
+    holds them as a NumPy array and `homogeneous` is set; order-based results then
+    come from NumPy and match the Python operations exactly. Mixed int/float columns
+    still get `array` (float64, exact) for sums and distinct counts.
+    Everything else falls back to per-group Python lists.
+    """
+
+    def __init__(self, codes: np.ndarray, keys: List[Any], values: List[Any]):
+        self.keys = keys
+        present = [i for i, v in enumerate(values) if v is not None]
+        self.values = [values[i] for i in present]
+        self.codes = codes[present] if len(present) != len(values) else codes
+        self.kind: Optional[str] = None
+        self.array: Optional[np.ndarray] = None
+        self._groups: Optional[List[List[Any]]] = None
+
+        types = set(map(type, self.values))
+        try:
+            if types == {int}:
+                self.array, self.kind = np.array(self.values, dtype=np.int64), "int"
+            elif types == {float}:
+                array = np.array(self.values, dtype=np.float64)
+                if not np.isnan(array).any():
+                    self.array, self.kind = array, "float"
+            elif types == {int, float}:
+                if all(type(v) is float or -_EXACT_FLOAT_INT <= v <= _EXACT_FLOAT_INT for v in self.values):
+                    array = np.array(self.values, dtype=np.float64)
+                    if not np.isnan(array).any():
+                        self.array, self.kind = array, "mixed"
+        except OverflowError:
+            self.array, self.kind = None, None
+
+    @property
+    def homogeneous(self) -> bool:
+        return self.kind in ("int", "float")
+
+    def groups(self) -> List[List[Any]]:
+        """Present values per group, in document order."""
+        if self._groups is None:
+            self._groups = [[] for _ in self.keys]
+            for code, value in zip(self.codes.tolist(), self.values):
+                self._groups[code].append(value)
+        return self._groups
+
+    def sorted_groups(self, descending: bool = False):
+        """Yield (key, indices into array) per group, values sorted stably."""
+        # Negating floats keeps ties (0.0 / -0.0) in document order like max();
+        # equal ints are indistinguishable, so they are simply reversed.
+        negate = descending and self.kind != "int"
+        order = np.lexsort((-self.array if negate else self.array, self.codes))
+        bounds = np.searchsorted(self.codes[order], np.arange(len(self.keys) + 1))
+        for position, key in enumerate(self.keys):
+            idx = order[bounds[position]:bounds[position + 1]]
+            yield key, idx[::-1] if descending and not negate else idx
+
+
+def _percentile_of(plan: Dict[str, Any]) -> float:
+    percentile = plan.get("percentile")
+    if percentile is None or not (0 <= percentile <= 100):
+        raise ValueError("percentile must be between 0 and 100")
+    return percentile
+
+
+class _Reducer:
+    """
+    Incremental form of an aggregate operation, for results that arrive in pages.
+
+    init() returns an empty state, update(state, page) folds a page of documents in,
+    merge(state, other) folds another state in and finalize(state) returns what the
+    operation returns for every document seen. A state holds one partial per group,
+    in first-seen order, so group keys come out in the order the operation uses.
+    """
+
+    def __init__(self, tools: "SummariserTools", plan: Dict[str, Any]):
+        self.tools = tools
+        self.plan = plan
+
+    def init(self) -> Dict[str, Any]:
+        # an empty page still has the "all" group when there is no group_by
+        return self.merge({"keys": {}, "partials": []}, self._page_state([]))
+
+    def update(self, state: Dict[str, Any], page: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self.merge(state, self._page_state(page))
+
+    def merge(self, state: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+        positions, partials = state["keys"], state["partials"]
+        for key, partial in zip(other["keys"], other["partials"]):
+            position = positions.setdefault(key, len(partials))
+            if position == len(partials):
+                partials.append(partial)
+            else:
+                partials[position] = self._combine(partials[position], partial)
+        return state
+
+    def finalize(self, state: Dict[str, Any]) -> Dict:
+        return self._result(list(state["keys"]), state["partials"])
+
+    # --- per operation ---
+
+    def _page_state(self, page: List[Dict[str, Any]]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _combine(self, partial: Any, other: Any) -> Any:
+        raise NotImplementedError
+
+    def _result(self, keys: List[Any], partials: List[Any]) -> Dict:
+        return dict(zip(keys, partials))
+
+
+class _CountReducer(_Reducer):
+    def _page_state(self, page):
+        codes, keys, _ = self.tools._factorize(page, self.plan.get("group_by"))
+        return {"keys": keys, "partials": np.bincount(codes, minlength=len(keys)).tolist()}
+
+    def _combine(self, partial, other):
+        return partial + other
+
+
+class _SumReducer(_Reducer):
+    """Float totals are added page by page, so they can differ from sum() in the last bits."""
+
+    def _page_state(self, page):
+        col = self.tools._column(self.plan, page)
+        return {"keys": col.keys, "partials": list(self.tools._sum_column(self.plan, col).values())}
+
+    def _combine(self, partial, other):
+        return partial + other
+
+
+class _ExtremeReducer(_Reducer):
+    """min / max: the first smallest (largest) value of each group, like min() / max()."""
+
+    def _page_state(self, page):
+        col = self.tools._column(self.plan, page)
+        pick = min if self.plan["operation"] == "min" else max
+        return {"keys": col.keys, "partials": [pick(vals) if vals else _MISSING for vals in col.groups()]}
+
+    def _combine(self, partial, other):
+        if partial is _MISSING:
+            return other
+        if other is _MISSING:
+            return partial
+        return (min if self.plan["operation"] == "min" else max)(partial, other)
+
+    def _result(self, keys, partials):
+        if self.plan["operation"] == "min":
+            return {g: v for g, v in zip(keys, partials) if v is not _MISSING}
+        return {g: None if v is _MISSING else v for g, v in zip(keys, partials)}
+
+
+class _DistinctReducer(_Reducer):
+    def _page_state(self, page):
+        col = self.tools._column(self.plan, page)
+        return {"keys": col.keys, "partials": [set(vals) for vals in col.groups()]}
+
+    def _combine(self, partial, other):
+        partial |= other
+        return partial
+
+    def _result(self, keys, partials):
+        return {g: len(values) for g, values in zip(keys, partials)}
+
+
+class _ValuesReducer(_Reducer):
+    """
+    Operations that need every value of a group (avg, median, mode, stddev, variance,
+    percentile) keep the extracted values only, never the documents.
+    """
+
+    def _page_state(self, page):
+        col = self.tools._column(self.plan, page)
+        return {"keys": col.keys, "partials": col.groups()}
+
+    def _combine(self, partial, other):
+        partial.extend(other)
+        return partial
+
+    def _result(self, keys, partials):
+        codes = np.repeat(np.arange(len(keys), dtype=np.int64), [len(vals) for vals in partials])
+        col = _Column(codes, keys, [v for vals in partials for v in vals])
+        finalize = getattr(self.tools, f"_{self.plan['operation']}_column")
+        return finalize(self.plan, col)
+
+
+_REDUCERS = {
+    "count": _CountReducer,
+    "sum": _SumReducer,
+    "min": _ExtremeReducer,
+    "max": _ExtremeReducer,
+    "unique_count": _DistinctReducer,
+    "avg": _ValuesReducer,
+    "median": _ValuesReducer,
+    "mode": _ValuesReducer,
+    "stddev": _ValuesReducer,
+    "variance": _ValuesReducer,
+    "percentile": _ValuesReducer,
+}
 
 
 class SummariserTools:
@@ -38,25 +314,7 @@ class SummariserTools:
         Extract the value of a specific (possibly nested) field from a document or list of documents.
         Supports ES hit structure with '_source'.
         """
-        if isinstance(doc, list):
-            return [self._extract_field(d, field) for d in doc]
-
-        if isinstance(doc, dict) and "_source" in doc:
-            doc = doc["_source"]
-
-        if not isinstance(doc, dict):
-            return None
-
-        keys = field.split(".")
-        value: Any = doc
-        for key in keys:
-            if isinstance(value, dict) and key in value:
-                value = value[key]
-            elif isinstance(value, list):
-                value = [v.get(key) for v in value if isinstance(v, dict) and key in v]
-            else:
-                return None
-        return value
+        return _compile_path(field)(doc)
 
     def group_docs(self, docs: List[Dict[str, Any]], group_by: str):
         if not group_by:
@@ -64,162 +322,98 @@ class SummariserTools:
                 "all": [doc["_source"] if "_source" in doc else doc for doc in docs]
             }
         grouped: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        key_of = _group_key(group_by)
         for doc in docs:
             base = doc["_source"] if "_source" in doc else doc
-            key = base.get(group_by, "UNKNOWN")
-            grouped[key].append(doc)
+            grouped[key_of(base)].append(doc)
         return grouped
 
+    def _factorize(self, docs: List[Dict[str, Any]], group_by: str):
+        """
+        Factorized form of group_docs: (codes, keys, docs to extract from).
+
+        codes[i] is the position in keys of the group of docs[i]; keys keep the
+        first-seen order group_docs produces.
+        """
+        if not group_by:
+            bases = [doc["_source"] if "_source" in doc else doc for doc in docs]
+            return np.zeros(len(docs), dtype=np.int64), ["all"], bases
+        positions: Dict[Any, int] = {}
+        setdefault = positions.setdefault
+        key_of = _group_key(group_by)
+        codes = [
+            setdefault(key_of(doc["_source"] if "_source" in doc else doc), len(positions))
+            for doc in docs
+        ]
+        return np.array(codes, dtype=np.int64), list(positions), docs
+
+    def _reducer(self, plan: Dict[str, Any]) -> Optional[_Reducer]:
+        """Incremental form of an aggregate step, or None for the other operations."""
+        reducer = _REDUCERS.get(plan.get("operation"))
+        if reducer is None:
+            return None
+        if plan["operation"] != "count" and not plan.get("field"):
+            return None
+        if plan["operation"] == "percentile":
+            _percentile_of(plan)
+        return reducer(self, plan)
+
+    def _column(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> "_Column":
+        codes, keys, docs = self._factorize(results, plan.get("group_by"))
+        get = _compile_path(plan["field"])
+        return _Column(codes, keys, list(map(get, docs)))
+
     # --- operations ---
 
     def sum(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, float] = {}
-        for g, docs in grouped.items():
-            total = 0.0
-            for d in docs:
-                val = self._extract_field(d, plan["field"])
-                if val is not None:
-                    total += val
-            out[g] = total
-        return out
+        return self._sum_column(plan, self._column(plan, results))
 
     def avg(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, float] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            if vals:
-                out[g] = statistics.mean(vals)
-        return out
+        return self._avg_column(plan, self._column(plan, results))
 
     def count(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        return {g: len(docs) for g, docs in grouped.items()}
+        codes, keys, _ = self._factorize(results, plan.get("group_by"))
+        return dict(zip(keys, np.bincount(codes, minlength=len(keys)).tolist()))
 
     def min(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, Any] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            if vals:
-                out[g] = min(vals)
-        return out
+        col = self._column(plan, results)
+        if col.homogeneous:
+            return {g: col.array[idx[0]].item() for g, idx in col.sorted_groups() if len(idx)}
+        return {g: min(vals) for g, vals in zip(col.keys, col.groups()) if vals}
 
     def max(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, Any] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            if vals:
-                out[g] = max(vals)
-            else:
-                out[g] = None
-        return out
+        col = self._column(plan, results)
+        if col.homogeneous:
+            return {
+                g: col.array[idx[0]].item() if len(idx) else None
+                for g, idx in col.sorted_groups(descending=True)
+            }
+        return {g: max(vals) if vals else None for g, vals in zip(col.keys, col.groups())}
 
     def median(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, Any] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            if vals:
-                out[g] = statistics.median(vals)
-        return out
+        return self._median_column(plan, self._column(plan, results))
 
     def mode(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, Any] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            try:
-                out[g] = statistics.mode(vals)
-            except statistics.StatisticsError:
-                out[g] = None
-        return out
+        return self._mode_column(plan, self._column(plan, results))
 
     def stddev(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, float] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            if vals:
-                out[g] = statistics.pstdev(vals)
-        return out
+        return self._stddev_column(plan, self._column(plan, results))
 
     def variance(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, float] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            if vals:
-                out[g] = statistics.pvariance(vals)
-        return out
+        return self._variance_column(plan, self._column(plan, results))
 
     def unique_count(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, int] = {}
-        for g, docs in grouped.items():
-            vals = [
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            ]
-            out[g] = len(set(vals))
-        return out
+        col = self._column(plan, results)
+        if col.kind is not None:
+            out: Dict[Any, int] = {}
+            for g, idx in col.sorted_groups():
+                values = col.array[idx]
+                out[g] = int(np.count_nonzero(values[1:] != values[:-1])) + 1 if len(values) else 0
+            return out
+        return {g: len(set(vals)) for g, vals in zip(col.keys, col.groups())}
 
     def percentile(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict:
-        percentile = plan.get("percentile")
-        if percentile is None or not (0 <= percentile <= 100):
-            raise ValueError("percentile must be between 0 and 100")
-
-        grouped = self.group_docs(results, plan.get("group_by"))
-        out: Dict[Any, Any] = {}
-
-        for g, docs in grouped.items():
-            values = sorted(
-                self._extract_field(d, plan["field"])
-                for d in docs
-                if self._extract_field(d, plan["field"]) is not None
-            )
-            if not values:
-                out[g] = None
-                continue
-            k = (len(values) - 1) * (percentile / 100.0)
-            f = int(k)
-            c = min(f + 1, len(values) - 1)
-            if f == c:
-                out[g] = values[f]
-            else:
-                out[g] = values[f] + (values[c] - values[f]) * (k - f)
-        return out
+        return self._percentile_column(plan, self._column(plan, results))
 
     def sort(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> List:
         field = plan.get("field")
@@ -307,3 +501,115 @@ class SummariserTools:
     def limit(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> List:
         n = plan.get("n", len(results))
         return results[:n]
+
+    def join(self, plan: Dict[str, Any], results: List[Dict[str, Any]]) -> List:
+        """
+        Hash join the documents with documents of another index, in memory.
+
+        Keys: `index` (the other index), `field` (join key in these documents),
+        `on` (key field in the other index, default "id"), `fields` (fields to read
+        from the other index), `as` (name the matched document is attached under,
+        default "joined"), `how` ("left" keeps documents without a match with
+        `as` set to null, "inner" drops them; default "left").
+        Later steps reach joined fields by dotted path, e.g. group_by
+        "customer.address.country". The other index is read with one batched
+        terms lookup (scoped to the project) per page of documents.
+        """
+        right = plan.get("right")
+        if right is None:
+            raise ValueError("join needs the documents of its lookup on `index`")
+        get_left = _compile_path(plan.get("field") or "")
+        get_right = _compile_path(plan.get("on") or "id")
+        name = plan.get("as") or "joined"
+        inner = plan.get("how", "left") == "inner"
+
+        table: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        for doc in right:
+            key = get_right(doc)
+            if key is not None and not isinstance(key, (list, dict)):
+                table[key].append(doc["_source"] if "_source" in doc else doc)
+
+        joined: List[Dict[str, Any]] = []
+        for doc in results:
+            base = doc["_source"] if "_source" in doc else doc
+            key = get_left(doc)
+            matches = table.get(key) if not isinstance(key, (list, dict)) else None
+            if not matches:
+                if not inner:
+                    joined.append({**base, name: None})
+                continue
+            for match in matches:
+                joined.append({**base, name: match})
+        return joined
+
+    # --- column forms, shared with the incremental reducers ---
+
+    def _sum_column(self, plan: Dict[str, Any], col: _Column) -> Dict:
+        if col.kind is not None:
+            # bincount accumulates each bin in document order, like the scalar loop
+            totals = np.bincount(
+                col.codes, weights=col.array.astype(np.float64), minlength=len(col.keys)
+            )
+            return dict(zip(col.keys, totals.tolist()))
+        out: Dict[Any, float] = {}
+        for g, vals in zip(col.keys, col.groups()):
+            total = 0.0
+            for val in vals:
+                total += val
+            out[g] = total
+        return out
+
+    def _avg_column(self, plan: Dict[str, Any], col: _Column) -> Dict:
+        # statistics.mean is exact (rational) arithmetic; kept for identical results
+        return {g: statistics.mean(vals) for g, vals in zip(col.keys, col.groups()) if vals}
+
+    def _median_column(self, plan: Dict[str, Any], col: _Column) -> Dict:
+        if not col.homogeneous:
+            return {g: statistics.median(vals) for g, vals in zip(col.keys, col.groups()) if vals}
+        out: Dict[Any, Any] = {}
+        for g, idx in col.sorted_groups():
+            n = len(idx)
+            if not n:
+                continue
+            if n % 2 == 1:
+                out[g] = col.array[idx[n // 2]].item()
+            else:
+                out[g] = (col.array[idx[n // 2 - 1]].item() + col.array[idx[n // 2]].item()) / 2
+        return out
+
+    def _mode_column(self, plan: Dict[str, Any], col: _Column) -> Dict:
+        out: Dict[Any, Any] = {}
+        for g, vals in zip(col.keys, col.groups()):
+            try:
+                out[g] = statistics.mode(vals)
+            except statistics.StatisticsError:
+                out[g] = None
+        return out
+
+    def _stddev_column(self, plan: Dict[str, Any], col: _Column) -> Dict:
+        # statistics.pstdev is exact (rational) arithmetic; kept for identical results
+        return {g: statistics.pstdev(vals) for g, vals in zip(col.keys, col.groups()) if vals}
+
+    def _variance_column(self, plan: Dict[str, Any], col: _Column) -> Dict:
+        return {g: statistics.pvariance(vals) for g, vals in zip(col.keys, col.groups()) if vals}
+
+    def _percentile_column(self, plan: Dict[str, Any], col: _Column) -> Dict:
+        percentile = _percentile_of(plan)
+        if col.homogeneous:
+            groups = ((g, col.array[idx].tolist()) for g, idx in col.sorted_groups())
+        else:
+            groups = ((g, sorted(vals)) for g, vals in zip(col.keys, col.groups()))
+
+        out: Dict[Any, Any] = {}
+        for g, values in groups:
+            if not values:
+                out[g] = None
+                continue
+            k = (len(values) - 1) * (percentile / 100.0)
+            f = int(k)
+            c = min(f + 1, len(values) - 1)
+            if f == c:
+                out[g] = values[f]
+            else:
+                out[g] = values[f] + (values[c] - values[f]) * (k - f)
+        return out
@@ -1,13 +1,15 @@
 import json
 from datetime import datetime
+from typing import Awaitable, Callable, Optional
 
-from llm.agent import Agent
+from llm.agent import AsyncAgent
 from llm.message import (
     LLMMessage,
     LLMMessageRole,
     LLMRequest,
 )
 from llm.prompt_template import PromptTemplate
+from llm.utils.json import JSONStringFieldStream
 
 from .prompts.finaliser import ROUTER_AGENT_FINALISER_PROMPT
 
@@ -16,7 +18,7 @@ MODEL_NAME = "gpt-5.1"
 REASONING_EFFORT = "none"
 
 
-class FinaliserAgent(Agent):
+class FinaliserAgent(AsyncAgent):
     def planner_prompt(self):
         return PromptTemplate(ROUTER_AGENT_FINALISER_PROMPT)
 
@@ -43,18 +45,32 @@ class FinaliserAgent(Agent):
 
         return user_context_template.bind(agent_response=json.dumps(agent_response))
 
-    def finalise_response(self, user_query: str, agent_response: dict):
-        # SYSTEM PROMPT
-        system_prompt = (
-            self.planner_prompt()
-            + self.user_context_prompt(user_query)
-            + self.agents_response_context_prompt(agent_response)
-        )
+    async def finalise_response(
+        self,
+        user_query: str,
+        agent_response: dict,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    ):
+        """
+        The finaliser's JSON reply as text. With on_delta, the reply is streamed and
+        its final_answer is passed to on_delta as it is generated.
+        """
+        # SYSTEM PROMPT: static instructions first, for the provider's prompt cache;
+        # the query, time and agent responses follow as the user message
+        context_prompt = self.user_context_prompt(
+            user_query
+        ) + self.agents_response_context_prompt(agent_response)
         messages = []
         messages.append(
             LLMMessage(
                 LLMMessageRole.SYSTEM,
-                content=system_prompt.render(),
+                content=self.planner_prompt().render(),
+            )
+        )
+        messages.append(
+            LLMMessage(
+                LLMMessageRole.USER,
+                content=context_prompt.render(),
             )
         )
 
@@ -66,6 +82,16 @@ class FinaliserAgent(Agent):
             },
         )
 
-        # Generate React Loop Response
-        response = self.generate_response(request)
+        if on_delta is None:
+            response = await self.generate_response(request)
+            return response.text
+
+        final_answer = JSONStringFieldStream("final_answer")
+
+        async def forward(chunk: str):
+            text = final_answer.feed(chunk)
+            if text:
+                await on_delta(text)
+
+        response = await self.stream_response(request, forward)
         return response.text
@@ -1,9 +1,16 @@
+import asyncio
 import json
+import os
+import threading
 from datetime import date, datetime
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from agents.db.query_agent import QueryAgent
-from llm.agent import Agent
+from core.base_tools import track_failures
+from core.db.deadline import deadline
+from core.db.msearch import SearchBatch
+from core.result_cache import ResultCache
+from llm.agent import AsyncAgent
 from llm.message import (
     JSONLLMResponse,
     LLMMessage,
@@ -12,7 +19,7 @@ from llm.message import (
     LLMResponse,
 )
 from llm.prompt_template import PromptTemplate
-from llm.provider import BaseLLMProvider
+from llm.provider import AsyncBaseLLMProvider
 from llm.tool import Tool, ToolSet
 
 from .prompts.planner_react_loop import (
@@ -24,20 +31,32 @@ from .prompts.planner_react_loop import (
 MAX_PLANNER_STEPS = 10
 MODEL_NAME = "gpt-5.1"
 REASONING_EFFORT = "none"
+# param sets of one batched tool call that run at the same time
+PLANNER_TOOL_CONCURRENCY = int(os.getenv("PLANNER_TOOL_CONCURRENCY", "8"))
+# a param set still running after this becomes an error observation
+PLANNER_TOOL_TIMEOUT_SECONDS = float(os.getenv("PLANNER_TOOL_TIMEOUT_SECONDS", "120"))
 
 
-class PlannerAgent(Agent):
+class PlannerAgent(AsyncAgent):
     def __init__(
         self,
         name,
         toolsets: [ToolSet],
         tool_cls: type,
-        provider: BaseLLMProvider,
+        provider: AsyncBaseLLMProvider,
+        service_name: str = None,
+        on_event: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
     ):
         super().__init__(name, provider)
         self.name = name
         self.toolsets = toolsets
         self.tool_cls = tool_cls
+        self.service_name = service_name
+        self.cache_stats = {"hits": 0, "misses": 0}
+        # tokens of the QueryAgents this planner ran, kept apart for prompt cache stats
+        self.query_token_usage = dict.fromkeys(self.total_token_usage, 0)
+        self._stats_lock = threading.Lock()
+        self.on_event = on_event  # progress events, e.g. for the chat websocket
 
     def planner_prompt(self):
         return PromptTemplate(PLANNER_REACT_LOOP_PROMPT)
@@ -64,21 +83,77 @@ class PlannerAgent(Agent):
             now=now,
         )
 
-    def call_tool(self, tool_name: str, params: dict) -> str:
+    async def call_tool(self, tool_name: str, params: dict) -> str:
         if tool_name == "perform_elasticsearch_query":
-            query_agent = QueryAgent(f"{self.tool_cls}QueryAgent", provider=self.provider)
-            return query_agent.handle_request(
+            query_agent = QueryAgent(
+                f"{self.tool_cls}QueryAgent",
+                provider=self.provider,
+                services=[self.service_name] if self.service_name else None,
+            )
+            result = await query_agent.handle_request(
                 project_id=self.project_id,
                 user_request=params.get("user_message", ""),
             )
+            for key, tokens in query_agent.total_token_usage.items():
+                self.query_token_usage[key] += tokens
+            return result
 
         for toolset in self.toolsets:
             tool: Tool = toolset.get_tool_by_name(tool_name)
             if tool:
-                return tool.execute(params, tool_cls=self.tool_cls)
+                # service tools (ES / HTTP clients) and the data version reads are blocking
+                return await asyncio.to_thread(self._execute_cached, tool, tool_name, params)
         raise ValueError(f"Tool {tool_name} not found in any toolset.")
 
-    def process_tool_call(self, response: JSONLLMResponse) -> str:
+    def _execute_cached(self, tool: Tool, tool_name: str, params: dict) -> Any:
+        cache_key = ResultCache.key(self.project_id, tool_name, params)
+        hit, result = ResultCache.get(cache_key)
+        with self._stats_lock:
+            self.cache_stats["hits" if hit else "misses"] += 1
+        if hit:
+            return result
+        result, failures = track_failures(tool.execute, params, tool_cls=self.tool_cls)
+        if failures:
+            # the tool answered with an empty value; neither cache nor trust it
+            return {"error": "; ".join(failures)}
+        ResultCache.put(cache_key, result)
+        return result
+
+    async def call_tool_batch(self, tool_name: str, param_list: List[dict]) -> List[Any]:
+        """
+        Run the param sets of a batched tool call concurrently, in order of the list.
+
+        Their Elasticsearch searches are coalesced into _msearch requests by a
+        SearchBatch, so e.g. one tool called for ten months costs about one round
+        trip instead of ten. Each param set has its own timeout, and a failing one
+        only turns its own result into an error.
+        """
+        if len(param_list) <= 1:
+            return [await self._call_tool_bounded(self.call_tool(tool_name, p or {})) for p in param_list]
+
+        # only the param sets holding the semaphore can be waited for
+        batch = SearchBatch(min(len(param_list), PLANNER_TOOL_CONCURRENCY))
+        semaphore = asyncio.Semaphore(PLANNER_TOOL_CONCURRENCY)
+
+        async def run(params: dict):
+            async with semaphore:
+                return await self._call_tool_bounded(batch.arun(self.call_tool, tool_name, params))
+
+        return await asyncio.gather(*(run(p or {}) for p in param_list))
+
+    @staticmethod
+    async def _call_tool_bounded(call: Awaitable[Any]) -> Any:
+        """Await one tool call within PLANNER_TOOL_TIMEOUT_SECONDS; errors become its result."""
+        try:
+            # wait_for cannot stop the tool's worker thread; the deadline ends its searches
+            with deadline(PLANNER_TOOL_TIMEOUT_SECONDS):
+                return await asyncio.wait_for(call, PLANNER_TOOL_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return {"error": f"Tool call timed out after {PLANNER_TOOL_TIMEOUT_SECONDS:g}s"}
+        except Exception as e:
+            return {"error": f"Error during tool call: {e}"}
+
+    async def process_tool_call(self, response: JSONLLMResponse) -> str:
         try:
             action = (response.json_data or {}).get("action", {}) or {}
             tool_name = action.get("tool_name")
@@ -102,8 +177,17 @@ class PlannerAgent(Agent):
                     }
                 )
 
-            for param_set in param_list:
-                res = self.call_tool(tool_name, param_set or {})
+            if self.on_event is not None:
+                await self.on_event(
+                    {
+                        "event": "progress",
+                        "stage": "tool",
+                        "agent": self.name,
+                        "tool_name": tool_name,
+                        "calls": len(param_list),
+                    }
+                )
+            for param_set, res in zip(param_list, await self.call_tool_batch(tool_name, param_list)):
                 observations.append({"tool_params": param_set, "observation": res})
 
             payload = {
@@ -132,7 +216,7 @@ class PlannerAgent(Agent):
     ):
         print(f"Passing request to QueryAgent for task: {user_query}")
 
-    def handle_request(
+    async def handle_request(
         self, project_id: str, user_query: str, previous_messages: [LLMMessage]
     ):
         self.project_id = project_id
@@ -143,12 +227,9 @@ class PlannerAgent(Agent):
                 project_id, user_query, previous_messages
             )
 
-        # SYSTEM PROMPT
-        system_prompt = (
-            self.planner_prompt()
-            + self.tools_context_prompt()
-            + self.user_context_prompt(project_id)
-        )
+        # SYSTEM PROMPT: instructions and tools only, so it is the same for every
+        # request of the service and the provider can serve it from its prompt cache
+        system_prompt = self.planner_prompt() + self.tools_context_prompt()
         messages = []
         messages.append(
             LLMMessage(
@@ -160,6 +241,14 @@ class PlannerAgent(Agent):
         # ADD PREVIOUS MESSAGES
         messages.extend(previous_messages)
 
+        # ADD REQUEST CONTEXT (project, time) after the cacheable part
+        messages.append(
+            LLMMessage(
+                LLMMessageRole.SYSTEM,
+                content=self.user_context_prompt(project_id).render(),
+            )
+        )
+
         # ADD USER QUERY
         messages.append(
             LLMMessage(
@@ -183,14 +272,14 @@ class PlannerAgent(Agent):
             )
 
             # Generate React Loop Response
-            response = self.generate_structured_response(request)
+            response = await self.generate_structured_response(request)
 
             messages.append(LLMMessage(LLMMessageRole.ASSISTANT, content=response.text))
 
             print("Step : " + response.text)
 
             if "thought" in response.json_data:
-                observations = self.process_tool_call(response)
+                observations = await self.process_tool_call(response)
                 print("Observations :" + observations)
                 messages.append(LLMMessage(LLMMessageRole.USER, content=observations))
             elif "final_answer" in response.json_data:
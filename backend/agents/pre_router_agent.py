@@ -1,7 +1,7 @@
 import json
 from datetime import datetime
 
-from llm.agent import Agent
+from llm.agent import AsyncAgent
 from llm.message import (
     LLMMessage,
     LLMMessageRole,
@@ -15,7 +15,7 @@ MODEL_NAME = "gpt-5.1"
 REASONING_EFFORT = "none"
 
 
-class PreRouterAgent(Agent):
+class PreRouterAgent(AsyncAgent):
     def planner_prompt(self):
         return PromptTemplate(PRE_ROUTER_PROMPT)
 
@@ -41,30 +41,36 @@ class PreRouterAgent(Agent):
             now=now,
         )
 
-    def handle_request(
+    async def handle_request(
         self,
         user_query: str,
         previous_messages: [LLMMessage],
         available_agents: list,
         agent_scope: list,
     ):
-        # SYSTEM PROMPT
-        system_prompt = (
-            self.planner_prompt()
-            + self.user_context_prompt(user_query)
-            + self.available_agent_context(available_agents, agent_scope)
-        )
+        # SYSTEM PROMPT: static instructions first, for the provider's prompt cache
         messages = []
         messages.append(
             LLMMessage(
                 LLMMessageRole.SYSTEM,
-                content=system_prompt.render(),
+                content=self.planner_prompt().render(),
             )
         )
 
         # ADD PREVIOUS MESSAGES
         messages.extend(previous_messages)
 
+        # ADD REQUEST CONTEXT (agents, time, query) last
+        context_prompt = self.available_agent_context(
+            available_agents, agent_scope
+        ) + self.user_context_prompt(user_query)
+        messages.append(
+            LLMMessage(
+                LLMMessageRole.SYSTEM,
+                content=context_prompt.render(),
+            )
+        )
+
         request = LLMRequest(
             messages=messages,
             model=MODEL_NAME,
@@ -74,5 +80,5 @@ class PreRouterAgent(Agent):
         )
 
         # Generate React Loop Response
-        response = self.generate_structured_response(request)
+        response = await self.generate_structured_response(request)
         return response.json_data
@@ -15,7 +15,7 @@ GUIDELINES:
 - If the answer contains country name abbreviations, expand them to full country names.
 - Make sure the data is graphable before indicating so. There should be at least one value above zero and there should be multiple data points.
 
-You reply in the following JSON format ONLY:
+You reply in the following JSON format ONLY, starting with the final_answer key:
     {
         "final_answer": "Your final answer here with markdown formatting."
         "follow_up": "Generate a relevant follow up question from based on the tools available to you and the context of the message."
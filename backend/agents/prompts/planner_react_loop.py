@@ -62,7 +62,9 @@ IMPORTANT: Your output is always a single step consisting of either a single tho
                 "description": (
                     "Perform a data lookup in Elasticsearch databse based on the user message. "
                     "Only use this function if the user is looking for specific data in which "
-                    "the scope is outside the provided functions."
+                    "the scope is outside the provided functions. "
+                    "If the observation has a `cost` object the query was too expensive to run: "
+                    "call it again with a narrower or aggregated user_message, following its `hint`."
                 ),
                 "parameters": {
                     "type": "object",
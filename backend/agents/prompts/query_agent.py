@@ -10,10 +10,14 @@ which:
 You must design BOTH:
 - the Elasticsearch `body`
 - the `pipeline` of summarisation operations.
+""".strip()
 
-Index metadata (names, descriptions, and rough field info) is:
+INDICES_PROMPT = """
+Indices available for this request (name - description, then `field:type` pairs;
+`+kw` marks a text field with a `.keyword` subfield, `object` fields hold further
+dynamically mapped fields):
 
-[[index_metadata_json]]
+[[index_digest]]
 """.strip()
 
 TOOLS_PROMPT = """
@@ -0,0 +1,155 @@
+"""
+Peak memory of reading a large result set through BaseTool.
+
+Compares the previous scroll reader (every page appended into one list of full
+documents) with the point-in-time + search_after reader, both materialized and
+streamed into a set of customer ids. Elasticsearch is replaced by an in-process
+fake that synthesizes hits, so only the client-side memory is measured.
+
+Usage (from backend/):
+    python -m benchmarks.es_stream_memory --docs 200000
+"""
+import argparse
+import time
+import tracemalloc
+
+from core.base_tools import BaseTool
+from core.db.elastic import ElasticClient
+
+INVOICE_LINES = 3
+
+
+def make_hit(n: int) -> dict:
+    return {
+        "_id": f"doc_{n}",
+        "_index": "stripe_invoices",
+        "_source": {
+            "project_id": "bench",
+            "cleaned_data": {
+                "id": f"in_{n}",
+                "customer": f"cus_{n % 5000}",
+                "status": "paid",
+                "created": 1700000000 + n,
+                "amount_paid": 4900,
+                "currency": "usd",
+                "lines": {
+                    "data": [
+                        {"id": f"il_{n}_{i}", "amount": 4900, "description": "Pro plan (monthly)"}
+                        for i in range(INVOICE_LINES)
+                    ]
+                },
+            },
+        },
+        "sort": [n],
+    }
+
+
+def project(hit: dict, source):
+    if source is None:
+        return hit
+    data = hit["_source"]["cleaned_data"]
+    projected = {}
+    for field in source:
+        if field == "cleaned_data.customer":
+            projected.setdefault("cleaned_data", {})["customer"] = data["customer"]
+    return dict(hit, _source=projected)
+
+
+class FakeElastic(ElasticClient):
+    """Serves `total` synthetic hits through both the scroll and PIT APIs."""
+
+    def __init__(self, total: int):  # no connection
+        self.total = total
+        self._cursor = 0
+
+    def _page(self, start: int, size: int, source, slice_=None):
+        if slice_ is None:
+            end = min(start + size, self.total)
+            return [project(make_hit(n), source) for n in range(start, end)]
+        ids = range(start + (slice_["id"] - start) % slice_["max"], self.total, slice_["max"])
+        return [project(make_hit(n), source) for n in ids[:size]]
+
+    # scroll API
+    def search(self, index, body, scroll=None, size=None):
+        self._cursor = size
+        self._scroll_size = size
+        return {"_scroll_id": "s", "hits": {"hits": self._page(0, size, body.get("_source"))}}
+
+    def scroll(self, index, scroll_id, scroll):
+        hits = self._page(self._cursor, self._scroll_size, None)
+        self._cursor += self._scroll_size
+        return {"_scroll_id": "s", "hits": {"hits": hits}}
+
+    # point in time API
+    def open_point_in_time(self, index, keep_alive):
+        return "pit"
+
+    def search_point_in_time(self, body):
+        start = body["search_after"][0] + 1 if "search_after" in body else 0
+        hits = self._page(start, body["size"], body.get("_source"), body.get("slice"))
+        return {"pit_id": "pit", "hits": {"hits": hits}}
+
+    def close_point_in_time(self, pit_id):
+        return {}
+
+    def shard_count(self, index):
+        return 4
+
+
+def legacy_scroll(elastic: FakeElastic, filters: list) -> list:
+    """The reader BaseTool._query_elasticsearch used before the PIT pager."""
+    result = elastic.search(index="stripe_invoices", body={"query": {"bool": {"filter": filters}}}, scroll="2m", size=10000)
+    documents = result.get("hits", {}).get("hits", [])
+    while documents:
+        hits = elastic.scroll(index="stripe_invoices", scroll_id="s", scroll="2m").get("hits", {}).get("hits", [])
+        if not hits:
+            break
+        documents.extend(hits)
+    return documents
+
+
+def measure(label: str, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} peak {peak / 1024 / 1024:>9.1f} MiB   {elapsed:>6.2f}s   result={result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200000)
+    args = parser.parse_args()
+
+    filters = [{"term": {"project_id": "bench"}}]
+    tool = BaseTool.__new__(BaseTool)  # skip the real database clients
+
+    def run_legacy():
+        return len({h["_source"]["cleaned_data"]["customer"] for h in legacy_scroll(FakeElastic(args.docs), filters)})
+
+    def run_fetch():
+        tool.elastic_client = FakeElastic(args.docs)
+        hits = tool._fetch_elasticsearch("stripe_invoices", filters, None, None, ["cleaned_data.customer"])
+        return len({h["_source"]["cleaned_data"]["customer"] for h in hits})
+
+    def run_stream(sliced=False):
+        tool.elastic_client = FakeElastic(args.docs)
+        customers = set()
+        for page in tool._stream_elasticsearch(
+            "stripe_invoices", source=["cleaned_data.customer"], filters=filters, sliced=sliced
+        ):
+            for hit in page:
+                customers.add(hit["_source"]["cleaned_data"]["customer"])
+        return len(customers)
+
+    print(f"{args.docs} documents")
+    measure("scroll, full documents (before)", run_legacy)
+    measure("pit, projected list", run_fetch)
+    measure("pit, projected stream-reduce", run_stream)
+    measure("pit, 4 slices, stream-reduce", lambda: run_stream(sliced=True))
+
+
+if __name__ == "__main__":
+    main()
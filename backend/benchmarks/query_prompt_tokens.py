@@ -0,0 +1,72 @@
+"""
+QueryAgent prompt size with the full index metadata vs the retrieved schema digest.
+
+Builds the LLM request for a set of sample questions twice: with every ES_SCHEMA
+index serialized as JSON (the previous prompt) and with the SchemaRetriever digest
+scoped to the project's services. Tokens are counted with tiktoken when it is
+installed, otherwise estimated at 4 characters per token. Mappings come from
+ES_SCHEMA only; live mappings add dynamic `cleaned_data.*` fields, which the digest
+caps at QUERY_SCHEMA_MAX_FIELDS per index.
+
+Usage (from backend/):
+    python -m benchmarks.query_prompt_tokens --services stripe
+"""
+import argparse
+import json
+from datetime import datetime
+
+from agents.db.query_agent import (
+    QueryAgentArtifacts,
+    build_user_prompt,
+)
+from agents.db.schema_retriever import SchemaRetriever
+from schema.elasticschema import ES_SCHEMA
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+except ImportError:
+    def count_tokens(text: str) -> int:
+        return len(text) // 4
+
+QUESTIONS = [
+    "What was our total revenue last month?",
+    "How many customers churned this quarter?",
+    "What is the current MRR by country?",
+    "List the 10 largest refunds this year",
+    "Which customers are at risk of cancelling?",
+    "How much did we pay in Stripe fees in March?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="*", default=["stripe"])
+    args = parser.parse_args()
+
+    artifacts = QueryAgentArtifacts.get()
+    retriever = SchemaRetriever(ES_SCHEMA, schema_source=None)  # ES_SCHEMA mappings only
+    full_metadata = json.dumps(artifacts.index_metadata, indent=2)
+    now = datetime.now()
+
+    print(f"services: {args.services or 'all'}")
+    print(f"{'question':<46}{'before':>9}{'after':>9}{'saved':>8}  indices")
+    totals = [0, 0]
+    for question in QUESTIONS:
+        system = artifacts.system_prompt
+        before = count_tokens(system + build_user_prompt(full_metadata, "project", question, now))
+        digest = retriever.digest(question, args.services)
+        after = count_tokens(system + build_user_prompt(digest, "project", question, now))
+        totals[0] += before
+        totals[1] += after
+        indices = retriever.select(question, args.services)
+        print(f"{question[:45]:<46}{before:>9}{after:>9}{1 - after / before:>7.0%}  {', '.join(indices)}")
+    print(f"{'mean':<46}{totals[0] // len(QUESTIONS):>9}{totals[1] // len(QUESTIONS):>9}{1 - totals[1] / totals[0]:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
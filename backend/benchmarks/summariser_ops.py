@@ -0,0 +1,129 @@
+"""
+SummariserTools aggregate operations over synthetic ES hits.
+
+Times each operation of the column engine against the scalar implementation it
+replaced (two _extract_field calls per document, dict-of-lists grouping) and checks
+both return the same result.
+
+Usage (from backend/):
+    python -m benchmarks.summariser_ops --hits 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from agents.db.summariser_tools import SummariserTools
+
+COUNTRIES = ["US", "GB", "DE", "FR", "IN", "BR", "CA", "AU", "JP", "NL"]
+
+
+def make_hits(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "_id": f"in_{i}",
+            "_source": {
+                "country": rng.choice(COUNTRIES),
+                "cleaned_data": {
+                    "amount_paid": rng.randint(0, 100000) if rng.random() > 0.05 else None,
+                    "created": 1700000000 + i,
+                },
+            },
+        }
+        for i in range(n)
+    ]
+
+
+# --- scalar reference (the implementation before the column engine) ---
+
+def extract(doc, field):
+    if isinstance(doc, dict) and "_source" in doc:
+        doc = doc["_source"]
+    value = doc
+    for key in field.split("."):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            return None
+    return value
+
+
+def grouped(docs, group_by):
+    if not group_by:
+        return {"all": [d["_source"] if "_source" in d else d for d in docs]}
+    groups = defaultdict(list)
+    for doc in docs:
+        base = doc["_source"] if "_source" in doc else doc
+        groups[base.get(group_by, "UNKNOWN")].append(doc)
+    return groups
+
+
+def scalar_values(plan, docs):
+    for g, group in grouped(docs, plan.get("group_by")).items():
+        yield g, [extract(d, plan["field"]) for d in group if extract(d, plan["field"]) is not None]
+
+
+def scalar_sum(plan, docs):
+    out = {}
+    for g, group in grouped(docs, plan.get("group_by")).items():
+        total = 0.0
+        for d in group:
+            val = extract(d, plan["field"])
+            if val is not None:
+                total += val
+        out[g] = total
+    return out
+
+
+def scalar_percentile(plan, docs):
+    out = {}
+    for g, vals in scalar_values(plan, docs):
+        values = sorted(vals)
+        k = (len(values) - 1) * (plan["percentile"] / 100.0)
+        f = int(k)
+        c = min(f + 1, len(values) - 1)
+        out[g] = values[f] if f == c else values[f] + (values[c] - values[f]) * (k - f)
+    return out
+
+
+SCALAR = {
+    "sum": scalar_sum,
+    "avg": lambda p, d: {g: statistics.mean(v) for g, v in scalar_values(p, d) if v},
+    "count": lambda p, d: {g: len(v) for g, v in grouped(d, p.get("group_by")).items()},
+    "max": lambda p, d: {g: max(v) if v else None for g, v in scalar_values(p, d)},
+    "median": lambda p, d: {g: statistics.median(v) for g, v in scalar_values(p, d) if v},
+    "unique_count": lambda p, d: {g: len(set(v)) for g, v in scalar_values(p, d)},
+    "percentile": scalar_percentile,
+}
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hits", type=int, default=1000000)
+    args = parser.parse_args()
+
+    hits = make_hits(args.hits)
+    tools = SummariserTools()
+    print(f"{args.hits} hits")
+    print(f"{'operation':<14}{'group_by':<10}{'scalar':>10}{'engine':>10}{'speedup':>9}  same")
+    for op, scalar in SCALAR.items():
+        for group_by in (None, "country"):
+            plan = {"operation": op, "field": "cleaned_data.amount_paid", "group_by": group_by, "percentile": 90}
+            expected, before = timed(scalar, plan, hits)
+            actual, after = timed(tools._execute_plan, plan, hits)
+            print(
+                f"{op:<14}{group_by or '-':<10}{before:>9.2f}s{after:>9.2f}s"
+                f"{before / after:>8.1f}x  {expected == actual}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,85 @@
+import threading
 from typing import Optional
 from core.db.mongodb import MongoDBClient
-from core.db.elastic import ElasticClient
+from core.db.elastic import AsyncElasticClient, ElasticClient
 
 from core.logger import Logger
 logger = Logger(__name__)
 
 class BaseDatabase:
+    """
+    Holds the process-wide database clients.
+
+    The clients are created once, by connect() in the FastAPI lifespan, and shared by
+    services, tools and agents. Code that can run outside the app (scripts, workers)
+    gets them through shared_mongodb() / shared_elastic(), which create them lazily.
+    """
     mongodb: Optional[MongoDBClient] = None
     elastic: Optional[ElasticClient] = None
+    async_elastic: Optional[AsyncElasticClient] = None
+    _lock = threading.Lock()
 
     @classmethod
-    def init_databases(cls, mongodb: MongoDBClient, elastic: ElasticClient):
+    def init_databases(
+        cls,
+        mongodb: MongoDBClient,
+        elastic: ElasticClient,
+        async_elastic: Optional[AsyncElasticClient] = None,
+    ):
         logger.info("Initializing databases..")
         cls.mongodb = mongodb
         cls.elastic = elastic
+        cls.async_elastic = async_elastic
+
+    @classmethod
+    async def connect(cls):
+        """Create the shared clients if needed and verify the connections."""
+        BaseDatabase.init_databases(
+            cls.shared_mongodb(), cls.shared_elastic(), cls.shared_async_elastic()
+        )
+        await BaseDatabase.mongodb.init()
+        BaseDatabase.elastic.ping()
+        await BaseDatabase.async_elastic.init()
+
+    @classmethod
+    async def close(cls):
+        logger.info("Closing database connections..")
+        if cls.async_elastic is not None:
+            await cls.async_elastic.close()
+        if cls.elastic is not None:
+            cls.elastic.close()
+        if cls.mongodb is not None:
+            cls.mongodb.close()
+
+    @classmethod
+    def shared_mongodb(cls) -> MongoDBClient:
+        if BaseDatabase.mongodb is None:
+            with BaseDatabase._lock:
+                if BaseDatabase.mongodb is None:
+                    BaseDatabase.mongodb = MongoDBClient()
+        return BaseDatabase.mongodb
+
+    @classmethod
+    def shared_elastic(cls) -> ElasticClient:
+        if BaseDatabase.elastic is None:
+            with BaseDatabase._lock:
+                if BaseDatabase.elastic is None:
+                    BaseDatabase.elastic = ElasticClient()
+        return BaseDatabase.elastic
+
+    @classmethod
+    def shared_async_elastic(cls) -> AsyncElasticClient:
+        if BaseDatabase.async_elastic is None:
+            with BaseDatabase._lock:
+                if BaseDatabase.async_elastic is None:
+                    BaseDatabase.async_elastic = AsyncElasticClient()
+        return BaseDatabase.async_elastic
+
+    @classmethod
+    def pool_stats(cls) -> dict:
+        """Connection pool configuration and usage of the shared clients."""
+        return {
+            "mongodb": cls.mongodb.pool_stats() if cls.mongodb else None,
+            "elastic": cls.elastic.pool_stats() if cls.elastic else None,
+            "async_elastic": cls.async_elastic.pool_stats() if cls.async_elastic else None,
+        }
@@ -60,6 +60,13 @@ class BaseSyncHandler(ABC):
         """
         pass
 
+    async def after_sync(self, project_id: str):
+        """
+        Hook called once all sync steps have run for a project.
+        Subclasses can override it to publish derived data or invalidate caches.
+        """
+        pass
+
     async def trigger_sync(self, project_id: str, *args: Any, **kwargs: Any):
         """
         Initiates the synchronization process in the background.
@@ -125,6 +132,7 @@ class BaseSyncHandler(ABC):
                 for name, fn in steps
             ]
             await asyncio.gather(*tasks, return_exceptions=False)
+            await self.after_sync(project_id)
 
             await self.update_sync_progress(
                 project_id,
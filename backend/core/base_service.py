@@ -25,6 +25,13 @@ class BaseService(BaseDatabase):
             except Exception as e:
                 logger.error(f"[{self.name}] Error loading mapping JSON: {e}")
             
+    async def prepare(self, project_id: str):
+        """
+        Called before an agent answers with the service's tools for a project.
+        Services backfill derived data a project does not have yet here.
+        """
+        return None
+
     def load_json_file(self, file: str):
         path = self.base_path + self.name + "/" + file
         # dynamically load json file without service prefix
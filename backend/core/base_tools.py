@@ -1,16 +1,56 @@
-from typing import Any, Dict, Optional, List
-from core.db.mongodb import MongoDBClient
-from core.db.elastic import ElasticClient
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, List, Tuple
+from core.base_database import BaseDatabase
+from core.db.elastic import (
+    ES_MAX_ROWS,
+    ES_MAX_SCAN_SLICES,
+    ES_PAGE_SIZE,
+    ES_PIT_KEEP_ALIVE,
+    QueryBudgetExceeded,
+)
+from core.data_version import DataVersion
+from core.range_cache import RangeCache, RangeRequest
 from core.logger import Logger
 
 logger = Logger(__name__)
 
+# index -> number of primary shards, read once per process
+_shard_counts: Dict[str, int] = {}
+# Elasticsearch errors of the tool call running in this context, see track_failures()
+_failures: ContextVar[Optional[List[str]]] = ContextVar("tool_failures", default=None)
+
+
+def track_failures(fn: Callable, *args, **kwargs) -> Tuple[Any, List[str]]:
+    """
+    Run a tool call and return (result, failures).
+
+    Tools turn Elasticsearch errors into empty results (0.0, {} or []); failures
+    lists the errors behind such a result, so callers can report them instead of
+    caching it.
+    """
+    failures: List[str] = []
+    token = _failures.set(failures)
+    try:
+        return fn(*args, **kwargs), failures
+    finally:
+        _failures.reset(token)
+
+
+def record_failure(message: str):
+    """Note an Elasticsearch error on the tool call being tracked, if any."""
+    failures = _failures.get()
+    if failures is not None:
+        failures.append(message)
+
 
 class BaseTool:
     """Base tool for services to interact with databases"""
     def __init__(self):
-        self.mongodb_client = MongoDBClient()
-        self.elastic_client = ElasticClient()
+        # Shared process-wide clients. One instance per tool class serves every call,
+        # concurrently (see llm.tool._tool_instance), so tools keep no per-call state
+        # on self; anything call-scoped goes through arguments or context variables.
+        self.mongodb_client = BaseDatabase.shared_mongodb()
+        self.elastic_client = BaseDatabase.shared_elastic()
         
     def _query_elasticsearch(
         self,
@@ -34,8 +74,8 @@ class BaseTool:
             List of documents matching the query
 
         Raises:
-            Exception: If query fails
             ValueError: If invalid parameters provided
+            QueryBudgetExceeded: If the query matches more than ES_MAX_ROWS documents
         """
         # Input validation
         if not index:
@@ -44,6 +84,112 @@ class BaseTool:
         if not filters and not query:
             raise ValueError("Either filters or query must be provided")
 
+        # Date-ranged queries go through the interval-aware cache
+        range_request = RangeCache.split(index, filters, query, sort, source)
+        try:
+            if range_request is not None:
+                return self._query_range_cached(index, range_request, source)
+            return self._fetch_elasticsearch(index, filters, query, sort, source)
+        except QueryBudgetExceeded as e:
+            # A truncated answer would look like a real one: let the caller report it
+            record_failure(str(e))
+            raise
+        except Exception as e:
+            logger.error(f"Elasticsearch query failed for index {index}: {str(e)}")
+            record_failure(f"Elasticsearch query failed for index {index}: {str(e)}")
+            return []
+
+    def _query_range_cached(
+        self, index: str, request: RangeRequest, source: Optional[List[str]]
+    ) -> List[Dict[str, Any]]:
+        """Fetch only the parts of the request window not already cached, then read it back."""
+        version = DataVersion.get(request.project_id)
+        missing = RangeCache.missing_intervals(request, version)
+        if missing:
+            hits = []
+            for lo, hi in missing:
+                window_filters, window_query = request.window(lo, hi)
+                hits.extend(
+                    self._fetch_elasticsearch(index, window_filters, window_query, None, source)
+                )
+            RangeCache.store(request, missing, hits, version)
+            logger.debug(f"Range cache fetched {len(missing)} interval(s) from {index}")
+
+        documents = RangeCache.read(request, version)
+        if documents is None:
+            # Entry evicted or invalidated in between: fall back to a direct fetch
+            window_filters, window_query = request.window(request.start, request.end)
+            documents = self._fetch_elasticsearch(index, window_filters, window_query, None, source)
+        return documents
+
+    def _fetch_elasticsearch(
+        self,
+        index: str,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        query: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Dict[str, Any]]] = None,
+        source: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Read all documents matching the query into a list. Raises on failure."""
+        documents = []
+        for page in self._paginate_elasticsearch(index, filters, query, sort, source):
+            documents.extend(page)
+        return documents
+
+    def _stream_elasticsearch(
+        self,
+        index: str,
+        source: List[str],
+        filters: Optional[List[Dict[str, Any]]] = None,
+        query: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Dict[str, Any]]] = None,
+        page_size: int = ES_PAGE_SIZE,
+        max_rows: int = ES_MAX_ROWS,
+        sliced: bool = False,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream pages of documents matching the query, for tools that reduce as they go
+
+        Only one page is held at a time, so memory is bounded by page_size and the
+        _source projection rather than by the size of the result set.
+
+        Args:
+            index: Elasticsearch index name
+            source: Fields to include in response (required)
+            filters: List of filter conditions (used if query is not provided)
+            query: Full Elasticsearch query body (takes precedence over filters)
+            sort: Sorting criteria
+            page_size: Documents per page
+            max_rows: Row budget; exceeding it raises QueryBudgetExceeded
+            sliced: Read the scan as parallel PIT slices (one per shard, unordered).
+                Ignored when sort is given.
+
+        Yields:
+            Lists of hits, one per page
+
+        Raises:
+            ValueError: If invalid parameters provided
+            QueryBudgetExceeded: If the query matches more than max_rows documents
+        """
+        if source is None:
+            raise ValueError("A _source projection is required when streaming")
+        return self._recording_failures(index, self._paginate_elasticsearch(
+            index, filters, query, sort, source,
+            page_size=page_size, max_rows=max_rows, sliced=sliced,
+        ))
+
+    def _paginate_elasticsearch(
+        self,
+        index: str,
+        filters: Optional[List[Dict[str, Any]]],
+        query: Optional[Dict[str, Any]],
+        sort: Optional[List[Dict[str, Any]]],
+        source: Optional[List[str]],
+        page_size: int = ES_PAGE_SIZE,
+        max_rows: int = ES_MAX_ROWS,
+        sliced: bool = False,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Build the query body and page through it with ElasticClient.scan_pages."""
         # Build query body
         if query:
             # Use the provided full query
@@ -59,54 +205,73 @@ class BaseTool:
         # Add optional parameters
         if sort:
             query_body["sort"] = sort
-
         if source is not None:  # Allow explicit empty list
             query_body["_source"] = source
-        scroll_id = None
+
+        slices = self._scan_slices(index) if sliced and not sort else 1
+        return self.elastic_client.scan_pages(
+            index, query_body, page_size=page_size, max_rows=max_rows,
+            keep_alive=ES_PIT_KEEP_ALIVE, slices=slices,
+        )
+
+    @staticmethod
+    def _recording_failures(index: str, pages: Iterator[List[Dict[str, Any]]]):
+        # Streaming tools catch read errors themselves, so note them on the way out
         try:
-            # Initial search with scroll
-            scroll_size = 10000
-            scroll_timeout = "2m"
-            result = self.elastic_client.search(
-                index=index, body=query_body, scroll=scroll_timeout, size=scroll_size
-            )
-            scroll_id = result.get("_scroll_id")
-            documents = result.get("hits", {}).get("hits", [])
-
-            # Keep scrolling until no more results
-            hard_scroll_limit = 10000  # prevent infinite loops
-            scroll_iterations = 0
-            while True:
-                scroll_iterations += 1
-                if scroll_iterations > hard_scroll_limit:
-                    break
-                if not documents or not scroll_id:
-                    break
-
-                next_scroll = self.elastic_client.scroll(index=index, scroll_id=scroll_id, scroll=scroll_timeout)
-                hits = next_scroll.get("hits", {}).get("hits", [])
-                if not hits:
-                    break
-                documents.extend(hits)
-                scroll_id = next_scroll.get("_scroll_id")
-
-            if not isinstance(documents, list):
-                logger.warning("Unexpected format for Elasticsearch hits")
-                documents = []
-
-            return documents
+            yield from pages
+        except Exception as e:
+            record_failure(f"Elasticsearch read failed for index {index}: {str(e)}")
+            raise
+
+    def _scan_slices(self, index: str) -> int:
+        """Number of parallel slices for a scan of the index: its shard count, capped."""
+        if index not in _shard_counts:
+            try:
+                _shard_counts[index] = self.elastic_client.shard_count(index)
+            except Exception as e:
+                logger.warning(f"Could not read shard count of {index}: {str(e)}")
+                return 1
+        return max(1, min(_shard_counts[index], ES_MAX_SCAN_SLICES))
+
+    def _count_elasticsearch(self, index: str, filters: List[Dict[str, Any]]) -> int:
+        """
+        Count documents matching the filters without fetching them
+
+        Args:
+            index: Elasticsearch index name
+            filters: List of filter conditions
 
+        Returns:
+            Number of matching documents (0 if the query fails)
+        """
+        body = {"query": {"bool": {"filter": filters}}, "size": 0, "track_total_hits": True}
+        try:
+            result = self.elastic_client.search(index=index, body=body)
+            return result.get("hits", {}).get("total", {}).get("value", 0)
         except Exception as e:
-            logger.error(f"Elasticsearch query failed for index {index}: {str(e)}")
-            return []
-        finally:
-            # Clear scroll to free resources
-            if scroll_id:
-                try:
-                    self.elastic_client.clear_scroll(scroll_id=scroll_id)
-                except Exception:
-                    pass  # Ignore errors when clearing scroll
-        
-    
-        
-    
+            logger.error(f"Elasticsearch count failed for index {index}: {str(e)}")
+            record_failure(f"Elasticsearch count failed for index {index}: {str(e)}")
+            return 0
+
+    def _aggregate_elasticsearch(
+        self, index: str, filters: List[Dict[str, Any]], aggs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Run aggregations over documents matching the filters
+
+        Args:
+            index: Elasticsearch index name
+            filters: List of filter conditions
+            aggs: Elasticsearch aggregations body
+
+        Returns:
+            The aggregations section of the response ({} if the query fails)
+        """
+        body = {"query": {"bool": {"filter": filters}}, "size": 0, "aggs": aggs}
+        try:
+            result = self.elastic_client.search(index=index, body=body)
+            return result.get("aggregations", {})
+        except Exception as e:
+            logger.error(f"Elasticsearch aggregation failed for index {index}: {str(e)}")
+            record_failure(f"Elasticsearch aggregation failed for index {index}: {str(e)}")
+            return {}
@@ -0,0 +1,85 @@
+import os
+import time
+import threading
+from typing import Dict, Tuple
+from pymongo import MongoClient, ReturnDocument
+from core.db.mongodb import MONGO_DB_NAME, mongo_uri
+from core.logger import Logger
+
+logger = Logger(__name__)
+
+DATA_VERSION_COLLECTION = "data_versions"
+# how long a process trusts the version it last read before asking MongoDB again
+DATA_VERSION_TTL_SECONDS = float(os.getenv("DATA_VERSION_TTL_SECONDS", "5"))
+
+
+class DataVersion:
+    """
+    Per-project data version counter.
+
+    Bumped whenever a sync run finishes or a project's data is removed, so that
+    in-memory caches tagged with a version can tell they are stale.
+
+    The counter lives in MongoDB (one document per project in data_versions), so
+    a sync run by one worker or a cron job reaches every process; each process
+    re-reads it after DATA_VERSION_TTL_SECONDS. Reads are synchronous because the
+    caches ask from tool threads, so they go through a small pymongo client of
+    their own. When MongoDB cannot be reached the last known version is kept.
+    """
+
+    _versions: Dict[str, Tuple[int, float]] = {}  # project -> (version, read at)
+    _collection = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, project_id: str) -> int:
+        """Return the current data version of a project (0 if never synced)."""
+        cached = cls._versions.get(project_id)
+        if cached is not None and time.monotonic() - cached[1] < DATA_VERSION_TTL_SECONDS:
+            return cached[0]
+        try:
+            doc = cls._store().find_one({"_id": project_id}, {"version": 1})
+            version = (doc or {}).get("version", 0)
+        except Exception as e:
+            logger.error(f"Could not read data version of project {project_id}: {e}")
+            version = 0
+        return cls._remember(project_id, version)
+
+    @classmethod
+    def bump(cls, project_id: str) -> int:
+        """Advance the data version of a project and return the new value."""
+        try:
+            doc = cls._store().find_one_and_update(
+                {"_id": project_id},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            version = doc["version"]
+        except Exception as e:
+            # still invalidate this process' caches
+            logger.error(f"Could not publish data version of project {project_id}: {e}")
+            version = cls._versions.get(project_id, (0, 0.0))[0] + 1
+        version = cls._remember(project_id, version)
+        logger.debug(f"Data version for project {project_id} bumped to {version}")
+        return version
+
+    # --- helpers ---
+
+    @classmethod
+    def _remember(cls, project_id: str, version: int) -> int:
+        # never go back: a version bumped locally while MongoDB was unreachable stays
+        with cls._lock:
+            previous = cls._versions.get(project_id, (0, 0.0))[0]
+            version = max(version, previous)
+            cls._versions[project_id] = (version, time.monotonic())
+        return version
+
+    @classmethod
+    def _store(cls):
+        if cls._collection is None:
+            with cls._lock:
+                if cls._collection is None:
+                    client = MongoClient(mongo_uri(), maxPoolSize=4, serverSelectionTimeoutMS=2000)
+                    cls._collection = client[MONGO_DB_NAME][DATA_VERSION_COLLECTION]
+        return cls._collection
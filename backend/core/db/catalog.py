@@ -0,0 +1,43 @@
+import os
+import time
+import threading
+from typing import Dict, Iterable
+
+CATALOG_TTL_SECONDS = float(os.getenv("DB_CATALOG_TTL_SECONDS", "60"))
+
+
+class Catalog:
+    """
+    Short-lived cache of collections / indices known to exist.
+
+    Only positive answers are cached: a name missing from the catalog is checked
+    against the database again, so objects created elsewhere are picked up on first
+    use. Wrappers add names they create and discard names they drop or see vanish.
+    """
+
+    def __init__(self, ttl: float = CATALOG_TTL_SECONDS):
+        self.ttl = ttl
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        expires_at = self._expires.get(name)
+        return expires_at is not None and time.monotonic() < expires_at
+
+    def add(self, name: str):
+        with self._lock:
+            self._expires[name] = time.monotonic() + self.ttl
+
+    def replace(self, names: Iterable[str]):
+        """Reset the catalog to a full listing."""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._expires = {name: expires_at for name in names}
+
+    def discard(self, name: str):
+        with self._lock:
+            self._expires.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._expires.clear()
@@ -0,0 +1,53 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+
+class QueryDeadlineExceeded(Exception):
+    """Raised when an Elasticsearch read is attempted after its deadline."""
+
+
+# monotonic time by which the reads of the current call must be done
+_deadline: ContextVar[Optional[float]] = ContextVar("es_deadline", default=None)
+_CURRENT: Any = object()
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Bound the Elasticsearch reads made in this context (and the threads started
+    from it with asyncio.to_thread) to the next `seconds`.
+
+    asyncio.wait_for cannot stop a worker thread; with a deadline each request
+    gets only the time left as its timeout, and none is sent once it has passed.
+    """
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining(end: Optional[float] = _CURRENT) -> Optional[float]:
+    """Seconds left before the deadline (the current one by default), None without one."""
+    end = current() if end is _CURRENT else end
+    if end is None:
+        return None
+    left = end - time.monotonic()
+    if left <= 0:
+        raise QueryDeadlineExceeded("Deadline passed before the Elasticsearch request was sent")
+    return left
+
+
+def bounded(client, end: Optional[float] = _CURRENT):
+    """The client with its request timeout capped by the time left before the deadline."""
+    left = remaining(end)
+    if left is None:
+        return client
+    # a retry would get the whole timeout again
+    return client.options(request_timeout=left, retry_on_timeout=False)
@@ -1,30 +1,96 @@
 import os
-from elasticsearch import Elasticsearch
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from elasticsearch import AsyncElasticsearch, Elasticsearch, NotFoundError, helpers
+from core.db.catalog import Catalog
+from core.db import msearch
+from core.db.deadline import bounded
 
 from core.logger import Logger
 logger = Logger(__name__)
 
+ES_PAGE_SIZE = int(os.getenv("ES_PAGE_SIZE", "5000"))
+ES_MAX_ROWS = int(os.getenv("ES_MAX_ROWS", "1000000"))
+ES_PIT_KEEP_ALIVE = os.getenv("ES_PIT_KEEP_ALIVE", "1m")
+ES_MAX_SCAN_SLICES = int(os.getenv("ES_MAX_SCAN_SLICES", "8"))
+
+# Connection pool shared by all requests of a client
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "25"))
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "30"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "3"))
+
+_DONE = object()
+
+# Indices known to exist, shared by the sync and async clients (same cluster)
+_index_catalog = Catalog()
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a query matches more documents than its row budget allows."""
+
+
+def _client_options() -> dict:
+    return {
+        "hosts": [os.getenv("ELASTICSEARCH_HOSTS", "http://elasticsearch:9200")],
+        "basic_auth": (
+            os.getenv("ELASTIC_USERNAME", ""),
+            os.getenv("ELASTIC_PASSWORD", "")
+        ),
+        "connections_per_node": ES_CONNECTIONS_PER_NODE,
+        "request_timeout": ES_REQUEST_TIMEOUT,
+        "max_retries": ES_MAX_RETRIES,
+        "retry_on_timeout": True,
+    }
+
+
+def _pool_stats(client) -> dict:
+    nodes = []
+    for node in client.transport.node_pool.all():
+        stats = {"node": node.base_url}
+        pool = getattr(node, "pool", None)  # urllib3 (sync client)
+        if pool is not None:
+            stats["opened"] = getattr(pool, "num_connections", None)
+            stats["requests"] = getattr(pool, "num_requests", None)
+            idle = getattr(pool, "pool", None)
+            stats["idle"] = idle.qsize() if idle is not None else None
+        connector = getattr(getattr(node, "session", None), "connector", None)  # aiohttp (async client)
+        if connector is not None:
+            stats["limit"] = connector.limit
+        nodes.append(stats)
+    return {"connections_per_node": ES_CONNECTIONS_PER_NODE, "nodes": nodes}
+
+
 class ElasticClient:
     def __init__(self):
-        self.client = Elasticsearch(
-            [os.getenv("ELASTICSEARCH_HOSTS", "http://elasticsearch:9200")],
-            basic_auth=(
-                os.getenv("ELASTIC_USERNAME", ""),
-                os.getenv("ELASTIC_PASSWORD", "")
-            )
-        )
+        self.client = Elasticsearch(**_client_options())
+
+    def ping(self):
         # ping the elasticsearch to ensure connection is established
         if self.client.ping():
             logger.info("Elasticsearch connection established successfully.")
         else:
             logger.error("Elasticsearch connection failed.")
+
+    def close(self):
+        self.client.close()
+
+    def pool_stats(self) -> dict:
+        return _pool_stats(self.client)
             
     def verify_index(method):
         def wrapper(self, index: str, *args, **kwargs):
-            if not self.client.indices.exists(index=index):
-                logger.error(f"Index '{index}' does not exist.")
-                raise ValueError(f"Index '{index}' does not exist.")
-            return method(self, index, *args, **kwargs)
+            if index not in _index_catalog:
+                if not self.client.indices.exists(index=index):
+                    logger.error(f"Index '{index}' does not exist.")
+                    raise ValueError(f"Index '{index}' does not exist.")
+                _index_catalog.add(index)
+            try:
+                return method(self, index, *args, **kwargs)
+            except NotFoundError:
+                _index_catalog.discard(index)
+                raise
         return wrapper
 
     def create_index(self, index: str, body: dict):
@@ -33,6 +99,14 @@ class ElasticClient:
             logger.info(f"Created index: {index}")
         else:
             logger.info(f"Index already exists: {index}")
+        _index_catalog.add(index)
+
+    def delete_index(self, index: str):
+        try:
+            self.client.indices.delete(index=index)
+            logger.info(f"Deleted index: {index}")
+        finally:
+            _index_catalog.discard(index)
             
     def list_indices(self, pattern: str = "*"):
         indices = self.client.cat.indices(index=pattern, format="json")
@@ -46,15 +120,144 @@ class ElasticClient:
         logger.info(f"Indexed document in {index} with id {response['_id']}")
         return response
     
+    @verify_index
+    def bulk_index(self, index: str, documents: list):
+        """Index a list of (id, document) tuples in a single bulk request."""
+        actions = (
+            {"_index": index, "_id": doc_id, "_source": document}
+            for doc_id, document in documents
+        )
+        success, errors = helpers.bulk(self.client, actions, raise_on_error=False)
+        if errors:
+            logger.error(f"Bulk indexing into {index} had {len(errors)} errors")
+        logger.info(f"Bulk indexed {success} documents in {index}")
+        return success, errors
+
     @verify_index
     def search(self, index: str, body: dict, scroll: str = None, size: int = None):
         if scroll and size:
-            response = self.client.search(index=index, body=body, scroll=scroll, size=size)
+            response = bounded(self.client).search(index=index, body=body, scroll=scroll, size=size)
         else:
-            response = self.client.search(index=index, body=body)
+            response = msearch.search(self.client, index, body)
         logger.info(f"Searched index {index} with body {body}")
         return response
     
+    @verify_index
+    def open_point_in_time(self, index: str, keep_alive: str):
+        response = bounded(self.client).open_point_in_time(index=index, keep_alive=keep_alive)
+        logger.info(f"Opened point in time on {index}")
+        return response["id"]
+
+    def search_point_in_time(self, body: dict):
+        # PIT searches carry the index in the PIT id and must not name one
+        return bounded(self.client).search(body=body)
+
+    def close_point_in_time(self, pit_id: str):
+        response = self.client.close_point_in_time(id=pit_id)
+        logger.info("Closed point in time")
+        return response
+
+    def shard_count(self, index: str) -> int:
+        settings = bounded(self.client).indices.get_settings(index=index, name="index.number_of_shards")
+        return sum(
+            int(s.get("settings", {}).get("index", {}).get("number_of_shards", 1))
+            for s in settings.values()
+        ) or 1
+
+    def scan_pages(self, index: str, body: dict, page_size: int = ES_PAGE_SIZE,
+                   max_rows: int = ES_MAX_ROWS, keep_alive: str = ES_PIT_KEEP_ALIVE,
+                   slices: int = 1):
+        """
+        Yield pages of hits for a query body with point in time + search_after.
+
+        With slices > 1 the scan is split into PIT slices read concurrently by a
+        thread pool; pages are yielded as they arrive, so order across slices is
+        not preserved. Raises QueryBudgetExceeded past max_rows hits.
+        """
+        body = dict(body)
+        # _shard_doc breaks ties so search_after never skips or repeats a document
+        sort = body.get("sort") or []
+        body["sort"] = (sort if isinstance(sort, list) else [sort]) + [{"_shard_doc": "asc"}]
+        body["size"] = page_size
+        body["track_total_hits"] = False
+
+        pit_id = self.open_point_in_time(index=index, keep_alive=keep_alive)
+        if slices <= 1:
+            pages = self._pit_pages(body, pit_id, keep_alive)
+        else:
+            pages = self._sliced_pit_pages(body, pit_id, keep_alive, slices)
+        try:
+            rows = 0
+            for hits in pages:
+                rows += len(hits)
+                if rows > max_rows:
+                    raise QueryBudgetExceeded(
+                        f"Query on {index} matched more than {max_rows} documents"
+                    )
+                yield hits
+        finally:
+            pages.close()  # stops slice readers before the PIT goes away
+            try:
+                self.close_point_in_time(pit_id)
+            except Exception:
+                pass  # The PIT expires on its own after keep_alive
+
+    def _pit_pages(self, body: dict, pit_id: str, keep_alive: str, stop: threading.Event = None):
+        body = dict(body)
+        while stop is None or not stop.is_set():
+            body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+            result = self.search_point_in_time(body=body)
+            pit_id = result.get("pit_id", pit_id)
+            hits = result.get("hits", {}).get("hits", [])
+            if not hits:
+                return
+            yield hits
+            if len(hits) < body["size"]:
+                return
+            body["search_after"] = hits[-1]["sort"]
+
+    def _sliced_pit_pages(self, body: dict, pit_id: str, keep_alive: str, slices: int):
+        # Bounded so slow consumers hold back the readers instead of buffering the scan
+        pages = queue.Queue(maxsize=slices * 2)
+        stop = threading.Event()
+
+        def read_slice(slice_id: int):
+            try:
+                sliced = dict(body, slice={"id": slice_id, "max": slices})
+                for hits in self._pit_pages(sliced, pit_id, keep_alive, stop):
+                    self._put(pages, hits, stop)
+            except Exception as e:
+                self._put(pages, e, stop)
+            finally:
+                self._put(pages, _DONE, stop)
+
+        executor = ThreadPoolExecutor(max_workers=slices, thread_name_prefix="es-slice")
+        try:
+            for slice_id in range(slices):
+                # each reader runs in a copy of this context, so it keeps the deadline
+                executor.submit(contextvars.copy_context().run, read_slice, slice_id)
+            remaining = slices
+            while remaining:
+                item = pages.get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _put(pages: queue.Queue, item, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
     @verify_index
     def scroll(self, index: str, scroll_id: str, scroll: str):
         response = self.client.scroll(scroll_id=scroll_id, scroll=scroll)
@@ -79,3 +282,76 @@ class ElasticClient:
         logger.info(f"Deleted documents from {index} with query {body}")
         return response
     
+
+
+class AsyncElasticClient:
+    """
+    Async counterpart of ElasticClient for code running on the event loop
+    (service syncs, derived index builds, data removal).
+    """
+
+    def __init__(self):
+        self.client = AsyncElasticsearch(**_client_options())
+
+    async def init(self):
+        if await self.client.ping():
+            logger.info("Async Elasticsearch connection established successfully.")
+        else:
+            logger.error("Async Elasticsearch connection failed.")
+
+    async def close(self):
+        await self.client.close()
+
+    def pool_stats(self) -> dict:
+        return _pool_stats(self.client)
+
+    def verify_index(method):
+        async def wrapper(self, index: str, *args, **kwargs):
+            if index not in _index_catalog:
+                if not await self.client.indices.exists(index=index):
+                    logger.error(f"Index '{index}' does not exist.")
+                    raise ValueError(f"Index '{index}' does not exist.")
+                _index_catalog.add(index)
+            try:
+                return await method(self, index, *args, **kwargs)
+            except NotFoundError:
+                _index_catalog.discard(index)
+                raise
+        return wrapper
+
+    async def list_indices(self, pattern: str = "*"):
+        indices = await self.client.cat.indices(index=pattern, format="json")
+        index_names = [idx["index"] for idx in indices]
+        logger.info(f"Listed indices with pattern '{pattern}': {index_names}")
+        return index_names
+
+    @verify_index
+    async def index_document(self, index: str, document: dict, id: str = None):
+        response = await self.client.index(index=index, document=document, id=id)
+        logger.info(f"Indexed document in {index} with id {response['_id']}")
+        return response
+
+    @verify_index
+    async def bulk_index(self, index: str, documents: list):
+        """Index a list of (id, document) tuples in a single bulk request."""
+        actions = (
+            {"_index": index, "_id": doc_id, "_source": document}
+            for doc_id, document in documents
+        )
+        success, errors = await helpers.async_bulk(self.client, actions, raise_on_error=False)
+        if errors:
+            logger.error(f"Bulk indexing into {index} had {len(errors)} errors")
+        logger.info(f"Bulk indexed {success} documents in {index}")
+        return success, errors
+
+    @verify_index
+    async def search(self, index: str, body: dict):
+        response = await self.client.search(index=index, body=body)
+        logger.info(f"Searched index {index} with body {body}")
+        return response
+
+    @verify_index
+    async def delete_by_query(self, index: str, body: dict):
+        response = await self.client.delete_by_query(index=index, body=body)
+        logger.info(f"Deleted documents from {index} with query {body}")
+        return response
@@ -1,6 +1,9 @@
 import os
+import threading
 from urllib.parse import quote_plus
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from core.db.catalog import Catalog
 
 from core.logger import Logger
 logger = Logger(__name__)
@@ -10,12 +13,77 @@ MONGO_PASSWORD = os.getenv("MONGO_PASSWORD", "")
 MONGO_HOST = os.getenv("MONGO_HOST", "")
 MONGO_PORT = os.getenv("MONGO_PORT", "")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events of a client for pool_stats()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def connection_created(self, event):
+        self._add(created=1)
+
+    def connection_closed(self, event):
+        self._add(closed=1)
+
+    def connection_checked_out(self, event):
+        self._add(in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._add(in_use=-1)
+
+    def connection_check_out_failed(self, event):
+        self._add(checkout_failures=1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+def mongo_uri() -> str:
+    return f"mongodb://{quote_plus(MONGO_USER)}:{quote_plus(MONGO_PASSWORD)}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DB_NAME}?authSource={MONGO_DB_NAME}"
+
 
 class MongoDBClient:
     def __init__(self):
-        MONGO_URI = f"mongodb://{quote_plus(MONGO_USER)}:{quote_plus(MONGO_PASSWORD)}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DB_NAME}?authSource={MONGO_DB_NAME}"
-        self.client = AsyncIOMotorClient(MONGO_URI)
+        self._pool_listener = PoolStatsListener()
+        self.client = AsyncIOMotorClient(
+            mongo_uri(),
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            event_listeners=[self._pool_listener],
+        )
         self.db = self.client[MONGO_DB_NAME]
+        self.catalog = Catalog()
         logger.info("MongoDB client initialized (async).")
         
     async def init(self):
@@ -27,12 +95,27 @@ class MongoDBClient:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise
         
+    def close(self):
+        self.client.close()
+
+    def pool_stats(self) -> dict:
+        listener = self._pool_listener
+        return {
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "min_pool_size": MONGO_MIN_POOL_SIZE,
+            "open": listener.created - listener.closed,
+            "in_use": listener.in_use,
+            "checkouts": listener.checkouts,
+            "checkout_failures": listener.checkout_failures,
+        }
+
     def verify_collection(method):
         async def wrapper(self, collection_name: str, *args, **kwargs):
-            collections = await self.db.list_collection_names()
-            if collection_name not in collections:
-                logger.error(f"Collection '{collection_name}' does not exist in database '{MONGO_DB_NAME}'.")
-                raise ValueError(f"Collection '{collection_name}' does not exist.")
+            if collection_name not in self.catalog:
+                collections = await self.list_collections()
+                if collection_name not in collections:
+                    logger.error(f"Collection '{collection_name}' does not exist in database '{MONGO_DB_NAME}'.")
+                    raise ValueError(f"Collection '{collection_name}' does not exist.")
             return await method(self, collection_name, *args, **kwargs)
         return wrapper
 
@@ -40,7 +123,16 @@ class MongoDBClient:
         return self.db[name]
     
     async def list_collections(self):
-        return await self.db.list_collection_names()
+        collections = await self.db.list_collection_names()
+        self.catalog.replace(collections)
+        return collections
+
+    async def drop_collection(self, collection_name: str):
+        try:
+            await self.db.drop_collection(collection_name)
+            logger.info(f"Dropped collection {collection_name}")
+        finally:
+            self.catalog.discard(collection_name)
     
     @verify_collection
     async def delete_document(self, collection_name: str, query: dict):
@@ -52,6 +144,8 @@ class MongoDBClient:
     async def update_one(self, collection_name: str, query: dict, update_values: dict, upsert: bool = False):
         collection = self.get_collection(collection_name)
         result = await collection.update_one(query, {'$set': update_values}, upsert=upsert)
+        if upsert:
+            self.catalog.add(collection_name)
         logger.info(f"Updated {result.modified_count} document(s) in collection {collection_name} matching query {query} with upsert={upsert}")
         return result.modified_count
     
@@ -70,7 +164,9 @@ class MongoDBClient:
                 {"$set": document},
                 upsert=True
             )
+            self.catalog.add(collection_name)
             return document["_id"]
         else:
             result = await collection.insert_one(document)
+            self.catalog.add(collection_name)
             return result.inserted_id
@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+from core.db import deadline
+from core.logger import Logger
+
+logger = Logger(__name__)
+
+# how long the first search of a batch waits for the others before it is sent
+ES_MSEARCH_WINDOW_MS = float(os.getenv("ES_MSEARCH_WINDOW_MS", "10"))
+ES_MSEARCH_MAX_SEARCHES = int(os.getenv("ES_MSEARCH_MAX_SEARCHES", "50"))
+
+
+class _Search:
+    def __init__(self, client, index: str, body: dict, params: Dict[str, Any]):
+        self.client = client
+        self.index = index
+        self.body = body
+        self.params = params
+        self.deadline = deadline.current()
+        self.done = False
+        self.response: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchBatch:
+    """
+    Coalesces the searches of concurrently running tasks into one _msearch.
+
+    Tasks are run through run() / arun(); a search issued while one is active (see
+    search() below) waits until every running task of the batch is waiting on a
+    search, or ES_MSEARCH_WINDOW_MS has passed, and is then sent together with the
+    others. Tasks busy elsewhere (e.g. waiting on an LLM) are not waited for
+    longer than the window.
+    """
+
+    _current: ContextVar[Optional["SearchBatch"]] = ContextVar("search_batch", default=None)
+
+    def __init__(self, tasks: int):
+        self._cond = threading.Condition()
+        self._unstarted = tasks
+        self._running = 0
+        self._pending: List[_Search] = []
+        self._deadline = 0.0
+        self.requests = 0  # round trips made for the batch's searches
+
+    @classmethod
+    def current(cls) -> Optional["SearchBatch"]:
+        return cls._current.get()
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Run one task of the batch (in a worker thread)."""
+        with self._cond:
+            self._unstarted -= 1
+            self._running += 1
+        token = self._current.set(self)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._current.reset(token)
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    async def arun(self, fn: Callable, *args, **kwargs):
+        """
+        run() for a coroutine function (in its own asyncio task). Its searches must
+        be made from worker threads (asyncio.to_thread), which inherit the batch.
+
+        A task cancelled on timeout stops being counted while its thread may still
+        be running; run it under a deadline no later than the timeout, so that
+        thread cannot add searches to the batch afterwards.
+        """
+        with self._cond:
+            self._unstarted -= 1
+            self._running += 1
+        token = self._current.set(self)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            self._current.reset(token)
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def search(self, client, index: str, body: dict, **params) -> Any:
+        # a task whose deadline passed (see arun) must not join the batch any more
+        deadline.remaining()
+        request = _Search(client, index, body, params)
+        with self._cond:
+            self._pending.append(request)
+            if len(self._pending) == 1:
+                self._deadline = time.monotonic() + ES_MSEARCH_WINDOW_MS / 1000
+            self._cond.notify_all()
+            while True:
+                if request.done:
+                    break
+                if request in self._pending and self._ready():
+                    flush, self._pending = self._pending, []
+                    break
+                timeout = self._deadline - time.monotonic() if request in self._pending else None
+                self._cond.wait(timeout=max(timeout, 0.001) if timeout is not None else None)
+        if not request.done:
+            self._execute(flush)
+        if request.error is not None:
+            raise request.error
+        return request.response
+
+    # --- helpers ---
+
+    def _ready(self) -> bool:
+        everyone_waiting = self._unstarted <= 0 and len(self._pending) >= self._running
+        return (
+            everyone_waiting
+            or len(self._pending) >= ES_MSEARCH_MAX_SEARCHES
+            or time.monotonic() >= self._deadline
+        )
+
+    def _execute(self, searches: List[_Search]):
+        try:
+            by_client: Dict[int, List[_Search]] = {}
+            for s in searches:
+                by_client.setdefault(id(s.client), []).append(s)
+            for group in by_client.values():
+                self._send(group)
+        finally:
+            with self._cond:
+                for s in searches:
+                    s.done = True
+                self._cond.notify_all()
+
+    def _send(self, searches: List[_Search]):
+        self.requests += 1
+        client = searches[0].client
+        if len(searches) == 1:
+            self._search_one(searches[0])
+            return
+        lines: List[dict] = []
+        for s in searches:
+            lines.extend([{"index": s.index, **s.params}, s.body])
+        ends = [s.deadline for s in searches if s.deadline is not None]
+        try:
+            client = deadline.bounded(client, min(ends) if ends else None)
+            responses = client.msearch(searches=lines)["responses"]
+        except Exception as e:
+            for s in searches:
+                s.error = e
+            return
+        for s, response in zip(searches, responses):
+            if "error" in response:
+                # run it alone so the caller gets the client's usual exception
+                self._search_one(s)
+            else:
+                s.response = response
+        logger.debug(f"Sent {len(searches)} searches in one msearch")
+
+    @staticmethod
+    def _search_one(s: _Search):
+        try:
+            client = deadline.bounded(s.client, s.deadline)
+            s.response = client.search(index=s.index, body=s.body, **s.params)
+        except Exception as e:
+            s.error = e
+
+
+def search(client, index: str, body: dict, **params) -> Any:
+    """client.search, coalesced with the current batch's searches when there is one."""
+    batch = SearchBatch.current()
+    if batch is None:
+        return deadline.bounded(client).search(index=index, body=body, **params)
+    return batch.search(client, index, body, **params)
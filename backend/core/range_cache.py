@@ -0,0 +1,244 @@
+import os
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from core.data_version import DataVersion
+from core.logger import Logger
+
+logger = Logger(__name__)
+
+# hits are often unprojected, so the bound is on their serialized size
+RANGE_CACHE_MAX_BYTES = int(os.getenv("RANGE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+RANGE_CACHE_ENABLED = os.getenv("RANGE_CACHE_ENABLED", "true").lower() == "true"
+# documents are refetched after this even if no new data version was seen
+RANGE_CACHE_TTL_SECONDS = int(os.getenv("RANGE_CACHE_TTL_SECONDS", "900"))
+
+WINDOW_PLACEHOLDER = "__window__"
+
+
+class RangeRequest:
+    """A date-ranged query split into its cache key and its [start, end] window."""
+
+    def __init__(self, key: tuple, project_id: str, field: str, start: int, end: int,
+                 filters: Optional[list], query: Optional[dict], range_pos: int):
+        self.key = key
+        self.project_id = project_id
+        self.field = field
+        self.start = start
+        self.end = end
+        self._filters = filters
+        self._query = query
+        self._range_pos = range_pos
+
+    def window(self, lo: int, hi: int) -> Tuple[Optional[list], Optional[dict]]:
+        """Return (filters, query) with the range clause narrowed to [lo, hi]."""
+        clause = {"range": {self.field: {"gte": lo, "lte": hi}}}
+        if self._query is not None:
+            query = copy.deepcopy(self._query)
+            query["bool"]["filter"][self._range_pos] = clause
+            return None, query
+        filters = list(self._filters)
+        filters[self._range_pos] = clause
+        return filters, None
+
+    def value_of(self, hit: dict):
+        value = hit.get("_source", {})
+        for part in self.field.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+
+class RangeCache:
+    """
+    Interval-aware document cache for date-ranged tool queries.
+
+    Entries are keyed by (index, filter shape with the range clause blanked out,
+    _source projection) and remember which [lo, hi] intervals of the range field
+    have already been fetched. A request only fetches the uncovered sub-intervals
+    and is answered from the cached documents. Entries are tagged with the project's
+    DataVersion and dropped once a sync publishes a newer one or RANGE_CACHE_TTL_SECONDS
+    after they were created; the total serialized size of the cached documents is
+    bounded with LRU eviction. Callers read the data version once per request and
+    pass it in, so MongoDB is never asked while the cache lock is held.
+    """
+
+    _entries: "OrderedDict[tuple, dict]" = OrderedDict()
+    _bytes = 0
+    _lock = threading.Lock()
+
+    # --- request analysis ---
+
+    @classmethod
+    def split(cls, index: str, filters: Optional[list], query: Optional[dict],
+              sort: Optional[list], source: Optional[list]) -> Optional[RangeRequest]:
+        """Return a RangeRequest if the query is a cacheable date-ranged query, else None."""
+        if not RANGE_CACHE_ENABLED or sort:
+            return None
+
+        if query is not None:
+            clauses = query.get("bool", {}).get("filter") if isinstance(query, dict) else None
+        else:
+            clauses = filters
+        if not isinstance(clauses, list):
+            return None
+
+        project_id = None
+        range_pos = None
+        for pos, clause in enumerate(clauses):
+            if not isinstance(clause, dict):
+                return None
+            term = clause.get("term", {})
+            if isinstance(term, dict) and "project_id" in term:
+                project_id = term["project_id"]
+            if "range" in clause:
+                if range_pos is not None:
+                    return None  # more than one range clause, keep it simple
+                range_pos = pos
+        if project_id is None or range_pos is None:
+            return None
+
+        range_clause = clauses[range_pos]["range"]
+        if len(range_clause) != 1:
+            return None
+        field, bounds = next(iter(range_clause.items()))
+        if (
+            not isinstance(bounds, dict)
+            or set(bounds) != {"gte", "lte"}
+            or not all(isinstance(bounds[k], int) and not isinstance(bounds[k], bool) for k in bounds)
+        ):
+            return None
+
+        # The range field must come back in _source so cached hits can be re-filtered
+        if source is not None and not any(field == s or field.startswith(s + ".") for s in source):
+            return None
+
+        blanked = list(clauses)
+        blanked[range_pos] = {"range": {field: WINDOW_PLACEHOLDER}}
+        if query is not None:
+            shape = copy.deepcopy(query)
+            shape["bool"]["filter"] = blanked
+        else:
+            shape = blanked
+        key = (
+            index,
+            json.dumps(shape, sort_keys=True, default=str),
+            json.dumps(source, sort_keys=True),
+        )
+        return RangeRequest(
+            key, str(project_id), field, bounds["gte"], bounds["lte"],
+            filters, query, range_pos,
+        )
+
+    # --- cache access ---
+
+    @classmethod
+    def missing_intervals(cls, request: RangeRequest, version: int) -> List[Tuple[int, int]]:
+        """Sub-intervals of the request window not covered by the cache entry."""
+        with cls._lock:
+            entry = cls._current_entry(request, version)
+            covered = entry["intervals"] if entry else []
+        missing = []
+        cursor = request.start
+        for lo, hi in covered:
+            if hi < cursor:
+                continue
+            if lo > request.end:
+                break
+            if lo > cursor:
+                missing.append((cursor, lo - 1))
+            cursor = max(cursor, hi + 1)
+            if cursor > request.end:
+                break
+        if cursor <= request.end:
+            missing.append((cursor, request.end))
+        return missing
+
+    @classmethod
+    def store(cls, request: RangeRequest, intervals: List[Tuple[int, int]], hits: List[dict], version: int):
+        """Add hits fetched at the given data version, covering the given intervals, to the entry."""
+        if version != DataVersion.get(request.project_id):
+            return  # a sync finished while fetching, the hits may already be stale
+        sized = [(hit, len(json.dumps(hit, default=str))) for hit in hits]
+        if sum(size for _, size in sized) > RANGE_CACHE_MAX_BYTES:
+            return  # would only push every other entry out
+        with cls._lock:
+            entry = cls._entries.get(request.key)
+            if entry is None or entry["version"] != version or cls._expired(entry):
+                if entry is not None:
+                    cls._bytes -= entry["bytes"]
+                entry = {
+                    "version": version,
+                    "expires_at": time.monotonic() + RANGE_CACHE_TTL_SECONDS,
+                    "intervals": [],
+                    "docs": {},
+                    "bytes": 0,
+                }
+                cls._entries[request.key] = entry
+
+            before = entry["bytes"]
+            for hit, size in sized:
+                previous = entry["docs"].get(hit.get("_id"))
+                if previous is not None:
+                    entry["bytes"] -= previous[2]
+                entry["docs"][hit.get("_id")] = (request.value_of(hit), hit, size)
+                entry["bytes"] += size
+            cls._bytes += entry["bytes"] - before
+            entry["intervals"] = cls._merge(entry["intervals"] + list(intervals))
+            cls._entries.move_to_end(request.key)
+            cls._evict()
+
+    @classmethod
+    def read(cls, request: RangeRequest, version: int) -> Optional[List[dict]]:
+        """Hits of the request window, or None if the entry was evicted or went stale."""
+        with cls._lock:
+            entry = cls._current_entry(request, version)
+            if entry is None:
+                return None
+            cls._entries.move_to_end(request.key)
+            return [
+                hit for value, hit, _ in entry["docs"].values()
+                if value is not None and request.start <= value <= request.end
+            ]
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls._bytes = 0
+
+    # --- helpers ---
+
+    @classmethod
+    def _current_entry(cls, request: RangeRequest, version: int) -> Optional[dict]:
+        entry = cls._entries.get(request.key)
+        if entry is None or entry["version"] != version:
+            return None
+        if cls._expired(entry):
+            return None
+        return entry
+
+    @staticmethod
+    def _expired(entry: dict) -> bool:
+        return time.monotonic() >= entry["expires_at"]
+
+    @classmethod
+    def _evict(cls):
+        while cls._bytes > RANGE_CACHE_MAX_BYTES and cls._entries:
+            key, entry = cls._entries.popitem(last=False)
+            cls._bytes -= entry["bytes"]
+            logger.debug(f"Evicted range cache entry for index {key[0]}")
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        merged: List[Tuple[int, int]] = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+            else:
+                merged.append((lo, hi))
+        return merged
@@ -1,6 +1,7 @@
 import os
 from typing import Dict
 from core.logger import Logger
+from core.schema_catalog import SchemaCatalog
 
 logger = Logger(__name__)
 
@@ -34,10 +35,12 @@ class ServiceRegistry:
                     if not index or not body:
                         logger.warning(f"Invalid ES mapping for service {service}: {schema}")
                         continue
+                    SchemaCatalog.register(index)
                     if SKIP_INDEX_REGISTRATION:
                         logger.info(f"Skipping ES index registration for {index} due to SKIP_INDEX_REGISTRATION setting.")
                         continue
                     service.elastic.create_index(index, body)
+                    SchemaCatalog.invalidate(index)
                 except Exception as e:
                     logger.error(f"Failed to create ES index {index} for service {service}: {e}")
                 
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from core.data_version import DataVersion
+from core.logger import Logger
+
+logger = Logger(__name__)
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "900"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class ResultCache:
+    """
+    Process-wide cache of tool results.
+
+    Entries are keyed by (project_id, tool name, normalized params, DataVersion), so a
+    finished sync makes every older entry unreachable; invalidate() then frees them.
+    Results are stored JSON-serialized, which both sizes them for the memory bound
+    (LRU eviction by bytes) and hands every hit a fresh copy. The TTL covers tools whose
+    defaults are relative to "now" (e.g. a missing end date).
+    """
+
+    _entries: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+    _bytes = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def key(cls, project_id: str, tool_name: str, params: Optional[Dict[str, Any]]) -> Optional[tuple]:
+        """Cache key for a tool call, or None if the params cannot be normalized."""
+        if not RESULT_CACHE_ENABLED or not project_id:
+            return None
+        normalized = {k: v for k, v in (params or {}).items() if v is not None}
+        try:
+            params_key = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+        return (str(project_id), tool_name, params_key, DataVersion.get(str(project_id)))
+
+    @classmethod
+    def get(cls, key: Optional[tuple]) -> Tuple[bool, Any]:
+        """Return (hit, result) for a key."""
+        if key is None:
+            return False, None
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None:
+                return False, None
+            payload, expires_at = entry
+            if time.monotonic() >= expires_at:
+                cls._drop(key)
+                return False, None
+            cls._entries.move_to_end(key)
+        return True, json.loads(payload)
+
+    @classmethod
+    def put(cls, key: Optional[tuple], result: Any):
+        """Store a tool result; error results are never cached."""
+        if key is None or (isinstance(result, dict) and "error" in result):
+            return
+        if key[3] != DataVersion.get(key[0]):
+            return  # a sync finished while the tool was running
+        try:
+            payload = json.dumps(result, default=str)
+        except (TypeError, ValueError):
+            return
+        if len(payload) > RESULT_CACHE_MAX_BYTES:
+            return
+        with cls._lock:
+            if key in cls._entries:
+                cls._drop(key)
+            cls._entries[key] = (payload, time.monotonic() + RESULT_CACHE_TTL_SECONDS)
+            cls._bytes += len(payload)
+            while cls._bytes > RESULT_CACHE_MAX_BYTES and cls._entries:
+                cls._drop(next(iter(cls._entries)))
+
+    @classmethod
+    def invalidate(cls, project_id: str):
+        """Drop every cached result of a project."""
+        with cls._lock:
+            for key in [k for k in cls._entries if k[0] == str(project_id)]:
+                cls._drop(key)
+        logger.debug(f"Result cache invalidated for project {project_id}")
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls._bytes = 0
+
+    # --- helpers ---
+
+    @classmethod
+    def _drop(cls, key: tuple):
+        payload, _ = cls._entries.pop(key)
+        cls._bytes -= len(payload)
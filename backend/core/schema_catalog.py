@@ -0,0 +1,141 @@
+import hashlib
+import os
+import time
+import threading
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Set, Tuple
+from core.base_database import BaseDatabase
+from core.logger import Logger
+
+logger = Logger(__name__)
+
+SCHEMA_CATALOG_TTL_SECONDS = float(os.getenv("SCHEMA_CATALOG_TTL_SECONDS", "600"))
+
+# field types Elasticsearch can aggregate and sort on through doc values
+AGGREGATABLE_TYPES = {
+    "keyword", "constant_keyword", "wildcard", "boolean", "ip", "version",
+    "long", "integer", "short", "byte", "unsigned_long",
+    "double", "float", "half_float", "scaled_float",
+    "date", "date_nanos",
+}
+
+
+class FieldInfo(NamedTuple):
+    type: Optional[str]
+    keyword: Optional[str]  # field to use for terms / sort: itself, its .keyword subfield, or None
+    aggregatable: bool
+
+
+class IndexSchema:
+    """An index mapping and its flat field table, keyed by dotted path."""
+
+    def __init__(self, index: str, mapping: Dict[str, Any]):
+        self.index = index
+        self.mapping = mapping
+        self.fields: Dict[str, FieldInfo] = {}
+        self._flatten(mapping.get("properties", {}), "")
+        # changes whenever a field is added or retyped; cached plans compare it
+        self.fingerprint = hashlib.sha1(
+            repr(sorted((path, info.type) for path, info in self.fields.items())).encode()
+        ).hexdigest()[:16]
+
+    def field(self, path: str) -> Optional[FieldInfo]:
+        return self.fields.get(path)
+
+    def _flatten(self, properties: Dict[str, Any], prefix: str):
+        for name, spec in properties.items():
+            if not isinstance(spec, dict):
+                continue
+            path = prefix + name
+            field_type = spec.get("type", "object" if "properties" in spec else None)
+            subfields = spec.get("fields", {})
+            doc_values = spec.get("doc_values", True)
+
+            keyword = None
+            if field_type == "keyword":
+                keyword = path
+            elif field_type == "text" and "keyword" in subfields:
+                keyword = path + ".keyword"
+            aggregatable = (field_type in AGGREGATABLE_TYPES and doc_values) or (
+                field_type == "text" and (keyword is not None or spec.get("fielddata", False))
+            )
+            self.fields[path] = FieldInfo(field_type, keyword, bool(aggregatable))
+
+            for sub, sub_spec in subfields.items():
+                sub_type = sub_spec.get("type")
+                sub_path = f"{path}.{sub}"
+                self.fields[sub_path] = FieldInfo(
+                    sub_type,
+                    sub_path if sub_type == "keyword" else None,
+                    sub_type in AGGREGATABLE_TYPES and sub_spec.get("doc_values", True),
+                )
+            if "properties" in spec:
+                self._flatten(spec["properties"], path + ".")
+
+
+class SchemaCatalog:
+    """
+    Process-wide cache of index mappings.
+
+    Indices registered by services are loaded together by refresh() at startup;
+    any other index is loaded on first use. Entries live
+    for SCHEMA_CATALOG_TTL_SECONDS and are dropped when an index is created or a
+    sync finishes, since dynamic mappings grow as new fields are indexed.
+    """
+
+    _schemas: Dict[str, Tuple[IndexSchema, float]] = {}
+    _registered: Set[str] = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, *indices: str):
+        """Add indices to the set refresh() loads."""
+        with cls._lock:
+            cls._registered.update(i for i in indices if i)
+
+    @classmethod
+    def get(cls, index: str) -> Optional[IndexSchema]:
+        """Schema of an index, or None if its mapping cannot be read."""
+        entry = cls._schemas.get(index)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+        cls._load([index])
+        entry = cls._schemas.get(index)
+        return entry[0] if entry is not None else None
+
+    @classmethod
+    def refresh(cls, indices: Optional[Iterable[str]] = None):
+        """Reload the given indices, or every registered one, in one request."""
+        names = sorted(indices if indices is not None else cls._registered)
+        if names:
+            cls._load(names)
+            logger.info(f"Schema catalog loaded {len(names)} index mappings")
+
+    @classmethod
+    def invalidate(cls, *indices: str):
+        """Drop cached schemas (all of them when no index is given)."""
+        with cls._lock:
+            if not indices:
+                cls._schemas.clear()
+            for index in indices:
+                cls._schemas.pop(index, None)
+
+    # --- helpers ---
+
+    @classmethod
+    def _load(cls, names: list):
+        try:
+            resp = BaseDatabase.shared_elastic().client.indices.get_mapping(
+                index=",".join(names), ignore_unavailable=True
+            )
+        except Exception as e:
+            logger.error(f"Error loading mappings for {names}: {e}")
+            return
+        if len(names) == 1 and names[0] not in resp and len(resp) == 1:
+            # an alias resolves to its concrete index
+            resp = {names[0]: next(iter(resp.values()))}
+        expires_at = time.monotonic() + SCHEMA_CATALOG_TTL_SECONDS
+        with cls._lock:
+            for index, body in resp.items():
+                mapping = body.get("mappings", {})
+                if mapping:
+                    cls._schemas[index] = (IndexSchema(index, mapping), expires_at)
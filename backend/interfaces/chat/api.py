@@ -8,7 +8,7 @@ from core.decorators import api_key_required, rate_limit, token_limit
 from .models import ChatCompletionRequest, ChatCompletionResponse, PromptData
 from .utils import ChatUtils
 from agents.agent_router import AgentRouter
-from llm.providers.openai.openai_provider import OpenAIProvider
+from llm.providers.openai.async_openai_provider import AsyncOpenAIProvider
 from core.logger import Logger
 
 logger = Logger(__name__)
@@ -82,7 +82,7 @@ class ChatInterface(BaseInterface):
             message_history = data.messages[:-1] if len(data.messages) > 1 else []
                 
             # new agent router with provider
-            agent_router = AgentRouter(provider=OpenAIProvider)
+            agent_router = AgentRouter(provider=AsyncOpenAIProvider)
             router_response = await agent_router.handle_request(
                 query=user_query,
                 project_id=project_id,
@@ -1,10 +1,23 @@
+from typing import Awaitable, Callable
+
 from typing_extensions import Dict
 
 from llm.message import JSONLLMResponse, LLMResponse
-from llm.provider import BaseLLMProvider
+from llm.provider import AsyncBaseLLMProvider, BaseLLMProvider
 from llm.tool import Tool, ToolSet
 
 
+def prompt_cache_stats(token_usage: Dict) -> Dict:
+    """Share of input tokens the provider served from its prompt cache."""
+    input_tokens = token_usage.get("input_token_count", 0)
+    cached_tokens = token_usage.get("cached_input_token_count", 0)
+    return {
+        "input_token_count": input_tokens,
+        "cached_input_token_count": cached_tokens,
+        "hit_ratio": round(cached_tokens / input_tokens, 4) if input_tokens else 0.0,
+    }
+
+
 class Agent:
     def __init__(self, name, provider: BaseLLMProvider):
         self.name = name
@@ -38,6 +51,9 @@ class Agent:
             "cached_input_token_count": 0,
         }
 
+    def prompt_cache_stats(self) -> Dict:
+        return prompt_cache_stats(self.total_token_usage)
+
     def generate_response(self, request) -> LLMResponse:
         response = self.provider.generate_response(request)
         self.add_token_usage(response.get_token_count_dict())
@@ -59,3 +75,39 @@ class Agent:
 
     def handle_request(self, *args, **kwargs):
         pass
+
+
+class AsyncAgent(Agent):
+    """Agent whose LLM calls are awaited on an AsyncBaseLLMProvider."""
+
+    def __init__(self, name, provider: AsyncBaseLLMProvider):
+        super().__init__(name, provider)
+
+    async def generate_response(self, request) -> LLMResponse:
+        response = await self.provider.generate_response(request)
+        self.add_token_usage(response.get_token_count_dict())
+        return response
+
+    async def stream_response(
+        self, request, on_delta: Callable[[str], Awaitable[None]]
+    ) -> LLMResponse:
+        response = await self.provider.stream_response(request, on_delta)
+        self.add_token_usage(response.get_token_count_dict())
+        return response
+
+    async def generate_structured_response(self, request) -> JSONLLMResponse:
+        response = await self.provider.generate_structured_response(request)
+        self.add_token_usage(response.get_token_count_dict())
+        return response
+
+    async def generate_response_using_schema(
+        self, request, response_schema: Dict
+    ) -> JSONLLMResponse:
+        response = await self.provider.generate_response_using_schema(
+            request, response_schema
+        )
+        self.add_token_usage(response.get_token_count_dict())
+        return response
+
+    async def handle_request(self, *args, **kwargs):
+        pass
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Awaitable, Callable
 
 from .message import JSONLLMResponse, LLMRequest, LLMResponse
 
@@ -14,3 +15,30 @@ class BaseLLMProvider(ABC):
     def generate_response_using_schema(
         self, request: LLMRequest, schema: dict
     ) -> JSONLLMResponse: ...
+
+
+class AsyncBaseLLMProvider(ABC):
+    """BaseLLMProvider for agents on the event loop: every method is a coroutine."""
+
+    @abstractmethod
+    async def generate_response(self, request: LLMRequest) -> LLMResponse: ...
+
+    @abstractmethod
+    async def generate_structured_response(self, request: LLMRequest) -> JSONLLMResponse: ...
+
+    @abstractmethod
+    async def generate_response_using_schema(
+        self, request: LLMRequest, schema: dict
+    ) -> JSONLLMResponse: ...
+
+    async def stream_response(
+        self, request: LLMRequest, on_delta: Callable[[str], Awaitable[None]]
+    ) -> LLMResponse:
+        """
+        generate_response, passing the output text to on_delta as it is generated.
+        Providers without streaming send it in one piece.
+        """
+        response = await self.generate_response(request)
+        if response.text:
+            await on_delta(response.text)
+        return response
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from core.logger import Logger
+from llm.message import (
+    JSONLLMResponse,
+    LLMMessage,
+    LLMMessageRole,
+    LLMRequest,
+    LLMResponse,
+)
+from llm.provider import AsyncBaseLLMProvider
+from llm.utils.backoff import async_retry_with_exponential_backoff
+
+from .openai_provider import (
+    MAX_RETRIES_INVALID_JSON,
+    _reasoning_summary,
+    _structured_output,
+    _usage_counts,
+)
+
+logger = Logger(__name__)
+
+# One connection pool per worker: requests of every conversation share it
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "500"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "100"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120"))
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when it is installed)
+
+    OPENAI_HTTP2 = True
+except ImportError:
+    OPENAI_HTTP2 = False
+
+# event loop -> its client; an httpx pool cannot be shared across loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def shared_async_client() -> AsyncOpenAI:
+    """The AsyncOpenAI client of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            http2=OPENAI_HTTP2,
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=OPENAI_TIMEOUT_SECONDS,
+        )
+        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY", ""), http_client=http_client)
+        _clients[loop] = client
+        logger.info(f"Created shared OpenAI client (http2={OPENAI_HTTP2})")
+    return client
+
+
+async def close_shared_async_client():
+    """Close the running loop's client (application shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+class AsyncOpenAIProvider(AsyncBaseLLMProvider):
+    """
+    OpenAIProvider on the event loop.
+
+    Requests are awaited instead of holding a thread each, and all providers of a
+    worker share one keep-alive connection pool (HTTP/2 when `h2` is installed),
+    so a worker can serve many concurrent conversations.
+    """
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        return shared_async_client()
+
+    def _to_openai_messages(self, messages: List[LLMMessage]) -> List[Dict]:
+        return [{"role": m.role.value, "content": m.content} for m in messages]
+
+    @async_retry_with_exponential_backoff(errors=(openai.RateLimitError,))
+    async def generate_response(self, request: LLMRequest) -> LLMResponse:
+        try:
+            resp = await self.client.responses.create(
+                model=request.model or "gpt-5",
+                input=self._to_openai_messages(request.messages),
+                **(request.params or {}),
+            )
+            return LLMResponse(
+                text=getattr(resp, "output_text", "") or "",
+                reasoning=_reasoning_summary(resp),
+                **_usage_counts(resp),
+            )
+        except openai.RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Error performing OpenAI request: {e}")
+            return LLMResponse(f"Error performing OpenAI request: {e}")
+
+    @async_retry_with_exponential_backoff(errors=(openai.RateLimitError,))
+    async def stream_response(
+        self, request: LLMRequest, on_delta: Callable[[str], Awaitable[None]]
+    ) -> LLMResponse:
+        try:
+            stream = await self.client.responses.create(
+                model=request.model or "gpt-5",
+                input=self._to_openai_messages(request.messages),
+                stream=True,
+                **(request.params or {}),
+            )
+            resp = None
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    await on_delta(event.delta)
+                elif event.type == "response.completed":
+                    resp = event.response
+            return LLMResponse(
+                text=getattr(resp, "output_text", "") or "",
+                reasoning=_reasoning_summary(resp),
+                **_usage_counts(resp),
+            )
+        except openai.RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Error performing OpenAI streaming request: {e}")
+            return LLMResponse(f"Error performing OpenAI request: {e}")
+
+    @async_retry_with_exponential_backoff(errors=(openai.RateLimitError,))
+    async def generate_structured_response(self, request: LLMRequest) -> JSONLLMResponse:
+        messages = self._to_openai_messages(request.messages)
+        return await self._structured(
+            request, messages, lambda resp: getattr(resp, "output_text", "") or "{}"
+        )
+
+    @async_retry_with_exponential_backoff(errors=(openai.RateLimitError,))
+    async def generate_response_using_schema(
+        self, request: LLMRequest, schema: Dict[str, Any]
+    ) -> JSONLLMResponse:
+        messages = self._to_openai_messages(
+            request.messages
+            + [
+                LLMMessage(
+                    LLMMessageRole.SYSTEM,
+                    "Return the requested information following the provided JSON schema.",
+                )
+            ]
+        )
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": "structured_response", "schema": schema, "strict": True},
+        }
+        return await self._structured(
+            request, messages, _structured_output, response_format=response_format
+        )
+
+    async def _structured(self, request: LLMRequest, messages, text_of, **extra) -> JSONLLMResponse:
+        """Ask until the output parses as JSON (MAX_RETRIES_INVALID_JSON attempts)."""
+        totals = dict.fromkeys(_usage_counts(None), 0)
+        for attempt in range(1, MAX_RETRIES_INVALID_JSON + 1):
+            resp = await self.client.responses.create(
+                model=request.model or "gpt-5",
+                input=messages,
+                **extra,
+                **(request.params or {}),
+            )
+            for key, tokens in _usage_counts(resp).items():
+                totals[key] += tokens
+            try:
+                return JSONLLMResponse(
+                    text=text_of(resp), reasoning=_reasoning_summary(resp), **totals
+                )
+            except Exception as e:
+                logger.error(f"Failed to parse JSON response from OpenAI (attempt {attempt}): {e}")
+                error = e
+        logger.error(f"Max retries reached for JSON parsing: {error}")
+        return JSONLLMResponse(f'{{"error":"{str(error)}"}}')
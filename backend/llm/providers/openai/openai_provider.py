@@ -32,6 +32,44 @@ def _get_nested(obj, *path, default=None):
     return default if cur is None else cur
 
 
+def _usage_counts(resp) -> Dict[str, int]:
+    """Token counts of a Responses API response, keyed like LLMResponse's counts."""
+    usage = getattr(resp, "usage", None)
+    return {
+        "input_token_count": int(_get_nested(usage, "input_tokens", default=0) or 0),
+        "output_token_count": int(_get_nested(usage, "output_tokens", default=0) or 0),
+        "reasoning_token_count": int(
+            _get_nested(usage, "output_tokens_details", "reasoning_tokens", default=0)
+            or 0
+        ),
+        "cached_input_token_count": int(
+            _get_nested(usage, "input_tokens_details", "cached_tokens", default=0) or 0
+        ),
+    }
+
+
+def _reasoning_summary(resp) -> str:
+    for item in getattr(resp, "output", []) or []:
+        if getattr(item, "type", "") == "reasoning":
+            summary = getattr(item, "summary", []) or []
+            return "".join(getattr(ch, "text", str(ch)) for ch in summary)
+    return ""
+
+
+def _structured_output(resp) -> str:
+    """JSON text of a structured (json_schema) output; raises if there is none."""
+    output_items = getattr(resp, "output", []) or []
+    if not output_items:
+        raise RuntimeError("No output items in response")
+    contents = getattr(output_items[0], "content", []) or []
+    if not contents:
+        raise RuntimeError("No content in first output item")
+    json_obj = getattr(contents[0], "json", None)
+    if json_obj is None:
+        raise RuntimeError("Expected JSON structured output, found none")
+    return json.dumps(json_obj)
+
+
 class OpenAIProvider(BaseLLMProvider):
     """
     Thin wrapper over OpenAI's Chat Completions API.
@@ -66,40 +104,10 @@ class OpenAIProvider(BaseLLMProvider):
                 **(request.params or {}),
             )
 
-            # Primary text
-            text = getattr(resp, "output_text", "") or ""
-
-            # Reasoning summary (if present)
-            reasoning = ""
-            output_items = getattr(resp, "output", []) or []
-            for item in output_items:
-                if getattr(item, "type", "") == "reasoning":
-                    summary = getattr(item, "summary", []) or []
-                    reasoning = "".join(getattr(ch, "text", str(ch)) for ch in summary)
-                    break
-
-            # Token counts
-            usage = getattr(resp, "usage", None)
-            input_tokens = int(_get_nested(usage, "input_tokens", default=0) or 0)
-            output_tokens = int(_get_nested(usage, "output_tokens", default=0) or 0)
-            reasoning_tokens = int(
-                _get_nested(
-                    usage, "output_tokens_details", "reasoning_tokens", default=0
-                )
-                or 0
-            )
-            cached_input_tokens = int(
-                _get_nested(usage, "input_tokens_details", "cached_tokens", default=0)
-                or 0
-            )
-
             return LLMResponse(
-                text=text,
-                reasoning=reasoning,
-                input_token_count=input_tokens,
-                output_token_count=output_tokens,
-                reasoning_token_count=reasoning_tokens,
-                cached_input_token_count=cached_input_tokens,
+                text=getattr(resp, "output_text", "") or "",
+                reasoning=_reasoning_summary(resp),
+                **_usage_counts(resp),
             )
         except Exception as e:
             logger.error(f"Error performing OpenAI request: {e}")
@@ -109,10 +117,7 @@ class OpenAIProvider(BaseLLMProvider):
     def generate_structured_response(self, request: LLMRequest) -> JSONLLMResponse:
         count = 0
         messages = self._to_openai_messages(request.messages)
-        total_input_tokens = 0
-        total_output_tokens = 0
-        total_reasoning_tokens = 0
-        total_cached_input_tokens = 0
+        totals = dict.fromkeys(_usage_counts(None), 0)
 
         while True:
             resp = self.client.responses.create(
@@ -123,43 +128,12 @@ class OpenAIProvider(BaseLLMProvider):
 
             # Text to parse as JSON
             text = getattr(resp, "output_text", "") or "{}"
-
-            # Optional reasoning and counts (attached to the JSON response object)
-            usage = getattr(resp, "usage", None)
-            input_tokens = int(_get_nested(usage, "input_tokens", default=0) or 0)
-            output_tokens = int(_get_nested(usage, "output_tokens", default=0) or 0)
-            reasoning_tokens = int(
-                _get_nested(
-                    usage, "output_tokens_details", "reasoning_tokens", default=0
-                )
-                or 0
-            )
-            cached_input_tokens = int(
-                _get_nested(usage, "input_tokens_details", "cached_tokens", default=0)
-                or 0
-            )
-
-            reasoning = ""
-            output_items = getattr(resp, "output", []) or []
-            for item in output_items:
-                if getattr(item, "type", "") == "reasoning":
-                    summary = getattr(item, "summary", []) or []
-                    reasoning = "".join(getattr(ch, "text", str(ch)) for ch in summary)
-                    break
-
-            total_input_tokens += input_tokens
-            total_output_tokens += output_tokens
-            total_reasoning_tokens += reasoning_tokens
-            total_cached_input_tokens += cached_input_tokens
+            for key, tokens in _usage_counts(resp).items():
+                totals[key] += tokens
 
             try:
                 return JSONLLMResponse(
-                    text=text,
-                    reasoning=reasoning,
-                    input_token_count=total_input_tokens,
-                    output_token_count=total_output_tokens,
-                    reasoning_token_count=total_reasoning_tokens,
-                    cached_input_token_count=total_cached_input_tokens,
+                    text=text, reasoning=_reasoning_summary(resp), **totals
                 )
             except Exception as e:
                 count += 1
@@ -189,11 +163,7 @@ class OpenAIProvider(BaseLLMProvider):
         )
 
         messages = self._to_openai_messages(llm_messages)
-
-        total_input_tokens = 0
-        total_output_tokens = 0
-        total_reasoning_tokens = 0
-        total_cached_input_tokens = 0
+        totals = dict.fromkeys(_usage_counts(None), 0)
 
         while True:
             resp = self.client.responses.create(
@@ -209,62 +179,15 @@ class OpenAIProvider(BaseLLMProvider):
                 },
                 **(request.params or {}),
             )
-
-            usage = getattr(resp, "usage", None)
-            input_tokens = int(_get_nested(usage, "input_tokens", default=0) or 0)
-            output_tokens = int(_get_nested(usage, "output_tokens", default=0) or 0)
-            reasoning_tokens = int(
-                _get_nested(
-                    usage, "output_tokens_details", "reasoning_tokens", default=0
-                )
-                or 0
-            )
-            cached_input_tokens = int(
-                _get_nested(usage, "input_tokens_details", "cached_tokens", default=0)
-                or 0
-            )
-
-            total_input_tokens += input_tokens
-            total_output_tokens += output_tokens
-            total_reasoning_tokens += reasoning_tokens
-            total_cached_input_tokens += cached_input_tokens
-
-            # Extract optional reasoning text (if present in output)
-            reasoning = ""
-            output_items = getattr(resp, "output", []) or []
-            for item in output_items:
-                if getattr(item, "type", "") == "reasoning":
-                    summary = getattr(item, "summary", []) or []
-                    reasoning = "".join(getattr(ch, "text", str(ch)) for ch in summary)
-                    break
+            for key, tokens in _usage_counts(resp).items():
+                totals[key] += tokens
 
             # Extract the **structured JSON** from the output
             try:
-                # This part depends on SDK shape; for the Responses API the first
-                # text/json output is usually something like:
-                # resp.output[0].content[0].json
-                if not output_items:
-                    raise RuntimeError("No output items in response")
-
-                first_item = output_items[0]
-                contents = getattr(first_item, "content", []) or []
-                if not contents:
-                    raise RuntimeError("No content in first output item")
-
-                json_obj = getattr(contents[0], "json", None)
-                if json_obj is None:
-                    raise RuntimeError("Expected JSON structured output, found none")
-
-                # At this point json_obj is already a Python dict matching your schema
-                text = json.dumps(json_obj)
-
                 return JSONLLMResponse(
-                    text=text,
-                    reasoning=reasoning,
-                    input_token_count=total_input_tokens,
-                    output_token_count=total_output_tokens,
-                    reasoning_token_count=total_reasoning_tokens,
-                    cached_input_token_count=total_cached_input_tokens,
+                    text=_structured_output(resp),
+                    reasoning=_reasoning_summary(resp),
+                    **totals,
                 )
 
             except Exception as e:
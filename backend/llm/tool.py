@@ -3,6 +3,7 @@ from __future__ import annotations
 import importlib
 import importlib.util
 import inspect
+import threading
 import types
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -49,6 +50,22 @@ def _json_type_from_annotation(ann: Any) -> Dict[str, Any]:
     return {"type": "string"}
 
 
+# Tool classes are stateless; one shared instance per class is reused across calls
+_tool_instances: Dict[type, Any] = {}
+_tool_instances_lock = threading.Lock()
+
+
+def _tool_instance(tool_cls: type) -> Any:
+    instance = _tool_instances.get(tool_cls)
+    if instance is None:
+        with _tool_instances_lock:
+            instance = _tool_instances.get(tool_cls)
+            if instance is None:
+                instance = tool_cls()
+                _tool_instances[tool_cls] = instance
+    return instance
+
+
 @dataclass
 class Tool:
     name: str
@@ -108,7 +125,7 @@ class Tool:
         """Call the underlying function with the provided arguments."""
         if tool_cls is None:
             return self.func(**args)
-        cls_instance = tool_cls()
+        cls_instance = _tool_instance(tool_cls)
         # invoke as method of tool_cls
         return self.func(cls_instance, **args)
 
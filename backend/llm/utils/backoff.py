@@ -1,4 +1,5 @@
 # llm/utils/backoff.py
+import asyncio
 import random
 import time
 from functools import wraps
@@ -41,3 +42,37 @@ def retry_with_exponential_backoff(
         return wrapper
 
     return decorator
+
+
+def async_retry_with_exponential_backoff(
+    errors,
+    initial_delay: float = 1,
+    exponential_base: float = 2,
+    jitter: bool = True,
+    max_retries: int = 5,
+):
+    """retry_with_exponential_backoff for coroutine functions; waits without blocking the loop."""
+    if not isinstance(errors, tuple):
+        errors = (errors,)
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            delay = initial_delay
+            attempts = 0
+            while True:
+                try:
+                    return await func(*args, **kwargs)
+                except errors as e:
+                    print(f"Error: {e} - Attempt {attempts + 1} of {max_retries}")
+                    attempts += 1
+                    if attempts > max_retries:
+                        print(f"Max retries reached. Raising exception.")
+                        raise e
+                    sleep_for = delay * (1 + random.random() if jitter else 1)
+                    await asyncio.sleep(sleep_for)
+                    delay *= exponential_base
+
+        return wrapper
+
+    return decorator
@@ -116,3 +116,67 @@ def parse_first_json(text: str) -> Any:
     if tried == 0:
         raise ValueError("No balanced JSON candidates found.")
     raise ValueError(f"No PARSEABLE JSON among {tried} candidates.") from last_err
+
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JSONStringFieldStream:
+    """
+    Incrementally decodes the string value of one key from streamed JSON text.
+
+    feed() takes the next chunk of model output and returns the part of the
+    value's decoded text that became available, so a field can be shown while
+    the rest of the object is still being generated. Escapes split across chunks
+    are held back until complete.
+    """
+
+    def __init__(self, key: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(key))
+        self._buffer = ""
+        self._pos = -1  # position of the next undecoded value character
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        self._buffer += chunk
+        if self._pos < 0:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        s, i = self._buffer, self._pos
+        while i < len(s):
+            c = s[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+            if i + 1 >= len(s):
+                break  # escape continues in the next chunk
+            e = s[i + 1]
+            if e == "u":
+                if i + 6 > len(s):
+                    break
+                code = int(s[i + 2 : i + 6], 16)
+                if 0xD800 <= code < 0xDC00:  # surrogate pair
+                    if i + 12 > len(s):
+                        break
+                    low = int(s[i + 8 : i + 12], 16)
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                else:
+                    out.append(chr(code))
+                    i += 6
+            else:
+                out.append(_ESCAPES.get(e, e))
+                i += 2
+        self._pos = i
+        return "".join(out)
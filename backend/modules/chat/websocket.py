@@ -7,7 +7,7 @@ from core.decorators import ws_auth_required, AuthMode
 from core.base_websocket import BaseWebSocketHandler, register_route
 from core.registry import ServiceRegistry
 from agents.agent_router import AgentRouter
-from llm.providers.openai.openai_provider import OpenAIProvider
+from llm.providers.openai.async_openai_provider import AsyncOpenAIProvider
 from .utils import ChatUtils
 from .models import PromptData
 from core.logger import Logger
@@ -165,15 +165,25 @@ class ChatWebSocket(BaseWebSocketHandler):
                         logger.error(f"Cannot send, WebSocket closed: {session_id}")
                     break
                     
+                # progress events and answer deltas are sent as they happen; the
+                # agent_responses frame below still carries the complete answer
+                async def send_event(event: dict):
+                    try:
+                        await websocket.send_json(event)
+                    except (RuntimeError, WebSocketDisconnect):
+                        # the client left; finish the request so the answer is saved
+                        pass
+
                 # new agent router with provider
-                agent_router = AgentRouter(provider=OpenAIProvider)
+                agent_router = AgentRouter(provider=AsyncOpenAIProvider)
                 router_response = await agent_router.handle_request(
                     query=message,
                     project_id=project_id,
                     agent_scope=agents_selected if agents_selected else [],
                     messages=[], 
                     conversation_id=convId,
-                    prompt_id=str(question_prompt_id)
+                    prompt_id=str(question_prompt_id),
+                    on_event=send_event,
                 )
                 response = router_response.get("response_text", "")
                 agent_responses = router_response.get("agent_responses", [])
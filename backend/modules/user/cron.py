@@ -5,7 +5,7 @@ from cron.registry import cron_job
 from core.logger import Logger
 from .models import InsightsData
 from agents.agent_router import AgentRouter
-from llm.providers.openai.openai_provider import OpenAIProvider
+from llm.providers.openai.async_openai_provider import AsyncOpenAIProvider
 
 logger = Logger(__name__)
 
@@ -73,7 +73,7 @@ class GenerateInsightsJob(BaseCronJob):
                 "Make sure the response is concise and to the point."
             )
             # new agent router with provider
-            agent_router = AgentRouter(provider=OpenAIProvider)
+            agent_router = AgentRouter(provider=AsyncOpenAIProvider)
             router_response = await agent_router.handle_request(
                 query=prompt,
                 project_id=project_id,
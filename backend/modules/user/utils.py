@@ -9,7 +9,7 @@ from core.base_utils import BaseUtils
 from .models import InsightsData
 from modules.chat.models import PromptData
 from llm.message import LLMRequest
-from llm.providers.openai.openai_provider import OpenAIProvider as LLMProvider
+from llm.providers.openai.async_openai_provider import AsyncOpenAIProvider as LLMProvider
 from core.logger import Logger
 
 logger = Logger(__name__)
@@ -122,7 +122,7 @@ class UserUtils(BaseUtils):
                     params={"reasoning": {"effort": "low"}}
                 )
                 provider = LLMProvider()  # Assuming LLMProvider is defined and imported correctly
-                response = provider.generate_response(request)
+                response = await provider.generate_response(request)
                 response_content = response.text
                 # Save the generated insight to the database
                 insert_doc = InsightsData(
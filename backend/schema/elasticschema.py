@@ -26,6 +26,8 @@ ES_SETUP_INTENTS_INDEX = os.getenv("ES_SETUP_INTENTS_INDEX", "stripe_setup_inten
 ES_TAX_RATES_INDEX = os.getenv("ES_TAX_RATES_INDEX", "stripe_tax_rates")
 ES_APPLICATION_FEES_INDEX = os.getenv("ES_APPLICATION_FEES_INDEX", "stripe_application_fees")
 ES_TRANSFERS_INDEX = os.getenv("ES_TRANSFERS_INDEX", "stripe_transfers")
+ES_CUSTOMER_SUMMARY_INDEX = os.getenv("ES_CUSTOMER_SUMMARY_INDEX", "stripe_customer_summary")
+ES_SUBSCRIPTION_TIMELINE_INDEX = os.getenv("ES_SUBSCRIPTION_TIMELINE_INDEX", "stripe_subscription_timeline")
 ES_PAYPAL_INVOICES_INDEX = os.getenv("ES_PAYPAL_INVOICES_INDEX", "paypal_invoices")
 ES_PAYPAL_SUBSCRIPTIONS_INDEX = os.getenv("ES_PAYPAL_SUBSCRIPTIONS_INDEX", "paypal_subscriptions")
 ES_PAYPAL_BALANCES_INDEX = os.getenv("ES_PAYPAL_BALANCES_INDEX", "paypal_balances")
@@ -540,6 +542,69 @@ ES_SCHEMA = [
                 }
             }
         }
+    }, {
+        "index": ES_CUSTOMER_SUMMARY_INDEX,
+        "description": "One document per Stripe customer with rollups rebuilt at each sync: current MRR, lifetime revenue, first/last payment, status and at-risk flags.",
+        "index_body": {
+            "mappings": {
+                "properties": {
+                    "project_id": {"type": "keyword"},
+                    "customer_id": {"type": "keyword"},
+                    "email": {"type": "keyword"},
+                    "name": {"type": "keyword"},
+                    "country": {"type": "keyword"},
+                    "currency": {"type": "keyword"},
+                    "created": {"type": "long"},
+                    "status": {"type": "keyword"},
+                    "active_subscriptions": {"type": "integer"},
+                    "current_mrr": {"type": "double"},
+                    "mrr_subscriptions": {"type": "integer"},
+                    "first_payment_at": {"type": "long"},
+                    "last_payment_at": {"type": "long"},
+                    "days_to_first_payment": {"type": "double"},
+                    "lifetime_revenue": {"type": "double"},
+                    "paid_invoice_count": {"type": "integer"},
+                    "failed_invoice_count": {"type": "integer"},
+                    "canceled_at": {"type": "long"},
+                    "cancel_at_period_end": {"type": "boolean"},
+                    "last_downgrade_at": {"type": "long"},
+                    "at_risk": {"type": "boolean"},
+                    "at_risk_reasons": {"type": "keyword"},
+                    "last_synced": {
+                        "type": "date",
+                        "format": "strict_date_optional_time||epoch_millis"
+                    }
+                }
+            }
+        }
+    }, {
+        "index": ES_SUBSCRIPTION_TIMELINE_INDEX,
+        "description": "One document per Stripe subscription state change (new, upgrade, downgrade, churn, other) with from/to MRR, quantity and plan, projected from subscription events at sync.",
+        "index_body": {
+            "mappings": {
+                "properties": {
+                    "project_id": {"type": "keyword"},
+                    "event_id": {"type": "keyword"},
+                    "subscription_id": {"type": "keyword"},
+                    "customer_id": {"type": "keyword"},
+                    "occurred_at": {"type": "long"},
+                    "change_type": {"type": "keyword"},
+                    "status": {"type": "keyword"},
+                    "from_mrr": {"type": "double"},
+                    "to_mrr": {"type": "double"},
+                    "mrr_delta": {"type": "double"},
+                    "from_quantity": {"type": "integer"},
+                    "to_quantity": {"type": "integer"},
+                    "from_plan_id": {"type": "keyword"},
+                    "to_plan_id": {"type": "keyword"},
+                    "product_id": {"type": "keyword"},
+                    "last_synced": {
+                        "type": "date",
+                        "format": "strict_date_optional_time||epoch_millis"
+                    }
+                }
+            }
+        }
     }, {
         "index": ES_PAYPAL_INVOICES_INDEX,
         "index_body": {
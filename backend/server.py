@@ -1,4 +1,6 @@
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
@@ -7,14 +9,16 @@ load_dotenv()
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 
+from agents.db.plan_cache import PlanCache
+from agents.db.query_agent import QueryAgentArtifacts
 from core.base_database import BaseDatabase
-from core.db.elastic import ElasticClient
-from core.db.mongodb import MongoDBClient
 from core.loader import auto_load_all
 from core.logger import Logger, setup_logging
 from core.registry import ServiceRegistry
+from core.schema_catalog import SchemaCatalog
 from cron.registry import CronRegistry
 from cron.runner import init_cron_background
+from llm.providers.openai.async_openai_provider import close_shared_async_client
 
 # Initialize logger before anything else
 setup_logging()
@@ -22,17 +26,25 @@ setup_logging()
 app_logger = Logger(__name__)
 app_logger.info("Logger initialized successfully.")
 
-# establish database connections
-mongodb = MongoDBClient()
-elastic = ElasticClient()
-BaseDatabase.init_databases(mongodb, elastic)
+# threads behind asyncio.to_thread (blocking tools, searches, Mongo version reads)
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "64"))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app_logger.info("Starting up application...")
-    await mongodb.init()
+    # the default pool (cpu count + 4 threads) would queue the param sets of one
+    # batched tool call behind each other, and their searches could not coalesce
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="worker")
+    )
+    # establish the shared database connections before services load
+    await BaseDatabase.connect()
     auto_load_all()
+    # load the mappings of every registered index in one request
+    SchemaCatalog.refresh()
+    # index metadata, tool schemas and static prompt sections for QueryAgent calls
+    QueryAgentArtifacts.get()
 
     # Register routers after auto_load_all() populates ServiceRegistry
     for router in ServiceRegistry.get_all_apis():
@@ -57,6 +69,8 @@ async def lifespan(app: FastAPI):
 
     yield
     app_logger.info("Shutting down application...")
+    await close_shared_async_client()
+    await BaseDatabase.close()
 
 
 app = FastAPI(title="Statement", lifespan=lifespan)
@@ -70,6 +84,18 @@ app.add_middleware(
 )
 
 
+@app.get("/health/db-pools")
+async def db_pool_stats():
+    """Connection pool configuration and usage of the shared database clients."""
+    return BaseDatabase.pool_stats()
+
+
+@app.get("/health/plan-cache")
+async def plan_cache_stats():
+    """Hit rate and size of the QueryAgent plan cache."""
+    return PlanCache.stats()
+
+
 @app.websocket("/ws/{service_name}/{route_path:path}")
 async def websocket_endpoint(
     websocket: WebSocket, service_name: str, route_path: str = ""
@@ -74,6 +74,7 @@ class StripeDataSyncJob(BaseCronJob):
 
                     # Run all steps in parallel (with concurrency limit)
                     await asyncio.gather(*(run_step(name, fn) for name, fn in steps))
+                    await self.service.finalize_sync(project_id)
 
                     logger.info(f"Completed sync for project {project_id}")
 
@@ -0,0 +1,261 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from core.data_version import DataVersion
+from core.logger import Logger
+
+logger = Logger(__name__)
+
+# Safety net for processes that never see the sync run (e.g. cron in a separate worker)
+DIMENSION_TTL_SECONDS = int(os.getenv("STRIPE_DIMENSION_TTL_SECONDS", "900"))
+
+ACTIVE_SUBSCRIPTION_STATUSES = ("active", "trialing", "past_due")
+
+
+class DimensionTable:
+    """
+    Dimension rows of a single project.
+
+    customers: customer_id -> {country, currency, created, plan}
+    products:  product_id  -> name
+    prices:    price_id    -> {product, interval, interval_count, amount, currency}
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.customers: Dict[str, dict] = {}
+        self.products: Dict[str, Optional[str]] = {}
+        self.prices: Dict[str, dict] = {}
+        # (id, created) of the subscription currently backing customers[cid]["plan"]
+        self._plan_source: Dict[str, Tuple[Optional[str], int]] = {}
+        # set when a patch cannot be applied in place; the table is reloaded then
+        self.needs_reload = False
+
+    def country(self, customer_id: str, default: str = "Unknown") -> str:
+        row = self.customers.get(customer_id)
+        return row["country"] if row else default
+
+    def product_name(self, product_id: str, default: Optional[str] = None) -> Optional[str]:
+        name = self.products.get(product_id)
+        return name or (default if default is not None else product_id)
+
+    def set_current_plan(self, sub: dict):
+        """Point the customer's current plan at this subscription if it is the newest active one."""
+        customer_id = sub.get("customer")
+        if not customer_id:
+            return
+        source = self._plan_source.get(customer_id)
+        if sub.get("status") not in ACTIVE_SUBSCRIPTION_STATUSES:
+            if source is not None and source[0] is not None and source[0] == sub.get("id"):
+                # the plan's subscription ended; another active one may back it, which
+                # only a reload can tell
+                del self._plan_source[customer_id]
+                self.customers[customer_id]["plan"] = None
+                self.needs_reload = True
+            return
+        created = sub.get("created") or 0
+        if source is not None and created < source[1]:
+            return
+        self._plan_source[customer_id] = (sub.get("id"), created)
+        row = self.customers.setdefault(customer_id, StripeDimensions.customer_row({}))
+        row["plan"] = StripeDimensions.subscription_product(sub)
+
+
+class StripeDimensions:
+    """
+    Process-wide cache of per-project Stripe dimension tables.
+
+    Breakdown tools hash-join their fact rows (subscriptions, invoices) against these
+    tables instead of round-tripping to stripe_customers / stripe_products. A table is
+    loaded lazily from Elasticsearch, patched in place by the sync pipeline while rows
+    are indexed, and rebuilt once the project's DataVersion moves past it.
+    """
+
+    _tables: Dict[str, DimensionTable] = {}
+    _lock = threading.Lock()
+
+    # --- row builders ---
+
+    @staticmethod
+    def customer_row(customer: dict) -> dict:
+        return {
+            "country": (
+                customer.get("address", {}).get("country")
+                or customer.get("shipping", {}).get("address", {}).get("country")
+                or "Unknown"
+            ),
+            "currency": customer.get("currency"),
+            "created": customer.get("created"),
+            "plan": None,
+        }
+
+    @staticmethod
+    def price_row(price: dict) -> dict:
+        recurring = price.get("recurring", {})
+        return {
+            "product": price.get("product"),
+            "interval": price.get("interval") or recurring.get("interval"),
+            "interval_count": price.get("interval_count") or recurring.get("interval_count", 1),
+            "amount": price.get("amount", price.get("unit_amount")),
+            "currency": price.get("currency"),
+        }
+
+    @staticmethod
+    def subscription_product(sub: dict) -> Optional[str]:
+        plan = sub.get("plan")
+        if plan:
+            return plan.get("product")
+        items = sub.get("items", {}).get("data", [])
+        if items:
+            return items[0].get("plan", {}).get("product")
+        return None
+
+    # --- cache access ---
+
+    @classmethod
+    def get(cls, project_id: str, query_fn: Callable) -> DimensionTable:
+        """
+        Return the dimension table for a project, (re)loading it through query_fn
+        (BaseTool._fetch_elasticsearch) when missing, stale or expired.
+
+        query_fn must raise on failure: a table missing rows would be served as
+        complete until it expires, so a failed load raises and nothing is cached.
+        """
+        version = DataVersion.get(project_id)
+        table = cls._tables.get(project_id)
+        if (
+            table is not None
+            and table.version == version
+            and time.monotonic() - table.loaded_at < DIMENSION_TTL_SECONDS
+        ):
+            return table
+
+        table = cls._load(project_id, version, query_fn)
+        with cls._lock:
+            cls._tables[project_id] = table
+        return table
+
+    @classmethod
+    def _load(cls, project_id: str, version: int, query_fn: Callable) -> DimensionTable:
+        table = DimensionTable(version)
+        project_filter = [{"term": {"project_id": project_id}}]
+
+        customers = query_fn(
+            index="stripe_customers",
+            filters=project_filter,
+            source=[
+                "customer_id",
+                "cleaned_data.address.country",
+                "cleaned_data.shipping.address.country",
+                "cleaned_data.currency",
+                "cleaned_data.created",
+            ],
+        )
+        for hit in customers:
+            src = hit["_source"]
+            cid = src.get("customer_id")
+            if cid:
+                table.customers[cid] = cls.customer_row(src.get("cleaned_data", {}))
+
+        products = query_fn(
+            index="stripe_products",
+            filters=project_filter,
+            source=["product_id", "cleaned_data.id", "cleaned_data.name"],
+        )
+        for hit in products:
+            src = hit["_source"]
+            pdata = src.get("cleaned_data", {})
+            pid = src.get("product_id") or pdata.get("id")
+            if pid:
+                table.products[pid] = pdata.get("name")
+
+        plans = query_fn(
+            index="stripe_plans",
+            filters=project_filter,
+            source=["plan_id", "cleaned_data"],
+        )
+        for hit in plans:
+            src = hit["_source"]
+            plan_id = src.get("plan_id")
+            if plan_id:
+                table.prices[plan_id] = cls.price_row(src.get("cleaned_data", {}))
+
+        active_subs = query_fn(
+            index="stripe_subscriptions",
+            filters=project_filter
+            + [{"terms": {"cleaned_data.status": list(ACTIVE_SUBSCRIPTION_STATUSES)}}],
+            source=[
+                "cleaned_data.id",
+                "cleaned_data.customer",
+                "cleaned_data.status",
+                "cleaned_data.created",
+                "cleaned_data.plan.product",
+                "cleaned_data.items.data.plan.product",
+            ],
+        )
+        for hit in active_subs:
+            table.set_current_plan(hit["_source"].get("cleaned_data", {}))
+
+        logger.info(
+            f"Loaded Stripe dimensions for project {project_id} (v{version}): "
+            f"{len(table.customers)} customers, {len(table.products)} products, "
+            f"{len(table.prices)} prices"
+        )
+        return table
+
+    # --- incremental maintenance (called by the sync pipeline) ---
+
+    @classmethod
+    def upsert_customer(cls, project_id: str, customer: dict):
+        table = cls._tables.get(project_id)
+        if table is None or not customer.get("id"):
+            return
+        row = cls.customer_row(customer)
+        row["plan"] = table.customers.get(customer["id"], {}).get("plan")
+        table.customers[customer["id"]] = row
+
+    @classmethod
+    def upsert_product(cls, project_id: str, product: dict):
+        table = cls._tables.get(project_id)
+        if table is None or not product.get("id"):
+            return
+        table.products[product["id"]] = product.get("name")
+
+    @classmethod
+    def upsert_price(cls, project_id: str, price: dict):
+        table = cls._tables.get(project_id)
+        if table is None or not price.get("id"):
+            return
+        table.prices[price["id"]] = cls.price_row(price)
+
+    @classmethod
+    def upsert_subscription(cls, project_id: str, sub: dict):
+        table = cls._tables.get(project_id)
+        if table is None:
+            return
+        table.set_current_plan(sub)
+        for item in sub.get("items", {}).get("data", []):
+            price = item.get("price") or item.get("plan")
+            if price and price.get("id"):
+                table.prices.setdefault(price["id"], cls.price_row(price))
+
+    @classmethod
+    def mark_current(cls, project_id: str, version: int):
+        """
+        Tag an incrementally maintained table with the version the sync just published,
+        or drop it when the sync ended a subscription that backed a customer's plan.
+        """
+        table = cls._tables.get(project_id)
+        if table is None:
+            return
+        if table.needs_reload:
+            cls.invalidate(project_id)
+        else:
+            table.version = version
+
+    @classmethod
+    def invalidate(cls, project_id: str):
+        with cls._lock:
+            cls._tables.pop(project_id, None)
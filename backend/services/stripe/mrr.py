@@ -0,0 +1,43 @@
+def normalize_to_monthly(amount: float, interval: str, interval_count: int = 1) -> float:
+    """Normalize a recurring amount to a monthly figure (30-day / 4-week months)."""
+    interval_count = interval_count or 1
+    if interval == "day":
+        return (amount * 30) / interval_count
+    if interval == "week":
+        return (amount * 4) / interval_count
+    if interval == "month":
+        return amount / interval_count
+    if interval == "year":
+        return (amount / 12) / interval_count
+    return 0
+
+
+def items_mrr(items: list) -> float:
+    """Monthly amount of a list of subscription items (plan amount x quantity)."""
+    total = 0.0
+    for item in items:
+        plan = item.get("plan", {})
+        base_amount = (plan.get("amount", 0) or 0) * item.get("quantity", 1)
+        total += normalize_to_monthly(
+            base_amount, plan.get("interval", "month"), plan.get("interval_count", 1)
+        )
+    return total
+
+
+def subscription_mrr(subscription_data: dict) -> float:
+    """MRR of a single subscription with subscription-level discounts applied."""
+    sub_mrr = items_mrr(subscription_data.get("items", {}).get("data", []))
+
+    discount = subscription_data.get("discount")
+    if discount:
+        coupon = discount.get("coupon", {})
+        if "percent_off" in coupon and coupon["percent_off"]:
+            percent_off = coupon["percent_off"] / 100.0
+            sub_mrr = sub_mrr * (1 - percent_off)
+        elif "amount_off" in coupon and coupon["amount_off"]:
+            amount_off = coupon["amount_off"]
+            duration = coupon.get("duration")
+            if duration in ["forever", "repeating"]:
+                sub_mrr = max(0, sub_mrr - amount_off)
+
+    return sub_mrr
@@ -1,19 +1,32 @@
 import os
+import asyncio
 import stripe
 from bson import ObjectId
 from typing import Optional
 from datetime import datetime
 from elasticsearch import exceptions
 from core.base_service import BaseService
+from core.data_version import DataVersion
+from core.result_cache import ResultCache
+from core.schema_catalog import SchemaCatalog
 from core.registry import ServiceRegistry
 from core.logger import Logger
+from .dimensions import StripeDimensions
+from .summary import StripeCustomerSummary
+from .timeline import StripeSubscriptionTimeline
 
 logger = Logger(__name__)
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+# derived indices finalize_sync builds, recorded on the project once built
+DERIVED_INDICES = ("timeline", "customer_summary")
 
 class StripeService(BaseService):
     name = "stripe"
+
+    # projects whose derived indices are known to exist, and their backfill locks
+    _prepared: set = set()
+    _prepare_locks: dict = {}
     
     CURRENCY_EXPONENTS = {
         "bif": 0,
@@ -62,7 +75,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{invoice.id}")
-                self.elastic.index_document(index="stripe_invoices", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_invoices", document=doc, id=es_id)
 
                 logger.info(f"Indexed invoice {invoice.id} (Status: {invoice.status})")
             return { "status": "success", "indexed": invoices.data.count }
@@ -99,7 +112,8 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{cust.id}")
-                self.elastic.index_document(index="stripe_customers", document=customer_data, id=es_id)
+                await self.async_elastic.index_document(index="stripe_customers", document=customer_data, id=es_id)
+                StripeDimensions.upsert_customer(project_id, cleaned_data)
                 logger.info(f"Synced customer: {cust.id} - {cust.email}")
 
             return {"status": "success", "synced": customers.data.count}
@@ -132,7 +146,8 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{product.id}")
-                self.elastic.index_document(index="stripe_products", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_products", document=doc, id=es_id)
+                StripeDimensions.upsert_product(project_id, cleaned_product)
                 logger.info(f"Synced product: {product.id}")
 
             return {"status": "success", "synced": products.data.count}
@@ -165,7 +180,8 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{sub.id}")
-                self.elastic.index_document(index="stripe_subscriptions", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_subscriptions", document=doc, id=es_id)
+                StripeDimensions.upsert_subscription(project_id, cleaned_sub)
                 logger.info(f"Synced subscription: {sub.id}")
 
             return {"status": "success", "synced": subscriptions.data.count}
@@ -198,7 +214,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{tx.id}")
-                self.elastic.index_document(index="stripe_balancetransactions", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_balancetransactions", document=doc, id=es_id)
                 logger.info(f"Synced BalanceTransaction: {tx.id}")
 
             return {"status": "success", "synced": transactions.data.count}
@@ -231,7 +247,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{ev.id}")
-                self.elastic.index_document(index="stripe_events", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_events", document=doc, id=es_id)
                 logger.info(f"Synced Events: {ev.id}")
 
             return {"status": "success", "synced": events.data.count}
@@ -264,7 +280,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{ch.id}")
-                self.elastic.index_document(index="stripe_charges", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_charges", document=doc, id=es_id)
                 logger.info(f"Synced Charges: {ch.id}")
 
             return {"status": "success", "synced": charges.data.count}
@@ -297,7 +313,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{rf.id}")
-                self.elastic.index_document(index="stripe_refunds", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_refunds", document=doc, id=es_id)
                 logger.info(f"Synced Refund: {rf.id}")
 
             return {"status": "success", "synced": refunds.data.count}
@@ -330,7 +346,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{po.id}")
-                self.elastic.index_document(index="stripe_payouts", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_payouts", document=doc, id=es_id)
                 logger.info(f"Synced Payout: {po.id}")
 
             return {"status": "success", "synced": payouts.data.count}
@@ -363,7 +379,7 @@ class StripeService(BaseService):
 
             # Index document
             es_id = self.generate_hash(f"{project_id}_balance")
-            self.elastic.index_document(index="stripe_balance", document=doc, id=es_id)
+            await self.async_elastic.index_document(index="stripe_balance", document=doc, id=es_id)
             logger.info(f"Synced Balance: {project_id}_balance")
 
             return {"status": "success", "synced": 1}
@@ -397,7 +413,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{dispute.id}")
-                self.elastic.index_document(index="stripe_disputes", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_disputes", document=doc, id=es_id)
                 logger.info(f"Synced Dispute: {dispute.id}")
                 synced_count += 1
 
@@ -432,7 +448,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{file_obj.id}")
-                self.elastic.index_document(index="stripe_files", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_files", document=doc, id=es_id)
                 logger.info(f"Synced File: {file_obj.id}")
                 synced_count += 1
 
@@ -467,7 +483,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{mandate.id}")
-                self.elastic.index_document(index="stripe_mandates", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_mandates", document=doc, id=es_id)
                 logger.info(f"Synced Mandate: {mandate.id}")
                 synced_count += 1
 
@@ -502,7 +518,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{pi.id}")
-                self.elastic.index_document(index="stripe_payment_intents", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_payment_intents", document=doc, id=es_id)
                 logger.info(f"Synced PaymentIntent: {pi.id}")
                 synced_count += 1
 
@@ -537,7 +553,8 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{plan.id}")
-                self.elastic.index_document(index="stripe_plans", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_plans", document=doc, id=es_id)
+                StripeDimensions.upsert_price(project_id, cleaned_plan)
                 logger.info(f"Synced Plan: {plan.id}")
                 synced_count += 1
 
@@ -572,7 +589,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{coupon.id}")
-                self.elastic.index_document(index="stripe_coupons", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_coupons", document=doc, id=es_id)
                 logger.info(f"Synced Coupon: {coupon.id}")
                 synced_count += 1
 
@@ -607,7 +624,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{pm.id}")
-                self.elastic.index_document(index="stripe_payment_methods", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_payment_methods", document=doc, id=es_id)
                 logger.info(f"Synced PaymentMethod: {pm.id}")
                 synced_count += 1
 
@@ -642,7 +659,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{si.id}")
-                self.elastic.index_document(index="stripe_setup_intents", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_setup_intents", document=doc, id=es_id)
                 logger.info(f"Synced SetupIntent: {si.id}")
                 synced_count += 1
 
@@ -677,7 +694,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{tr.id}")
-                self.elastic.index_document(index="stripe_tax_rates", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_tax_rates", document=doc, id=es_id)
                 logger.info(f"Synced TaxRate: {tr.id}")
                 synced_count += 1
 
@@ -712,7 +729,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{af.id}")
-                self.elastic.index_document(index="stripe_application_fees", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_application_fees", document=doc, id=es_id)
                 logger.info(f"Synced ApplicationFee: {af.id}")
                 synced_count += 1
 
@@ -747,7 +764,7 @@ class StripeService(BaseService):
 
                 # Index document
                 es_id = self.generate_hash(f"{project_id}{transfer.id}")
-                self.elastic.index_document(index="stripe_transfers", document=doc, id=es_id)
+                await self.async_elastic.index_document(index="stripe_transfers", document=doc, id=es_id)
                 logger.info(f"Synced Transfer: {transfer.id}")
                 synced_count += 1
 
@@ -792,9 +809,68 @@ class StripeService(BaseService):
         )
         return True if project.modified_count > 0 else False
     
+    async def prepare(self, project_id: str):
+        """
+        Backfill the derived indices of a project last synced before they existed.
+        Until then its tools would read an empty projection as real zeros.
+        """
+        if project_id in self._prepared:
+            return
+        lock = self._prepare_locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            if project_id in self._prepared:
+                return
+            project = await self.mongodb.get_collection("projects").find_one(
+                {"_id": ObjectId(project_id)}, {"stripe_derived_indices": 1}
+            )
+            built = set((project or {}).get("stripe_derived_indices") or [])
+            if not built.issuperset(DERIVED_INDICES):
+                logger.info(f"Backfilling derived Stripe indices for project {project_id}")
+                await self.finalize_sync(project_id)
+            else:
+                self._prepared.add(project_id)
+
+    async def finalize_sync(self, project_id: str):
+        """Build derived indices and publish a new data version once a sync run has finished."""
+        built = []
+        try:
+            await StripeSubscriptionTimeline().rebuild(project_id)
+            built.append("timeline")
+        except Exception as e:
+            logger.error(f"Error projecting subscription timeline for project {project_id}: {e}")
+        try:
+            await StripeCustomerSummary().rebuild(project_id)
+            built.append("customer_summary")
+        except Exception as e:
+            logger.error(f"Error building customer summaries for project {project_id}: {e}")
+        await self._record_derived_indices(project_id, built)
+        version = await asyncio.to_thread(DataVersion.bump, project_id)
+        StripeDimensions.mark_current(project_id, version)
+        ResultCache.invalidate(project_id)
+        # dynamic mappings pick up fields seen for the first time in this sync
+        SchemaCatalog.invalidate(*(schema.get("index") for schema in self.es_mapping))
+        return version
+    
+    async def _record_derived_indices(self, project_id: str, built: list):
+        if not built:
+            return
+        await self.mongodb.get_collection("projects").update_one(
+            {"_id": ObjectId(project_id)},
+            {"$addToSet": {"stripe_derived_indices": {"$each": built}}},
+        )
+        if set(built).issuperset(DERIVED_INDICES):
+            self._prepared.add(project_id)
+
     async def disconnect_stripe(self, project_id: str):
         # remove stripe data from elasticsearch and mongodb
-        status = self.es_remove_stripe_data(project_id)
+        status = await self.es_remove_stripe_data(project_id)
+        StripeDimensions.invalidate(project_id)
+        await self.mongodb.get_collection("projects").update_one(
+            {"_id": ObjectId(project_id)}, {"$unset": {"stripe_derived_indices": 1}}
+        )
+        self._prepared.discard(project_id)
+        await asyncio.to_thread(DataVersion.bump, project_id)
+        ResultCache.invalidate(project_id)
         prefix = "stripe_"
         collections = await self.mongodb.list_collections()
 
@@ -806,13 +882,13 @@ class StripeService(BaseService):
             logger.info(f"Deleted {result.deleted_count} documents from {col_name}")
         return status
     
-    def es_remove_stripe_data(self, project_id: str) -> bool:
+    async def es_remove_stripe_data(self, project_id: str) -> bool:
         """
         Remove all Stripe-related data for a given project from Elasticsearch.
         """
         if not project_id:
             return False
-        indices = self.elastic.list_indices(pattern="stripe_*")
+        indices = await self.async_elastic.list_indices(pattern="stripe_*")
 
         for index in indices:
             try:
@@ -823,7 +899,7 @@ class StripeService(BaseService):
                         }
                     }
                 }
-                self.elastic.delete_by_query(index=index, body=query)
+                await self.async_elastic.delete_by_query(index=index, body=query)
                 logger.info(f"Deleted Stripe data from index: {index} for project_id: {project_id}")
             except exceptions.NotFoundError:
                 logger.error(f"Index not found: {index}, skipping.")
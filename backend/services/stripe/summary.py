@@ -0,0 +1,206 @@
+import os
+import time
+from datetime import datetime
+from core.base_database import BaseDatabase
+from core.base_service import BaseService
+from core.logger import Logger
+from .dimensions import ACTIVE_SUBSCRIPTION_STATUSES, StripeDimensions
+from .mrr import subscription_mrr
+from .timeline import TIMELINE_INDEX
+
+logger = Logger(__name__)
+
+CUSTOMER_SUMMARY_INDEX = "stripe_customer_summary"
+AT_RISK_LOOKBACK_DAYS = int(os.getenv("STRIPE_AT_RISK_LOOKBACK_DAYS", "90"))
+FAILED_INVOICE_STATUSES = ("open", "unpaid", "uncollectible")
+
+
+class StripeCustomerSummary(BaseDatabase):
+    """
+    Builds the stripe_customer_summary index: one document per customer with the
+    rollups tools otherwise re-derive from raw subscriptions, invoices and events
+    (first payment, lifetime revenue, current MRR, status and at-risk flags).
+
+    Rebuilt from the MongoDB copies of the synced objects at the end of each sync run,
+    after the subscription timeline has been projected.
+    """
+
+    async def rebuild(self, project_id: str) -> int:
+        now_ts = int(time.time())
+        lookback_ts = now_ts - AT_RISK_LOOKBACK_DAYS * 86400
+
+        summaries = {}
+
+        def summary_for(customer_id: str) -> dict:
+            if customer_id not in summaries:
+                summaries[customer_id] = self._empty_summary(project_id, customer_id)
+            return summaries[customer_id]
+
+        # --- customers ---
+        customers = self.mongodb.get_collection("stripe_customers").find(
+            {"project_id": project_id},
+            {"customer_id": 1, "email": 1, "name": 1, "cleaned_data": 1},
+        )
+        async for doc in customers:
+            cid = doc.get("customer_id")
+            if not cid:
+                continue
+            row = StripeDimensions.customer_row(doc.get("cleaned_data", {}))
+            summary = summary_for(cid)
+            summary.update(
+                {
+                    "email": doc.get("email"),
+                    "name": doc.get("name"),
+                    "country": row["country"],
+                    "currency": row["currency"],
+                    "created": row["created"],
+                }
+            )
+
+        # --- subscriptions ---
+        subscriptions = self.mongodb.get_collection("stripe_subscriptions").find(
+            {"project_id": project_id}, {"cleaned_data": 1}
+        )
+        async for doc in subscriptions:
+            sub = doc.get("cleaned_data", {})
+            cid = sub.get("customer")
+            if not cid:
+                continue
+            summary = summary_for(cid)
+            status = sub.get("status")
+            if status in ACTIVE_SUBSCRIPTION_STATUSES:
+                summary["active_subscriptions"] += 1
+                if sub.get("cancel_at_period_end"):
+                    summary["cancel_at_period_end"] = True
+                if status == "past_due":
+                    self._flag(summary, "past_due")
+            # high-value counts historically used strictly "active" subscriptions
+            if status == "active":
+                summary["current_mrr"] += subscription_mrr(sub)
+                summary["mrr_subscriptions"] += 1
+            canceled_at = sub.get("canceled_at")
+            if canceled_at and canceled_at > (summary["canceled_at"] or 0):
+                summary["canceled_at"] = canceled_at
+
+        # --- invoices ---
+        invoices = self.mongodb.get_collection("stripe_invoices").find(
+            {"project_id": project_id},
+            {
+                "cleaned_data.customer": 1,
+                "cleaned_data.status": 1,
+                "cleaned_data.created": 1,
+                "cleaned_data.amount_paid": 1,
+            },
+        )
+        async for doc in invoices:
+            inv = doc.get("cleaned_data", {})
+            cid = inv.get("customer")
+            if not cid:
+                continue
+            summary = summary_for(cid)
+            created = inv.get("created")
+            status = inv.get("status")
+            if status == "paid":
+                summary["paid_invoice_count"] += 1
+                summary["lifetime_revenue"] += inv.get("amount_paid", 0) or 0
+                if created and (summary["first_payment_at"] is None or created < summary["first_payment_at"]):
+                    summary["first_payment_at"] = created
+                if created and created > (summary["last_payment_at"] or 0):
+                    summary["last_payment_at"] = created
+            elif status in FAILED_INVOICE_STATUSES:
+                summary["failed_invoice_count"] += 1
+                if created and created >= lookback_ts:
+                    self._flag(summary, "payment_failed")
+
+        # --- downgrades (from the subscription timeline) ---
+        downgrades = self.mongodb.get_collection(TIMELINE_INDEX).find(
+            {"project_id": project_id, "change_type": "downgrade"},
+            {"customer_id": 1, "occurred_at": 1},
+        )
+        async for row in downgrades:
+            cid = row.get("customer_id")
+            if not cid:
+                continue
+            summary = summary_for(cid)
+            occurred_at = row.get("occurred_at") or 0
+            if occurred_at > (summary["last_downgrade_at"] or 0):
+                summary["last_downgrade_at"] = occurred_at
+            if occurred_at >= lookback_ts:
+                self._flag(summary, "downgraded")
+
+        # --- finalize ---
+        last_synced = datetime.utcnow().isoformat()
+        documents = []
+        for cid, summary in summaries.items():
+            if summary["active_subscriptions"] > 0:
+                summary["status"] = "active"
+            elif summary["canceled_at"]:
+                summary["status"] = "churned"
+            if summary["cancel_at_period_end"]:
+                self._flag(summary, "cancel_scheduled")
+            # churned customers are lost, not at risk
+            summary["at_risk"] = summary["status"] == "active" and bool(summary["at_risk_reasons"])
+            if summary["first_payment_at"] and summary["created"] and summary["first_payment_at"] >= summary["created"]:
+                summary["days_to_first_payment"] = (
+                    summary["first_payment_at"] - summary["created"]
+                ) / 86400
+            summary["current_mrr"] = round(summary["current_mrr"], 2)
+            summary["lifetime_revenue"] = round(summary["lifetime_revenue"], 2)
+            summary["last_synced"] = last_synced
+            documents.append((BaseService.generate_hash(f"{project_id}{cid}"), summary))
+
+        errors = []
+        if documents:
+            _, errors = await self.async_elastic.bulk_index(index=CUSTOMER_SUMMARY_INDEX, documents=documents)
+        if not errors:
+            # customers deleted upstream: summaries this rebuild did not write
+            await self.async_elastic.client.indices.refresh(index=CUSTOMER_SUMMARY_INDEX)
+            await self.async_elastic.delete_by_query(
+                index=CUSTOMER_SUMMARY_INDEX,
+                body={
+                    "query": {
+                        "bool": {
+                            "filter": [
+                                {"term": {"project_id": project_id}},
+                                {"range": {"last_synced": {"lt": last_synced}}},
+                            ]
+                        }
+                    }
+                },
+            )
+        logger.info(f"Built {len(documents)} customer summaries for project {project_id}")
+        return len(documents)
+
+    # --- helpers ---
+
+    @staticmethod
+    def _empty_summary(project_id: str, customer_id: str) -> dict:
+        return {
+            "project_id": project_id,
+            "customer_id": customer_id,
+            "email": None,
+            "name": None,
+            "country": "Unknown",
+            "currency": None,
+            "created": None,
+            "status": "never_subscribed",
+            "active_subscriptions": 0,
+            "current_mrr": 0.0,
+            "mrr_subscriptions": 0,  # subscriptions counted in current_mrr
+            "first_payment_at": None,
+            "last_payment_at": None,
+            "days_to_first_payment": None,
+            "lifetime_revenue": 0.0,
+            "paid_invoice_count": 0,
+            "failed_invoice_count": 0,
+            "canceled_at": None,
+            "cancel_at_period_end": False,
+            "last_downgrade_at": None,
+            "at_risk": False,
+            "at_risk_reasons": [],
+        }
+
+    @staticmethod
+    def _flag(summary: dict, reason: str):
+        if reason not in summary["at_risk_reasons"]:
+            summary["at_risk_reasons"].append(reason)
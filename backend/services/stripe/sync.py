@@ -44,5 +44,8 @@ class StripeSyncHandler(BaseSyncHandler):
             ("transfers", self.service.sync_stripe_transfers),
         ]
 
+    async def after_sync(self, project_id: str):
+        await self.service.finalize_sync(project_id)
+
 
 stripe_handler = StripeSyncHandler()
@@ -0,0 +1,135 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from core.base_database import BaseDatabase
+from core.base_service import BaseService
+from core.logger import Logger
+from .mrr import items_mrr
+
+logger = Logger(__name__)
+
+TIMELINE_INDEX = "stripe_subscription_timeline"
+TIMELINE_EVENT_TYPES = (
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+)
+
+
+class StripeSubscriptionTimeline(BaseDatabase):
+    """
+    Projects subscription events into the stripe_subscription_timeline index: one
+    document per state change with from/to MRR, quantity, plan and a change type
+    (new, upgrade, downgrade, churn, other).
+
+    Built incrementally at the end of each sync run: only events at or after the
+    newest projected change are read back from MongoDB. Rows are kept in MongoDB
+    as well, like every other synced object, so later derived data can reuse them.
+    """
+
+    async def rebuild(self, project_id: str) -> int:
+        collection = self.mongodb.get_collection(TIMELINE_INDEX)
+        latest = await collection.find_one(
+            {"project_id": project_id}, sort=[("occurred_at", -1)]
+        )
+        watermark = latest["occurred_at"] if latest else 0
+
+        events = self.mongodb.get_collection("stripe_events").find(
+            {
+                "project_id": project_id,
+                "cleaned_data.type": {"$in": list(TIMELINE_EVENT_TYPES)},
+                "cleaned_data.created": {"$gte": watermark},
+            },
+            {"cleaned_data": 1},
+        )
+
+        last_synced = datetime.utcnow().isoformat()
+        rows = []
+        async for doc in events:
+            row = self.project_event(project_id, doc.get("cleaned_data", {}))
+            if row:
+                row["last_synced"] = last_synced
+                rows.append(row)
+
+        if rows:
+            await collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"project_id": project_id, "event_id": row["event_id"]},
+                        {"$set": dict(row)},
+                        upsert=True,
+                    )
+                    for row in rows
+                ],
+                ordered=False,
+            )
+            await self.async_elastic.bulk_index(
+                index=TIMELINE_INDEX,
+                documents=[
+                    (BaseService.generate_hash(f"{project_id}{row['event_id']}"), row)
+                    for row in rows
+                ],
+            )
+        logger.info(f"Projected {len(rows)} subscription changes for project {project_id}")
+        return len(rows)
+
+    @classmethod
+    def project_event(cls, project_id: str, event: dict) -> dict:
+        """Turn one customer.subscription.* event into a timeline row (None if not applicable)."""
+        event_type = event.get("type")
+        obj = event.get("data", {}).get("object", {})
+        prev = event.get("data", {}).get("previous_attributes", {})
+        if event_type not in TIMELINE_EVENT_TYPES or not obj.get("id") or not event.get("id"):
+            return None
+
+        to_items = obj.get("items", {}).get("data", [])
+        from_items = cls._previous_items(obj, prev)
+
+        if event_type == "customer.subscription.created":
+            from_items, from_mrr, to_mrr = [], 0.0, items_mrr(to_items)
+            change_type = "new"
+        elif event_type == "customer.subscription.deleted":
+            from_items, from_mrr, to_mrr = to_items, items_mrr(to_items), 0.0
+            to_items = []
+            change_type = "churn"
+        else:
+            from_mrr, to_mrr = items_mrr(from_items), items_mrr(to_items)
+            if to_mrr > from_mrr:
+                change_type = "upgrade"
+            elif to_mrr < from_mrr:
+                change_type = "downgrade"
+            else:
+                change_type = "other"
+
+        return {
+            "project_id": project_id,
+            "event_id": event["id"],
+            "subscription_id": obj["id"],
+            "customer_id": obj.get("customer"),
+            "occurred_at": event.get("created"),
+            "change_type": change_type,
+            "status": obj.get("status"),
+            "from_mrr": round(from_mrr, 2),
+            "to_mrr": round(to_mrr, 2),
+            "mrr_delta": round(to_mrr - from_mrr, 2),
+            "from_quantity": sum(item.get("quantity", 1) for item in from_items),
+            "to_quantity": sum(item.get("quantity", 1) for item in to_items),
+            "from_plan_id": cls._first_plan(from_items).get("id"),
+            "to_plan_id": cls._first_plan(to_items).get("id"),
+            "product_id": cls._first_plan(to_items or from_items).get("product"),
+        }
+
+    # --- helpers ---
+
+    @staticmethod
+    def _previous_items(obj: dict, prev: dict) -> list:
+        """Reconstruct the subscription items as they were before the update."""
+        current = obj.get("items", {}).get("data", [])
+        if "items" in prev:
+            return prev["items"].get("data", [])
+        if "quantity" in prev and len(current) == 1:
+            return [dict(current[0], quantity=prev["quantity"])]
+        return current
+
+    @staticmethod
+    def _first_plan(items: list) -> dict:
+        return (items[0].get("plan") or items[0].get("price") or {}) if items else {}
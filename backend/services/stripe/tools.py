@@ -4,11 +4,20 @@ from datetime import datetime, timedelta
 
 from core.registry import ServiceRegistry
 from dateutil.relativedelta import relativedelta
-from core.base_tools import BaseTool
+from core.base_tools import BaseTool, record_failure
 from core.logger import Logger
+from .dimensions import StripeDimensions
+from .mrr import subscription_mrr
+from .summary import CUSTOMER_SUMMARY_INDEX
+from .timeline import TIMELINE_INDEX
 
 logger = Logger(__name__)
 
+# Upper bound for terms aggregations (matches the default search.max_buckets)
+MAX_TERMS_BUCKETS = 65535
+# Buckets per page of a composite aggregation that carries top_hits
+COMPOSITE_PAGE_SIZE = 1000
+
 class ReactDatabaseTools(BaseTool):
     """Tool class to interact with MongoDB and Elasticsearch databases"""
         
@@ -35,6 +44,14 @@ class ReactDatabaseTools(BaseTool):
                 f"Invalid date format: {date_string}. Expected 'YYYY-MM-DD'"
             ) from e
 
+    def _dimensions(self, project_id: str):
+        """Cached customer/product/price dimension table used for in-memory joins."""
+        try:
+            return StripeDimensions.get(project_id, self._fetch_elasticsearch)
+        except Exception as e:
+            record_failure(f"Could not load Stripe dimensions: {str(e)}")
+            raise
+
 
     def calculate_monthly_revenue(self, project_id: str, start_date: str, end_date: str):
         """
@@ -544,14 +561,16 @@ class ReactDatabaseTools(BaseTool):
                 }
             }
 
-            subs_start = self._query_elasticsearch(
-                index="stripe_subscriptions", query=query_start
-            )
             active_start_customers = set()
-            for hit in subs_start:
-                customer_id = hit["_source"]["cleaned_data"].get("customer")
-                if customer_id:
-                    active_start_customers.add(customer_id)
+            for page in self._stream_elasticsearch(
+                index="stripe_subscriptions",
+                query=query_start,
+                source=["cleaned_data.customer"],
+            ):
+                for hit in page:
+                    customer_id = hit["_source"].get("cleaned_data", {}).get("customer")
+                    if customer_id:
+                        active_start_customers.add(customer_id)
             active_start_count = len(active_start_customers)
             if active_start_count == 0:
                 logger.info("no active_start_customers")
@@ -569,14 +588,16 @@ class ReactDatabaseTools(BaseTool):
                     }
                 },
             ]
-            subs_churned = self._query_elasticsearch(
-                index="stripe_subscriptions", filters=filters_churned
-            )
             churned_customers = set()
-            for hit in subs_churned:
-                customer_id = hit["_source"]["cleaned_data"].get("customer")
-                if customer_id and customer_id in active_start_customers:
-                    churned_customers.add(customer_id)
+            for page in self._stream_elasticsearch(
+                index="stripe_subscriptions",
+                filters=filters_churned,
+                source=["cleaned_data.customer"],
+            ):
+                for hit in page:
+                    customer_id = hit["_source"].get("cleaned_data", {}).get("customer")
+                    if customer_id and customer_id in active_start_customers:
+                        churned_customers.add(customer_id)
             churned_count = len(churned_customers)
 
             churn_rate = churned_count / active_start_count
@@ -629,49 +650,24 @@ class ReactDatabaseTools(BaseTool):
                 }
             }
 
-            subs_start = self._query_elasticsearch(
-                index="stripe_subscriptions", query=query_start
-            )
+            mrr_source = [
+                "cleaned_data.id",
+                "cleaned_data.items.data.plan",
+                "cleaned_data.items.data.quantity",
+                "cleaned_data.discount",
+            ]
             active_start_sub_ids = set()
             mrr_at_start = 0.0
-
-            for hit in subs_start:
-                sub_data = hit["_source"]["cleaned_data"]
-                sub_id = sub_data.get("id")
-                active_start_sub_ids.add(sub_id)
-                # Calculate MRR for this subscription
-                sub_mrr = 0.0
-                items = sub_data.get("items", {}).get("data", [])
-                for item in items:
-                    plan = item.get("plan", {})
-                    amount_cents = plan.get("amount", 0)
-                    interval = plan.get("interval", "month")
-                    interval_count = plan.get("interval_count", 1)
-                    quantity = item.get("quantity", 1)
-                    base_amount = amount_cents * quantity
-                    if interval == "day":
-                        monthly_amount = (base_amount * 30) / interval_count  # 30-day month
-                    elif interval == "week":
-                        monthly_amount = (base_amount * 4) / interval_count  # 4-week month
-                    elif interval == "month":
-                        monthly_amount = base_amount / interval_count
-                    elif interval == "year":
-                        monthly_amount = (base_amount / 12) / interval_count
-                    else:
-                        monthly_amount = 0
-                    sub_mrr += monthly_amount
-                discount = sub_data.get("discount")
-                if discount:
-                    coupon = discount.get("coupon", {})
-                    if "percent_off" in coupon and coupon["percent_off"]:
-                        percent_off = coupon["percent_off"] / 100.0
-                        sub_mrr = sub_mrr * (1 - percent_off)
-                    elif "amount_off" in coupon and coupon["amount_off"]:
-                        amount_off = coupon["amount_off"]
-                        duration = coupon.get("duration")
-                        if duration in ["forever", "repeating"]:
-                            sub_mrr = max(0, sub_mrr - amount_off)
-                mrr_at_start += sub_mrr
+            for page in self._stream_elasticsearch(
+                index="stripe_subscriptions",
+                query=query_start,
+                source=mrr_source,
+                sliced=True,
+            ):
+                for hit in page:
+                    sub_data = hit["_source"].get("cleaned_data", {})
+                    active_start_sub_ids.add(sub_data.get("id"))
+                    mrr_at_start += subscription_mrr(sub_data)
 
             # Get canceled subscriptions in period that were active at start
             filters_churned = [
@@ -686,47 +682,17 @@ class ReactDatabaseTools(BaseTool):
                     }
                 },
             ]
-            subs_churned = self._query_elasticsearch(
-                index="stripe_subscriptions", filters=filters_churned
-            )
             churned_mrr = 0.0
-            for hit in subs_churned:
-                sub_data = hit["_source"]["cleaned_data"]
-                sub_id = sub_data.get("id")
-                if sub_id not in active_start_sub_ids:
-                    continue
-                sub_mrr = 0.0
-                items = sub_data.get("items", {}).get("data", [])
-                for item in items:
-                    plan = item.get("plan", {})
-                    amount_cents = plan.get("amount", 0)
-                    interval = plan.get("interval", "month")
-                    interval_count = plan.get("interval_count", 1)
-                    quantity = item.get("quantity", 1)
-                    base_amount = amount_cents * quantity
-                    if interval == "day":
-                        monthly_amount = (base_amount * 30) / interval_count  # 30-day month
-                    elif interval == "week":
-                        monthly_amount = (base_amount * 4) / interval_count  # 4-week month
-                    elif interval == "month":
-                        monthly_amount = base_amount / interval_count
-                    elif interval == "year":
-                        monthly_amount = (base_amount / 12) / interval_count
-                    else:
-                        monthly_amount = 0
-                    sub_mrr += monthly_amount
-                discount = sub_data.get("discount")
-                if discount:
-                    coupon = discount.get("coupon", {})
-                    if "percent_off" in coupon and coupon["percent_off"]:
-                        percent_off = coupon["percent_off"] / 100.0
-                        sub_mrr = sub_mrr * (1 - percent_off)
-                    elif "amount_off" in coupon and coupon["amount_off"]:
-                        amount_off = coupon["amount_off"]
-                        duration = coupon.get("duration")
-                        if duration in ["forever", "repeating"]:
-                            sub_mrr = max(0, sub_mrr - amount_off)
-                churned_mrr += sub_mrr
+            for page in self._stream_elasticsearch(
+                index="stripe_subscriptions",
+                filters=filters_churned,
+                source=mrr_source,
+                sliced=True,
+            ):
+                for hit in page:
+                    sub_data = hit["_source"].get("cleaned_data", {})
+                    if sub_data.get("id") in active_start_sub_ids:
+                        churned_mrr += subscription_mrr(sub_data)
 
             if mrr_at_start == 0:
                 logger.info("Revenue Churn Rate (%):", 0.0)
@@ -769,7 +735,7 @@ class ReactDatabaseTools(BaseTool):
 
     def calculate_customer_ltv(self, project_id: str, start_date: str, end_date: str) -> float:
         """
-        Calculate Customer Lifetime Value (LTV) = ARPU / Churn Rate.
+        Calculate Customer Lifetime Value (LTV) = ARPU / Churn Rate, both over the period.
 
         Args:
             project_id: The project identifier
@@ -780,7 +746,21 @@ class ReactDatabaseTools(BaseTool):
             float: LTV calculation result
         """
         try:
-            arpu = self.calculate_arpu(project_id)
+            if end_date >= datetime.utcnow().strftime("%Y-%m-%d"):
+                # ARPU of the current period, from the customer summary index: customers
+                # with a subscription counted in current_mrr (status "active")
+                aggs = self._aggregate_elasticsearch(
+                    index=CUSTOMER_SUMMARY_INDEX,
+                    filters=[
+                        {"term": {"project_id": project_id}},
+                        {"range": {"mrr_subscriptions": {"gt": 0}}},
+                    ],
+                    aggs={"arpu": {"avg": {"field": "current_mrr"}}},
+                )
+                arpu = aggs.get("arpu", {}).get("value") or 0.0
+            else:
+                # summaries only hold the current state; past periods are computed
+                arpu = self.calculate_arpu(project_id, start_date, end_date)
             churn_rate = self.calculate_churn_rate(project_id, start_date, end_date)
             if churn_rate == 0:
                 return 0.0
@@ -810,55 +790,25 @@ class ReactDatabaseTools(BaseTool):
             start_timestamp = self.convert_date_to_timestamp(start_date)
             end_timestamp = self.convert_date_to_timestamp(end_date)
 
-            # Get subscription change events during the period
+            # Sum MRR deltas of upgrades projected into the subscription timeline
             filters = [
                 {"term": {"project_id": project_id}},
-                {
-                    "terms": {
-                        "cleaned_data.type": [
-                            "customer.subscription.updated",
-                            "invoice.payment_succeeded",
-                        ]
-                    }
-                },
+                {"term": {"change_type": "upgrade"}},
                 {
                     "range": {
-                        "cleaned_data.created": {
+                        "occurred_at": {
                             "gte": start_timestamp,
                             "lte": end_timestamp,
                         }
                     }
                 },
             ]
-
-            events = self._query_elasticsearch(index="stripe_events", filters=filters)
-
-            # Track MRR changes per customer
-            customer_mrr_changes = {}
-
-            for event_hit in events:
-                event_data = event_hit["_source"]["cleaned_data"]
-                event_type = event_data.get("type")
-
-                if event_type == "customer.subscription.updated":
-                    subscription_data = event_data.get("data", {}).get("object", {})
-                    customer_id = subscription_data.get("customer")
-
-                    if customer_id:
-                        # Calculate MRR difference (simplified approach)
-                        current_mrr = self.calculate_subscription_mrr(subscription_data)
-
-                        if customer_id not in customer_mrr_changes:
-                            customer_mrr_changes[customer_id] = 0
-
-                        # This is a simplified calculation - in reality you'd need to track
-                        # the previous MRR value to get the exact difference
-                        customer_mrr_changes[customer_id] = current_mrr
-
-            # Sum positive changes (expansions)
-            expansion_mrr = sum(
-                change for change in customer_mrr_changes.values() if change > 0
+            aggs = self._aggregate_elasticsearch(
+                index=TIMELINE_INDEX,
+                filters=filters,
+                aggs={"mrr_delta": {"sum": {"field": "mrr_delta"}}},
             )
+            expansion_mrr = aggs.get("mrr_delta", {}).get("value") or 0.0
 
             result = round(expansion_mrr, 2)
             logger.info(f"Expansion MRR: {result}")
@@ -886,45 +836,25 @@ class ReactDatabaseTools(BaseTool):
             start_timestamp = self.convert_date_to_timestamp(start_date)
             end_timestamp = self.convert_date_to_timestamp(end_date)
 
-            # Get subscription change events during the period
+            # Sum MRR deltas of downgrades projected into the subscription timeline
             filters = [
                 {"term": {"project_id": project_id}},
-                {"terms": {"cleaned_data.type": ["customer.subscription.updated"]}},
+                {"term": {"change_type": "downgrade"}},
                 {
                     "range": {
-                        "cleaned_data.created": {
+                        "occurred_at": {
                             "gte": start_timestamp,
                             "lte": end_timestamp,
                         }
                     }
                 },
             ]
-
-            events = self._query_elasticsearch(index="stripe_events", filters=filters)
-
-            # Track MRR changes per customer
-            customer_mrr_changes = {}
-
-            for event_hit in events:
-                event_data = event_hit["_source"]["cleaned_data"]
-                subscription_data = event_data.get("data", {}).get("object", {})
-                customer_id = subscription_data.get("customer")
-
-                if customer_id:
-                    # Calculate MRR difference (simplified approach)
-                    current_mrr = self.calculate_subscription_mrr(subscription_data)
-
-                    if customer_id not in customer_mrr_changes:
-                        customer_mrr_changes[customer_id] = 0
-
-                    # This is a simplified calculation - in reality you'd need to track
-                    # the previous MRR value to get the exact difference
-                    customer_mrr_changes[customer_id] = current_mrr
-
-            # Sum negative changes (contractions) - return as positive number
-            contraction_mrr = abs(
-                sum(change for change in customer_mrr_changes.values() if change < 0)
+            aggs = self._aggregate_elasticsearch(
+                index=TIMELINE_INDEX,
+                filters=filters,
+                aggs={"mrr_delta": {"sum": {"field": "mrr_delta"}}},
             )
+            contraction_mrr = abs(aggs.get("mrr_delta", {}).get("value") or 0.0)
 
             result = round(contraction_mrr, 2)
             logger.info(f"Contraction MRR: {result}")
@@ -1079,48 +1009,7 @@ class ReactDatabaseTools(BaseTool):
             float: Monthly recurring revenue for the subscription
         """
         try:
-            sub_mrr = 0.0
-            items = subscription_data.get("items", {}).get("data", [])
-
-            for item in items:
-                plan = item.get("plan", {})
-                amount = plan.get("amount", 0)
-                interval = plan.get("interval", "month")
-                interval_count = plan.get("interval_count", 1)
-                quantity = item.get("quantity", 1)
-
-                # Base amount
-                base_amount = amount * quantity
-
-                # Normalize to monthly
-                if interval == "day":
-                    monthly_amount = (base_amount * 30) / interval_count  # 30-day month
-                elif interval == "week":
-                    monthly_amount = (base_amount * 4) / interval_count  # 4-week month
-                elif interval == "month":
-                    monthly_amount = base_amount / interval_count
-                elif interval == "year":
-                    monthly_amount = (base_amount / 12) / interval_count
-                else:
-                    monthly_amount = 0
-
-                sub_mrr += monthly_amount
-
-            # Apply subscription-level discounts
-            discount = subscription_data.get("discount")
-            if discount:
-                coupon = discount.get("coupon", {})
-                if "percent_off" in coupon and coupon["percent_off"]:
-                    percent_off = coupon["percent_off"] / 100.0
-                    sub_mrr = sub_mrr * (1 - percent_off)
-                elif "amount_off" in coupon and coupon["amount_off"]:
-                    amount_off = coupon["amount_off"]
-                    duration = coupon.get("duration")
-                    if duration in ["forever", "repeating"]:
-                        sub_mrr = max(0, sub_mrr - amount_off)
-
-            return sub_mrr
-
+            return subscription_mrr(subscription_data)
         except Exception as e:
             logger.error(f"Errorcalculating subscription MRR: {str(e)}")
             return 0.0
@@ -1707,42 +1596,8 @@ class ReactDatabaseTools(BaseTool):
                 index="stripe_subscriptions", query=query_start
             )
 
-            # Collect all unique product IDs first
-            product_ids = set()
-            for hit in subscriptions:
-                sub_data = hit["_source"]["cleaned_data"]
-                items = sub_data.get("items", {}).get("data", [])
-                for item in items:
-                    plan = item.get("plan", {})
-                    product_id = plan.get("product", "")
-                    if product_id:
-                        product_ids.add(product_id)
-
-            # Batch query all products
-            products_cache = {}
-            if product_ids:
-                try:
-                    product_filters = [
-                        {"term": {"project_id": project_id}},
-                        {"terms": {"product_id": list(product_ids)}},
-                    ]
-
-                    product_docs = self._query_elasticsearch(
-                        index="stripe_products",
-                        filters=product_filters,
-                    )
-
-                    # Build products cache
-                    for doc in product_docs:
-                        product_data = doc["_source"].get("cleaned_data", {})
-                        product_id = doc["_source"].get("product_id")
-                        if product_id:
-                            products_cache[product_id] = product_data.get(
-                                "name", product_id
-                            )
-
-                except Exception as e:
-                    logger.error(f"Errorbatch querying products: {str(e)}")
+            # Product names come from the cached dimension table
+            dims = self._dimensions(project_id)
 
             revenue_by_plan = {}
 
@@ -1756,7 +1611,7 @@ class ReactDatabaseTools(BaseTool):
                     product_id = plan.get("product", "")
 
                     # Get product name from cache
-                    product_name = products_cache.get(product_id, plan_id)
+                    product_name = dims.product_name(product_id, plan_id)
 
                     amount_cents = plan.get("amount", 0)
                     interval = plan.get("interval", "month")
@@ -1891,6 +1746,62 @@ class ReactDatabaseTools(BaseTool):
         return list(active_customers)
 
 
+    def _subscription_movements(
+        self, project_id: str, change_type: str, start_timestamp: int, end_timestamp: int
+    ) -> dict:
+        """
+        Customers with at least one timeline change of the given type in the period,
+        mapped to their earliest such change. Customers are paged through with a
+        composite aggregation, so none are dropped however many there are.
+        """
+        filters = [
+            {"term": {"project_id": project_id}},
+            {"term": {"change_type": change_type}},
+            {"range": {"occurred_at": {"gte": start_timestamp, "lte": end_timestamp}}},
+        ]
+        movements = {}
+        after = None
+        while True:
+            composite = {
+                "size": COMPOSITE_PAGE_SIZE,
+                "sources": [{"customer_id": {"terms": {"field": "customer_id"}}}],
+            }
+            if after is not None:
+                composite["after"] = after
+            aggs = self._aggregate_elasticsearch(
+                index=TIMELINE_INDEX,
+                filters=filters,
+                aggs={
+                    "customers": {
+                        "composite": composite,
+                        "aggs": {
+                            "first_change": {
+                                "top_hits": {
+                                    "size": 1,
+                                    "sort": [{"occurred_at": "asc"}],
+                                    "_source": [
+                                        "occurred_at",
+                                        "from_mrr",
+                                        "to_mrr",
+                                        "from_plan_id",
+                                        "to_plan_id",
+                                    ],
+                                }
+                            }
+                        },
+                    }
+                },
+            )
+            customers = aggs.get("customers", {})
+            for bucket in customers.get("buckets", []):
+                hits = bucket.get("first_change", {}).get("hits", {}).get("hits", [])
+                if hits:
+                    movements[bucket["key"]["customer_id"]] = hits[0]["_source"]
+            after = customers.get("after_key")
+            if not customers.get("buckets") or after is None:
+                return movements
+
+
     def calculate_upgrade_rate(self, project_id: str, start_date: str, end_date: str) -> dict:
         """
         Calculate Upgrade Rate - % of Active Customers who upgraded
@@ -1917,82 +1828,30 @@ class ReactDatabaseTools(BaseTool):
                 "upgrade_details": [],
             }
 
-        # Find upgrades during the period using events
-        upgrade_filters = [
-            {"term": {"project_id": project_id}},
-            {"terms": {"cleaned_data.type": ["customer.subscription.updated"]}},
-            {
-                "range": {
-                    "cleaned_data.created": {
-                        "gte": start_timestamp,
-                        "lte": end_timestamp,
-                    }
-                }
-            },
-        ]
-
-        upgrade_events = self._query_elasticsearch(
-            index="stripe_events", filters=upgrade_filters
+        # Find upgrades during the period from the subscription timeline
+        active_customer_set = set(active_customers)
+        movements = self._subscription_movements(
+            project_id, "upgrade", start_timestamp, end_timestamp
         )
 
         upgraded_customers = set()
         upgrade_details = []
-
-        for hit in upgrade_events:
-            event_data = hit["_source"]["cleaned_data"]
-
-            # Get subscription data from event
-            subscription_data = event_data.get("data", {}).get("object", {})
-            customer_id = subscription_data.get("customer")
-
+        for customer_id, row in movements.items():
             # Skip if not an active customer at start
-            if customer_id not in active_customers:
+            if customer_id not in active_customer_set:
                 continue
-
-            # Get previous attributes to compare
-            previous_attributes = event_data.get("data", {}).get("previous_attributes", {})
-
-            # Check for plan/price changes indicating upgrade
-            current_items = subscription_data.get("items", {}).get("data", [])
-
-            if "items" in previous_attributes:
-                prev_items = previous_attributes["items"]["data"]
-
-                # Compare plan amounts to detect upgrades
-                for curr_item, prev_item in zip(current_items, prev_items):
-                    curr_plan = curr_item.get("plan", {}) or curr_item.get("price", {})
-                    prev_plan = prev_item.get("plan", {}) or prev_item.get("price", {})
-
-                    curr_amount = curr_plan.get("amount", 0) or curr_plan.get(
-                        "unit_amount", 0
-                    )
-                    prev_amount = prev_plan.get("amount", 0) or prev_plan.get(
-                        "unit_amount", 0
-                    )
-
-                    curr_quantity = curr_item.get("quantity", 1)
-                    prev_quantity = prev_item.get("quantity", 1)
-
-                    # Calculate total amounts
-                    curr_total = curr_amount * curr_quantity
-                    prev_total = prev_amount * prev_quantity
-
-                    # If current amount is higher, it's an upgrade
-                    if curr_total > prev_total:
-                        upgraded_customers.add(customer_id)
-
-                        upgrade_details.append(
-                            {
-                                "customer_id": customer_id,
-                                "event_date": event_data.get("created"),
-                                "previous_amount": prev_total,
-                                "new_amount": curr_total,
-                                "amount_increase": curr_total - prev_total,
-                                "previous_plan_id": prev_plan.get("id"),
-                                "new_plan_id": curr_plan.get("id"),
-                            }
-                        )
-                        break
+            upgraded_customers.add(customer_id)
+            upgrade_details.append(
+                {
+                    "customer_id": customer_id,
+                    "event_date": row.get("occurred_at"),
+                    "previous_amount": row.get("from_mrr"),
+                    "new_amount": row.get("to_mrr"),
+                    "amount_increase": round(row["to_mrr"] - row["from_mrr"], 2),
+                    "previous_plan_id": row.get("from_plan_id"),
+                    "new_plan_id": row.get("to_plan_id"),
+                }
+            )
 
         total_active = len(active_customers)
         upgraded_count = len(upgraded_customers)
@@ -2041,82 +1900,30 @@ class ReactDatabaseTools(BaseTool):
                 "downgrade_details": [],
             }
 
-        # Find downgrades during the period using events
-        downgrade_filters = [
-            {"term": {"project_id": project_id}},
-            {"terms": {"cleaned_data.type": ["customer.subscription.updated"]}},
-            {
-                "range": {
-                    "cleaned_data.created": {
-                        "gte": start_timestamp,
-                        "lte": end_timestamp,
-                    }
-                }
-            },
-        ]
-
-        downgrade_events = self._query_elasticsearch(
-            index="stripe_events", filters=downgrade_filters
+        # Find downgrades during the period from the subscription timeline
+        active_customer_set = set(active_customers)
+        movements = self._subscription_movements(
+            project_id, "downgrade", start_timestamp, end_timestamp
         )
 
         downgraded_customers = set()
         downgrade_details = []
-
-        for hit in downgrade_events:
-            event_data = hit["_source"]["cleaned_data"]
-
-            # Get subscription data from event
-            subscription_data = event_data.get("data", {}).get("object", {})
-            customer_id = subscription_data.get("customer")
-
+        for customer_id, row in movements.items():
             # Skip if not an active customer at start
-            if customer_id not in active_customers:
+            if customer_id not in active_customer_set:
                 continue
-
-            # Get previous attributes to compare
-            previous_attributes = event_data.get("data", {}).get("previous_attributes", {})
-
-            # Check for plan/price changes indicating downgrade
-            current_items = subscription_data.get("items", {}).get("data", [])
-
-            if "items" in previous_attributes:
-                prev_items = previous_attributes["items"]["data"]
-
-                # Compare plan amounts to detect downgrades
-                for curr_item, prev_item in zip(current_items, prev_items):
-                    curr_plan = curr_item.get("plan", {}) or curr_item.get("price", {})
-                    prev_plan = prev_item.get("plan", {}) or prev_item.get("price", {})
-
-                    curr_amount = curr_plan.get("amount", 0) or curr_plan.get(
-                        "unit_amount", 0
-                    )
-                    prev_amount = prev_plan.get("amount", 0) or prev_plan.get(
-                        "unit_amount", 0
-                    )
-
-                    curr_quantity = curr_item.get("quantity", 1)
-                    prev_quantity = prev_item.get("quantity", 1)
-
-                    # Calculate total amounts
-                    curr_total = curr_amount * curr_quantity
-                    prev_total = prev_amount * prev_quantity
-
-                    # If current amount is lower, it's a downgrade
-                    if curr_total < prev_total:
-                        downgraded_customers.add(customer_id)
-
-                        downgrade_details.append(
-                            {
-                                "customer_id": customer_id,
-                                "event_date": event_data.get("created"),
-                                "previous_amount": prev_total,
-                                "new_amount": curr_total,
-                                "amount_decrease": prev_total - curr_total,
-                                "previous_plan_id": prev_plan.get("id"),
-                                "new_plan_id": curr_plan.get("id"),
-                            }
-                        )
-                        break
+            downgraded_customers.add(customer_id)
+            downgrade_details.append(
+                {
+                    "customer_id": customer_id,
+                    "event_date": row.get("occurred_at"),
+                    "previous_amount": row.get("from_mrr"),
+                    "new_amount": row.get("to_mrr"),
+                    "amount_decrease": round(row["from_mrr"] - row["to_mrr"], 2),
+                    "previous_plan_id": row.get("from_plan_id"),
+                    "new_plan_id": row.get("to_plan_id"),
+                }
+            )
 
         total_active = len(active_customers)
         downgraded_count = len(downgraded_customers)
@@ -2246,63 +2053,37 @@ class ReactDatabaseTools(BaseTool):
                 }
             }
 
-            subscriptions = self._query_elasticsearch(
-                index="stripe_subscriptions", query=query_start
-            )
-            logger.info(f"Found {len(subscriptions)} active subscriptions in period.")
-
-            if not subscriptions:
-                return {}
-
-            # Step 2: Extract customer IDs and calculate subscription MRR
-            customer_ids = set()
-            subscriptions_with_mrr = []
-
-            for hit in subscriptions:
-                sub_data = hit["_source"]["cleaned_data"]
-                customer_id = sub_data.get("customer")
-                if customer_id:
-                    customer_ids.add(customer_id)
-                    sub_mrr = self.calculate_subscription_mrr(sub_data)
-                    subscriptions_with_mrr.append(
-                        {"customer_id": customer_id, "mrr": sub_mrr}
-                    )
-
-            # Step 3: Batch get customer countries
-            customer_filters = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"customer_id": list(customer_ids)}},
-            ]
-
-            customers = self._query_elasticsearch(
-                index="stripe_customers", filters=customer_filters
-            )
-
-            # Step 4: Create customer to country mapping
-            customer_to_country = {}
-            for hit in customers:
-                customer_data = hit["_source"]["cleaned_data"]
-                customer_id = hit["_source"].get("customer_id")
-                # print ("customer_data: ",customer_data)
-
-                country = (
-                    customer_data.get("address", {}).get("country")
-                    or customer_data.get("shipping", {}).get("address", {}).get("country")
-                    or "Unknown"
-                )
-
-                customer_to_country[customer_id] = country
-
-            # Step 5: Aggregate MRR by country
+            # Step 2: Stream subscriptions and aggregate their MRR by the customer's
+            # country, joined from the dimension table
+            dims = self._dimensions(project_id)
             mrr_by_country = {}
-            for subscription in subscriptions_with_mrr:
-                customer_id = subscription["customer_id"]
-                mrr = subscription["mrr"]
-                country = customer_to_country.get(customer_id, "Unknown")
+            subscription_count = 0
+            for page in self._stream_elasticsearch(
+                index="stripe_subscriptions",
+                query=query_start,
+                source=[
+                    "cleaned_data.customer",
+                    "cleaned_data.items.data.plan",
+                    "cleaned_data.items.data.quantity",
+                    "cleaned_data.discount",
+                ],
+                sliced=True,
+            ):
+                subscription_count += len(page)
+                for hit in page:
+                    sub_data = hit["_source"].get("cleaned_data", {})
+                    customer_id = sub_data.get("customer")
+                    if customer_id:
+                        country = dims.country(customer_id)
+                        mrr_by_country[country] = mrr_by_country.get(
+                            country, 0.0
+                        ) + self.calculate_subscription_mrr(sub_data)
+            logger.info(f"Found {subscription_count} active subscriptions in period.")
 
-                mrr_by_country[country] = mrr_by_country.get(country, 0.0) + mrr
+            if not subscription_count:
+                return {}
 
-            # Step 6: Format results
+            # Step 5: Format results
             for country in mrr_by_country:
                 mrr_by_country[country] = round(mrr_by_country[country], 2)
 
@@ -2406,29 +2187,14 @@ class ReactDatabaseTools(BaseTool):
                     "period": f"{start_date} to {end_date}",
                 }
 
-            # Get customer details for active customers
-            customer_filters = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"customer_id": list(active_customer_ids)}},
-            ]
-
-            customers = self._query_elasticsearch(
-                index="stripe_customers", filters=customer_filters
-            )
-
-            # Count active customers by country
+            # Count active customers by country (only customers known to the dimension table)
+            dims = self._dimensions(project_id)
             active_customer_count_by_country = {}
 
-            for hit in customers:
-                customer_data = hit["_source"]["cleaned_data"]
-
-                # Get country from customer address
-                country = (
-                    customer_data.get("address", {}).get("country")
-                    or customer_data.get("shipping", {}).get("address", {}).get("country")
-                    or "Unknown"
-                )
-
+            for customer_id in active_customer_ids:
+                if customer_id not in dims.customers:
+                    continue
+                country = dims.country(customer_id)
                 active_customer_count_by_country[country] = (
                     active_customer_count_by_country.get(country, 0) + 1
                 )
@@ -2528,31 +2294,11 @@ class ReactDatabaseTools(BaseTool):
                     "period": f"{start_date} to {end_date}",
                 }
 
-            # Get customer details for active customers
-            customer_filters = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"customer_id": list(active_customer_ids)}},
-            ]
-            customers = self._query_elasticsearch(
-                index="stripe_customers", filters=customer_filters
-            )
-
-            # Map customer_id to country
-            customer_to_country = {}
-            for hit in customers:
-                customer_data = hit["_source"]["cleaned_data"]
-                customer_id = hit["_source"].get("customer_id")
-                country = (
-                    customer_data.get("address", {}).get("country")
-                    or customer_data.get("shipping", {}).get("address", {}).get("country")
-                    or "Unknown"
-                )
-                customer_to_country[customer_id] = country
-
             # Count active customers by country
+            dims = self._dimensions(project_id)
             active_customers_by_country = {}
             for customer_id in active_customer_ids:
-                country = customer_to_country.get(customer_id, "Unknown")
+                country = dims.country(customer_id)
                 active_customers_by_country[country] = (
                     active_customers_by_country.get(country, 0) + 1
                 )
@@ -2579,7 +2325,7 @@ class ReactDatabaseTools(BaseTool):
             for hit in subs_churned:
                 customer_id = hit["_source"]["cleaned_data"].get("customer")
                 if customer_id and customer_id in active_customer_ids:
-                    country = customer_to_country.get(customer_id, "Unknown")
+                    country = dims.country(customer_id)
                     churned_customers_by_country[country] = (
                         churned_customers_by_country.get(country, 0) + 1
                     )
@@ -2931,8 +2677,7 @@ class ReactDatabaseTools(BaseTool):
                     "period": f"{start_date} to {end_date}",
                 }
 
-            # Step 2: Collect product IDs
-            product_ids = set()
+            # Step 2: Compute per-subscription MRR
             subscription_rows = []
 
             for hit in subs:
@@ -2955,32 +2700,16 @@ class ReactDatabaseTools(BaseTool):
                     mrr = amount  # fallback
 
                 subscription_rows.append((product_id, mrr))
-                if product_id != "unknown_product":
-                    product_ids.add(product_id)
 
-            # Step 3: Query product names once
-            product_name_map = {}
-            if product_ids:
-                product_filters = [
-                    {"term": {"project_id": project_id}},
-                    {"terms": {"product_id": list(product_ids)}},
-                ]
-                products = self._query_elasticsearch(
-                    index="stripe_products", filters=product_filters
-                )
-
-                for hit in products:
-                    pdata = hit["_source"]["cleaned_data"]
-                    pid = pdata.get("id")
-                    pname = pdata.get("name") or pid
-                    product_name_map[pid] = pname
+            # Step 3: Join product names from the dimension table
+            dims = self._dimensions(project_id)
 
             # Step 4: Aggregate by product
             mrr_by_plan = {}
             total_mrr = 0.0
 
             for product_id, mrr in subscription_rows:
-                pname = product_name_map.get(product_id, product_id)
+                pname = dims.product_name(product_id)
                 mrr_by_plan[pname] = mrr_by_plan.get(pname, 0.0) + mrr
                 total_mrr += mrr
 
@@ -3081,29 +2810,15 @@ class ReactDatabaseTools(BaseTool):
                     "period": f"{start_date} to {end_date}",
                 }
 
-            # Step 3: Query product names in one go
-            product_filters = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"product_id": list(product_ids)}},
-            ]
-
-            products = self._query_elasticsearch(
-                index="stripe_products", filters=product_filters
-            )
-
-            product_name_map = {}
-            for hit in products:
-                pdata = hit["_source"]["cleaned_data"]
-                product_id = pdata.get("id")
-                pname = pdata.get("name") or product_id
-                product_name_map[product_id] = pname
+            # Step 3: Join product names from the dimension table
+            dims = self._dimensions(project_id)
 
             # Step 4: Build final result
             customer_count_by_plan = {}
             total_customers = 0
 
             for product_id, customers in plan_customer_map.items():
-                pname = product_name_map.get(product_id, product_id)
+                pname = dims.product_name(product_id)
                 count = len(customers)
                 customer_count_by_plan[pname] = count
                 total_customers += count
@@ -3170,8 +2885,7 @@ class ReactDatabaseTools(BaseTool):
                 index="stripe_subscriptions", query=query_start
             )
 
-            # Collect product IDs and map customer to plan/product
-            product_ids = set()
+            # Map customer to plan/product
             customer_to_product_id = {}
 
             for hit in subs_start:
@@ -3189,7 +2903,6 @@ class ReactDatabaseTools(BaseTool):
 
                 if customer_id and product_id:
                     customer_to_product_id[customer_id] = product_id
-                    product_ids.add(product_id)
 
             if not customer_to_product_id:
                 return {
@@ -3198,33 +2911,13 @@ class ReactDatabaseTools(BaseTool):
                     "period": f"{start_date} to {end_date}",
                 }
 
-            # Batch query products to get product names
-            product_filters = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"product_id": list(product_ids)}},
-            ]
-
-            products = self._query_elasticsearch(
-                index="stripe_products", filters=product_filters
-            )
-
-            # Build product_id to name mapping
-            product_id_to_name = {}
-            for hit in products:
-                product_data = hit["_source"]["cleaned_data"]
-                product_id = hit["_source"].get("product_id")
-                product_name = product_data.get("name", product_id or "Unknown Product")
-                if product_id:
-                    product_id_to_name[product_id] = product_name
-
             # Map customer to product name and count active customers by plan
+            dims = self._dimensions(project_id)
             customer_to_product_name = {}
             active_customers_by_plan = {}
 
             for customer_id, product_id in customer_to_product_id.items():
-                product_name = product_id_to_name.get(
-                    product_id, product_id or "Unknown Product"
-                )
+                product_name = dims.product_name(product_id)
                 customer_to_product_name[customer_id] = product_name
                 active_customers_by_plan[product_name] = (
                     active_customers_by_plan.get(product_name, 0) + 1
@@ -3304,31 +2997,15 @@ class ReactDatabaseTools(BaseTool):
             int: Number of high-value customers
         """
         try:
-            # Get all active subscriptions
+            # Per-customer MRR is pre-aggregated in the customer summary index
             filters = [
                 {"term": {"project_id": project_id}},
-                {"term": {"cleaned_data.status": "active"}},
+                {"term": {"status": "active"}},
+                {"range": {"current_mrr": {"gt": threshold}}},
             ]
-            subscriptions = self._query_elasticsearch(
-                index="stripe_subscriptions", filters=filters
+            high_value_count = self._count_elasticsearch(
+                index=CUSTOMER_SUMMARY_INDEX, filters=filters
             )
-            if not subscriptions:
-                return 0
-
-            # Group subscriptions by customer to get total MRR per customer
-            customer_mrr = {}
-            for hit in subscriptions:
-                sub_data = hit["_source"]["cleaned_data"]
-                customer_id = sub_data.get("customer")
-                if not customer_id:
-                    continue
-                sub_mrr = self.calculate_subscription_mrr(sub_data)
-                customer_mrr[customer_id] = customer_mrr.get(customer_id, 0.0) + sub_mrr
-
-            # Calculate ARPU for each customer and count those above threshold
-            # Since ARPU is per customer, for an individual customer: ARPU = their total MRR
-            # (Because we're averaging across 1 customer: MRR/1 = MRR)
-            high_value_count = sum(1 for mrr in customer_mrr.values() if mrr > threshold)
             logger.info(f"High-Value Customers (ARPU > {threshold}): {high_value_count}")
             return high_value_count
 
@@ -3350,74 +3027,24 @@ class ReactDatabaseTools(BaseTool):
         """
         try:
             start_timestamp = self.convert_date_to_timestamp(start_date)
+            # Customers that downgraded or canceled since start_date
             filters = [
                 {"term": {"project_id": project_id}},
-                {"range": {"cleaned_data.created": {"gte": start_timestamp}}},
                 {
-                    "terms": {
-                        "cleaned_data.type": [
-                            "customer.subscription.updated",
-                            "customer.subscription.deleted",
-                        ]
+                    "bool": {
+                        "should": [
+                            {"range": {"last_downgrade_at": {"gte": start_timestamp}}},
+                            {"range": {"canceled_at": {"gte": start_timestamp}}},
+                        ],
+                        "minimum_should_match": 1,
                     }
                 },
             ]
-
-            events = self._query_elasticsearch(index="stripe_events", filters=filters)
-            at_risk_customers = set()
-
-            for event in events:
-                event_data = (
-                    event["_source"]["cleaned_data"].get("data", {}).get("object", {})
-                )
-                prev_attrs = (
-                    event["_source"]["cleaned_data"]
-                    .get("data", {})
-                    .get("previous_attributes", {})
-                )
-
-                customer_id = event_data.get("customer")
-                if not customer_id:
-                    continue
-
-                # Cancellation check
-                canceled_at = event_data.get("canceled_at")
-                if canceled_at and canceled_at >= start_timestamp:
-                    at_risk_customers.add(customer_id)
-                    continue
-
-                # Plan downgrade?
-                old_price = (
-                    prev_attrs.get("items", {})
-                    .get("data", [{}])[0]
-                    .get("plan", {})
-                    .get("amount")
-                )
-                new_price = (
-                    event_data.get("items", {})
-                    .get("data", [{}])[0]
-                    .get("plan", {})
-                    .get("amount")
-                )
-
-                if (
-                    old_price is not None
-                    and new_price is not None
-                    and new_price < old_price
-                ):
-                    at_risk_customers.add(customer_id)
-                    continue
-
-                # Quantity reduction?
-                old_qty = prev_attrs.get("quantity")
-                new_qty = event_data.get("quantity")
-
-                if old_qty is not None and new_qty is not None and new_qty < old_qty:
-                    at_risk_customers.add(customer_id)
-                    continue
-
-            logger.info(f"Number of at-risk customers: {len(at_risk_customers)}")
-            return len(at_risk_customers)
+            at_risk_count = self._count_elasticsearch(
+                index=CUSTOMER_SUMMARY_INDEX, filters=filters
+            )
+            logger.info(f"Number of at-risk customers: {at_risk_count}")
+            return at_risk_count
 
         except Exception as e:
             logger.error(f"Errorcalculating at-risk customers: {str(e)}")
@@ -3525,39 +3152,19 @@ class ReactDatabaseTools(BaseTool):
                 }
 
             # 2. Collect customer_ids
-            customer_ids = set()
             invoice_info = []
             for hit in invoices:
                 inv = hit["_source"]["cleaned_data"]
-                cid = inv.get("customer")
-                status = inv.get("status")
-                invoice_info.append((cid, status))
-                if cid:
-                    customer_ids.add(cid)
+                invoice_info.append((inv.get("customer"), inv.get("status")))
 
-            # 3. Fetch customer countries in bulk
-            filters_cust = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"customer_id": list(customer_ids)}},
-            ]
-            customers = self._query_elasticsearch(index="stripe_customers", filters=filters_cust)
-
-            cust_country = {}
-            for hit in customers:
-                data = hit["_source"]["cleaned_data"]
-                cid = hit["_source"].get("customer_id")
-                country = (
-                    data.get("address", {}).get("country")
-                    or data.get("shipping", {}).get("address", {}).get("country")
-                    or "Unknown"
-                )
-                cust_country[cid] = country
+            # 3. Join customer countries from the dimension table
+            dims = self._dimensions(project_id)
 
             # 4. Tally invoice counts by country: total vs failed
             total_by_country = {}
             failed_by_country = {}
             for cid, status in invoice_info:
-                country = cust_country.get(cid, "Unknown")
+                country = dims.country(cid)
                 total_by_country[country] = total_by_country.get(country, 0) + 1
                 if status in ("open", "unpaid"):
                     failed_by_country[country] = failed_by_country.get(country, 0) + 1
@@ -3626,7 +3233,6 @@ class ReactDatabaseTools(BaseTool):
                 }
 
             # 2. Aggregate paid/refunded amounts per customer
-            customer_ids = set()
             invoice_data = []  # (customer_id, amount_paid, amount_refunded)
             for hit in invoices:
                 inv = hit["_source"]["cleaned_data"]
@@ -3634,32 +3240,15 @@ class ReactDatabaseTools(BaseTool):
                 paid = inv.get("amount_paid", 0)
                 refunded = inv.get("amount_refunded", 0)
                 invoice_data.append((cid, paid, refunded))
-                if cid:
-                    customer_ids.add(cid)
 
-            # 3. Retrieve customer countries in bulk
-            cust_filters = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"customer_id": list(customer_ids)}},
-            ]
-            customers = self._query_elasticsearch(index="stripe_customers", filters=cust_filters)
-
-            customer_to_country = {}
-            for hit in customers:
-                data = hit["_source"]["cleaned_data"]
-                cid = hit["_source"].get("customer_id")
-                country = (
-                    data.get("address", {}).get("country")
-                    or data.get("shipping", {}).get("address", {}).get("country")
-                    or "Unknown"
-                )
-                customer_to_country[cid] = country
+            # 3. Join customer countries from the dimension table
+            dims = self._dimensions(project_id)
 
             # 4. Summarize totals by country
             paid_by_country = {}
             refunded_by_country = {}
             for cid, paid, refunded in invoice_data:
-                country = customer_to_country.get(cid, "Unknown")
+                country = dims.country(cid)
                 paid_by_country[country] = paid_by_country.get(country, 0) + paid
                 refunded_by_country[country] = (
                     refunded_by_country.get(country, 0) + refunded
@@ -3819,70 +3408,23 @@ class ReactDatabaseTools(BaseTool):
             start_ts = self.convert_date_to_timestamp(start_date)
             end_ts = self.convert_date_to_timestamp(end_date)
 
-            # 1. Fetch all invoices that were paid during the period
+            # Customers whose first paid invoice falls in the period
             filters = [
                 {"term": {"project_id": project_id}},
-                {"term": {"cleaned_data.status": "paid"}},
-                {"range": {"cleaned_data.created": {"gte": start_ts, "lte": end_ts}}},
-            ]
-            paid_invoices = self._query_elasticsearch(
-                index="stripe_invoices", filters=filters
-            )
-
-            if not paid_invoices:
-                return 0.0  # No paid invoices → no meaningful result
-
-            # 2. Collect unique customer IDs and invoice dates
-            customer_invoice_map = {}  # customer_id → earliest invoice timestamp
-            for hit in paid_invoices:
-                inv = hit["_source"]["cleaned_data"]
-                cid = inv.get("customer")
-                inv_date = inv.get("created")
-                if cid and inv_date:
-                    if (
-                        cid not in customer_invoice_map
-                        or inv_date < customer_invoice_map[cid]
-                    ):
-                        customer_invoice_map[cid] = inv_date
-
-            if not customer_invoice_map:
-                return 0.0
-
-            # 3. Fetch signup (created) date for each customer in bulk
-            customer_ids = list(customer_invoice_map.keys())
-            cust_filters = [
-                {"term": {"project_id": project_id}},
-                {"terms": {"customer_id": customer_ids}},
+                {"range": {"first_payment_at": {"gte": start_ts, "lte": end_ts}}},
+                {"exists": {"field": "days_to_first_payment"}},
             ]
-            customers = self._query_elasticsearch(
-                index="stripe_customers",
-                filters=cust_filters,
+            aggs = self._aggregate_elasticsearch(
+                index=CUSTOMER_SUMMARY_INDEX,
+                filters=filters,
+                aggs={"avg_days": {"avg": {"field": "days_to_first_payment"}}},
             )
-
-            # Map customer to signup timestamp
-            signup_map = {}
-            for hit in customers:
-                data = hit["_source"]["cleaned_data"]
-                cid = hit["_source"].get("customer_id")
-                created_ts = data.get("created")
-                if cid and created_ts:
-                    signup_map[cid] = created_ts
-
-            # 4. Compute time differences
-            total_days = 0.0
-            count = 0
-            for cid, invoice_ts in customer_invoice_map.items():
-                signup_ts = signup_map.get(cid)
-                if signup_ts and invoice_ts >= signup_ts:
-                    days_diff = (invoice_ts - signup_ts) / 86400  # seconds → days
-                    total_days += days_diff
-                    count += 1
-
-            if count == 0:
+            avg_days = aggs.get("avg_days", {}).get("value")
+            if avg_days is None:
                 return 0.0
 
-            avg_days = round(total_days / count, 2)
-            logger.info(f"Average Time to First Payment: {avg_days} days over {count} customers")
+            avg_days = round(avg_days, 2)
+            logger.info(f"Average Time to First Payment: {avg_days} days")
             return avg_days
 
         except Exception as e: